@@ -0,0 +1,78 @@
+-- Migración 0014: Índices de búsqueda de texto completo (FTS5)
+-- Fecha: 2026-10-18
+-- Descripción: Tablas virtuales FTS5 para la búsqueda pública de proyectos y productos,
+--              sincronizadas mediante triggers. Reemplazan los LIKE '%term%' que obligaban
+--              a recorrer la tabla completa en cada búsqueda.
+
+-- 1. Tablas virtuales con contenido externo (no duplican el texto, solo el índice)
+-- remove_diacritics 2 permite que "investigacion" encuentre "investigación"
+CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(
+    title,
+    abstract,
+    keywords,
+    content='projects',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    product_code,
+    description,
+    content='products',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- 2. Triggers de sincronización para proyectos
+CREATE TRIGGER IF NOT EXISTS projects_fts_insert
+AFTER INSERT ON projects
+BEGIN
+    INSERT INTO projects_fts (rowid, title, abstract, keywords)
+    VALUES (NEW.id, NEW.title, NEW.abstract, NEW.keywords);
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_fts_delete
+AFTER DELETE ON projects
+BEGIN
+    INSERT INTO projects_fts (projects_fts, rowid, title, abstract, keywords)
+    VALUES ('delete', OLD.id, OLD.title, OLD.abstract, OLD.keywords);
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_fts_update
+AFTER UPDATE OF title, abstract, keywords ON projects
+BEGIN
+    INSERT INTO projects_fts (projects_fts, rowid, title, abstract, keywords)
+    VALUES ('delete', OLD.id, OLD.title, OLD.abstract, OLD.keywords);
+    INSERT INTO projects_fts (rowid, title, abstract, keywords)
+    VALUES (NEW.id, NEW.title, NEW.abstract, NEW.keywords);
+END;
+
+-- 3. Triggers de sincronización para productos
+CREATE TRIGGER IF NOT EXISTS products_fts_insert
+AFTER INSERT ON products
+BEGIN
+    INSERT INTO products_fts (rowid, product_code, description)
+    VALUES (NEW.id, NEW.product_code, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_delete
+AFTER DELETE ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, product_code, description)
+    VALUES ('delete', OLD.id, OLD.product_code, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_update
+AFTER UPDATE OF product_code, description ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, product_code, description)
+    VALUES ('delete', OLD.id, OLD.product_code, OLD.description);
+    INSERT INTO products_fts (rowid, product_code, description)
+    VALUES (NEW.id, NEW.product_code, NEW.description);
+END;
+
+-- 4. Indexar los datos existentes
+INSERT INTO projects_fts (projects_fts) VALUES ('rebuild');
+INSERT INTO products_fts (products_fts) VALUES ('rebuild');
@@ -0,0 +1,9 @@
+-- Migración 0015: Índices para paginación por cursor (keyset)
+-- Fecha: 2026-10-18
+-- Descripción: Índices compuestos que permiten recorrer los listados ordenados por
+--              (created_at, id) / (updated_at, id) sin OFFSET. SQLite agrega el rowid (id)
+--              al final de cada índice, por lo que el desempate por id queda cubierto.
+
+CREATE INDEX IF NOT EXISTS idx_projects_public_created ON projects(is_public, created_at);
+CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects(updated_at);
+CREATE INDEX IF NOT EXISTS idx_products_public_created ON products(is_public, created_at);
@@ -0,0 +1,11 @@
+-- Migración 0016: Versiones de etiquetas para la caché perimetral de la API pública
+-- Fecha: 2026-10-18
+-- Descripción: Cada etiqueta ('projects', 'project:12', 'product:5', 'stats', ...) tiene una
+--              versión que forma parte de la llave de caché. Las escrituras incrementan la
+--              versión de las etiquetas afectadas para invalidar exactamente esas entradas.
+
+CREATE TABLE IF NOT EXISTS cache_tags (
+    tag TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT (datetime('now'))
+);
@@ -0,0 +1,128 @@
+-- Migración 0017: Estadísticas públicas materializadas
+-- Fecha: 2026-10-18
+-- Descripción: Contadores por dimensión para /api/public/stats, mantenidos por triggers
+--              sobre projects y products. El endpoint pasa de cinco agregaciones a una
+--              sola lectura indexada. POST /api/admin/stats/rebuild recalcula todo.
+--
+-- Dimensiones:
+--   projects           / total          → proyectos públicos
+--   products           / total          → productos públicos
+--   products_by_type   / <product_type> → productos públicos por categoría
+--   projects_by_status / <status>       → proyectos públicos por estado
+--   owners             / <owner_id>     → proyectos públicos por investigador
+
+CREATE TABLE IF NOT EXISTS public_stats (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+) WITHOUT ROWID;
+
+-- 1. Triggers sobre proyectos
+CREATE TRIGGER IF NOT EXISTS public_stats_projects_insert
+AFTER INSERT ON projects
+WHEN NEW.is_public = 1
+BEGIN
+    INSERT INTO public_stats (dimension, key, count) VALUES ('projects', 'total', 1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count) VALUES ('projects_by_status', IFNULL(NEW.status, ''), 1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count) VALUES ('owners', CAST(NEW.owner_id AS TEXT), 1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS public_stats_projects_delete
+AFTER DELETE ON projects
+WHEN OLD.is_public = 1
+BEGIN
+    INSERT INTO public_stats (dimension, key, count) VALUES ('projects', 'total', -1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count) VALUES ('projects_by_status', IFNULL(OLD.status, ''), -1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count) VALUES ('owners', CAST(OLD.owner_id AS TEXT), -1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+-- En una actualización se resta la fila anterior y se suma la nueva
+CREATE TRIGGER IF NOT EXISTS public_stats_projects_update
+AFTER UPDATE OF is_public, status, owner_id ON projects
+WHEN OLD.is_public = 1 OR NEW.is_public = 1
+BEGIN
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'projects', 'total', -1 WHERE OLD.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'projects_by_status', IFNULL(OLD.status, ''), -1 WHERE OLD.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'owners', CAST(OLD.owner_id AS TEXT), -1 WHERE OLD.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'projects', 'total', 1 WHERE NEW.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'projects_by_status', IFNULL(NEW.status, ''), 1 WHERE NEW.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'owners', CAST(NEW.owner_id AS TEXT), 1 WHERE NEW.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+-- 2. Triggers sobre productos
+CREATE TRIGGER IF NOT EXISTS public_stats_products_insert
+AFTER INSERT ON products
+WHEN NEW.is_public = 1
+BEGIN
+    INSERT INTO public_stats (dimension, key, count) VALUES ('products', 'total', 1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count) VALUES ('products_by_type', NEW.product_type, 1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS public_stats_products_delete
+AFTER DELETE ON products
+WHEN OLD.is_public = 1
+BEGIN
+    INSERT INTO public_stats (dimension, key, count) VALUES ('products', 'total', -1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count) VALUES ('products_by_type', OLD.product_type, -1)
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS public_stats_products_update
+AFTER UPDATE OF is_public, product_type ON products
+WHEN OLD.is_public = 1 OR NEW.is_public = 1
+BEGIN
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'products', 'total', -1 WHERE OLD.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'products_by_type', OLD.product_type, -1 WHERE OLD.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'products', 'total', 1 WHERE NEW.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO public_stats (dimension, key, count)
+    SELECT 'products_by_type', NEW.product_type, 1 WHERE NEW.is_public = 1
+    ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+-- 3. Carga inicial (misma lógica que la reconstrucción desde el panel de administración)
+DELETE FROM public_stats;
+
+INSERT INTO public_stats (dimension, key, count)
+SELECT 'projects', 'total', COUNT(*) FROM projects WHERE is_public = 1;
+
+INSERT INTO public_stats (dimension, key, count)
+SELECT 'products', 'total', COUNT(*) FROM products WHERE is_public = 1;
+
+INSERT INTO public_stats (dimension, key, count)
+SELECT 'products_by_type', product_type, COUNT(*) FROM products WHERE is_public = 1 GROUP BY product_type;
+
+INSERT INTO public_stats (dimension, key, count)
+SELECT 'projects_by_status', IFNULL(status, ''), COUNT(*) FROM projects WHERE is_public = 1 GROUP BY IFNULL(status, '');
+
+INSERT INTO public_stats (dimension, key, count)
+SELECT 'owners', CAST(owner_id AS TEXT), COUNT(*) FROM projects WHERE is_public = 1 GROUP BY owner_id;
@@ -0,0 +1,107 @@
+-- Migración 0018: Marcas de recálculo incremental de scoring
+-- Fecha: 2026-10-18
+-- Descripción: Triggers sobre projects, products, project_collaborators y product_authors que
+--              marcan como pendiente de recálculo el proyecto afectado. El modo incremental de
+--              /api/admin/scoring/calculate procesa solo los proyectos marcados.
+
+-- 1. Tabla de proyectos pendientes de recálculo
+-- version se incrementa en cada nueva marca: al terminar un recálculo solo se eliminan las
+-- marcas cuya versión no cambió mientras tanto
+CREATE TABLE IF NOT EXISTS project_score_dirty (
+    project_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 1,
+    marked_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 2. Cambios en proyectos (campos de completitud, cronograma y estado)
+CREATE TRIGGER IF NOT EXISTS projects_score_dirty_insert
+AFTER INSERT ON projects
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (NEW.id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_score_dirty_update
+AFTER UPDATE OF title, abstract, methodology, start_date, end_date, institution, budget, progress_percentage, status ON projects
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (NEW.id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_score_dirty_delete
+AFTER DELETE ON projects
+BEGIN
+    DELETE FROM project_score_dirty WHERE project_id = OLD.id;
+END;
+
+-- 3. Cambios en productos (productividad, impacto e innovación)
+CREATE TRIGGER IF NOT EXISTS products_score_dirty_insert
+AFTER INSERT ON products
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (NEW.project_id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_score_dirty_delete
+AFTER DELETE ON products
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (OLD.project_id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+-- Si el producto cambia de proyecto se marcan ambos
+CREATE TRIGGER IF NOT EXISTS products_score_dirty_update
+AFTER UPDATE OF project_id, product_type, doi, impact_factor, citation_count ON products
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (NEW.project_id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+    INSERT INTO project_score_dirty (project_id)
+    SELECT OLD.project_id WHERE OLD.project_id <> NEW.project_id
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+-- 4. Cambios en el equipo del proyecto
+CREATE TRIGGER IF NOT EXISTS collaborators_score_dirty_insert
+AFTER INSERT ON project_collaborators
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (NEW.project_id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS collaborators_score_dirty_delete
+AFTER DELETE ON project_collaborators
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (OLD.project_id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS collaborators_score_dirty_update
+AFTER UPDATE OF collaboration_role ON project_collaborators
+BEGIN
+    INSERT INTO project_score_dirty (project_id) VALUES (NEW.project_id)
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+-- 5. Cambios en la autoría de productos
+CREATE TRIGGER IF NOT EXISTS product_authors_score_dirty_insert
+AFTER INSERT ON product_authors
+BEGIN
+    INSERT INTO project_score_dirty (project_id)
+    SELECT project_id FROM products WHERE id = NEW.product_id
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS product_authors_score_dirty_delete
+AFTER DELETE ON product_authors
+BEGIN
+    INSERT INTO project_score_dirty (project_id)
+    SELECT project_id FROM products WHERE id = OLD.product_id
+    ON CONFLICT(project_id) DO UPDATE SET version = version + 1, marked_at = CURRENT_TIMESTAMP;
+END;
+
+-- 6. Marcar los proyectos que aún no tienen un score vigente
+INSERT OR IGNORE INTO project_score_dirty (project_id)
+SELECT p.id FROM projects p
+WHERE NOT EXISTS (
+    SELECT 1 FROM project_scores ps WHERE ps.project_id = p.id AND ps.is_current = 1
+);
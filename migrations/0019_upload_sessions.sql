@@ -0,0 +1,37 @@
+-- Migración 0019: Sesiones de subida multiparte (reanudables)
+-- Fecha: 2026-10-18
+-- Descripción: Estado de las subidas multiparte a R2. El binding de R2 no permite listar las
+--              partes ya subidas, por lo que se registran aquí para que el cliente pueda
+--              reanudar una subida interrumpida enviando solo las partes faltantes.
+
+-- 1. Sesiones abiertas (upload_id es el identificador de la subida multiparte en R2)
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    upload_id TEXT PRIMARY KEY,
+    object_key TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    entity_type TEXT NOT NULL CHECK (entity_type IN ('project', 'product')),
+    project_id INTEGER NOT NULL,
+    product_id INTEGER,
+    filename TEXT NOT NULL,
+    original_name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    part_size INTEGER NOT NULL,
+    total_parts INTEGER NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_user ON upload_sessions(user_id);
+
+-- 2. Partes recibidas de cada sesión
+CREATE TABLE IF NOT EXISTS upload_session_parts (
+    upload_id TEXT NOT NULL,
+    part_number INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    part_size INTEGER NOT NULL,
+    uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (upload_id, part_number),
+    FOREIGN KEY (upload_id) REFERENCES upload_sessions(upload_id) ON DELETE CASCADE
+) WITHOUT ROWID;
@@ -0,0 +1,34 @@
+-- Migración 0020: Almacenamiento de archivos deduplicado por contenido
+-- Fecha: 2026-10-18
+-- Descripción: Cada contenido distinto (SHA-256) se guarda una sola vez en R2. Las filas de
+--              files apuntan al blob compartido mediante blob_hash y el blob lleva la cuenta de
+--              referencias; el objeto de R2 solo se elimina cuando ya no quedan referencias.
+
+-- 1. Blobs por hash de contenido
+-- ref_count se reserva (+1) al registrar la subida, antes de insertar la fila en files, para
+-- que un borrado concurrente no elimine un blob que está a punto de reutilizarse. El trigger
+-- de la sección 3 lo decrementa al eliminar filas de files.
+CREATE TABLE IF NOT EXISTS file_blobs (
+    hash TEXT PRIMARY KEY,
+    object_key TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    mime_type TEXT,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Blobs pendientes de eliminar de R2
+CREATE INDEX IF NOT EXISTS idx_file_blobs_unreferenced ON file_blobs(ref_count) WHERE ref_count <= 0;
+
+-- 2. Referencia desde files (NULL en archivos anteriores a esta migración)
+ALTER TABLE files ADD COLUMN blob_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_files_blob_hash ON files(blob_hash);
+
+-- 3. Liberar la referencia al eliminar un archivo
+CREATE TRIGGER IF NOT EXISTS files_blob_release
+AFTER DELETE ON files
+WHEN OLD.blob_hash IS NOT NULL
+BEGIN
+    UPDATE file_blobs SET ref_count = ref_count - 1 WHERE hash = OLD.blob_hash;
+END;
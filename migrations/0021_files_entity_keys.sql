@@ -0,0 +1,58 @@
+-- Migración 0021: Claves enteras de proyecto y producto en files
+-- Fecha: 2026-10-18
+-- Descripción: files.entity_id es TEXT, por lo que los JOIN con projects/products necesitaban
+--              CAST y no podían usar índices. Se añaden project_id y product_id (INTEGER),
+--              rellenados a partir de entity_id y mantenidos por triggers. Los archivos de un
+--              producto también llevan el project_id de su proyecto.
+
+-- 1. Nuevas columnas
+ALTER TABLE files ADD COLUMN project_id INTEGER;
+ALTER TABLE files ADD COLUMN product_id INTEGER;
+
+-- 2. Relleno de los registros existentes (solo entity_id numéricos)
+UPDATE files
+SET project_id = CAST(entity_id AS INTEGER)
+WHERE entity_type = 'project' AND entity_id GLOB '[0-9]*' AND entity_id NOT GLOB '*[^0-9]*';
+
+UPDATE files
+SET product_id = CAST(entity_id AS INTEGER),
+    project_id = (SELECT pr.project_id FROM products pr WHERE pr.id = CAST(files.entity_id AS INTEGER))
+WHERE entity_type = 'product' AND entity_id GLOB '[0-9]*' AND entity_id NOT GLOB '*[^0-9]*';
+
+-- 3. Índices
+CREATE INDEX IF NOT EXISTS idx_files_project ON files(project_id);
+CREATE INDEX IF NOT EXISTS idx_files_product ON files(product_id);
+CREATE INDEX IF NOT EXISTS idx_files_filename ON files(filename);
+
+-- 4. Mantenimiento al insertar o cambiar la entidad de un archivo
+CREATE TRIGGER IF NOT EXISTS files_entity_keys_insert
+AFTER INSERT ON files
+WHEN NEW.entity_type IN ('project', 'product')
+BEGIN
+    UPDATE files
+    SET project_id = CASE
+            WHEN NEW.entity_type = 'project' THEN CAST(NEW.entity_id AS INTEGER)
+            ELSE (SELECT pr.project_id FROM products pr WHERE pr.id = CAST(NEW.entity_id AS INTEGER))
+        END,
+        product_id = CASE WHEN NEW.entity_type = 'product' THEN CAST(NEW.entity_id AS INTEGER) END
+    WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_entity_keys_update
+AFTER UPDATE OF entity_type, entity_id ON files
+BEGIN
+    UPDATE files
+    SET project_id = CASE
+            WHEN NEW.entity_type = 'project' THEN CAST(NEW.entity_id AS INTEGER)
+            WHEN NEW.entity_type = 'product' THEN (SELECT pr.project_id FROM products pr WHERE pr.id = CAST(NEW.entity_id AS INTEGER))
+        END,
+        product_id = CASE WHEN NEW.entity_type = 'product' THEN CAST(NEW.entity_id AS INTEGER) END
+    WHERE id = NEW.id;
+END;
+
+-- 5. Si un producto cambia de proyecto, sus archivos lo acompañan
+CREATE TRIGGER IF NOT EXISTS products_files_project_update
+AFTER UPDATE OF project_id ON products
+BEGIN
+    UPDATE files SET project_id = NEW.project_id WHERE product_id = NEW.id;
+END;
@@ -0,0 +1,107 @@
+-- Migración 0022: Contadores de uso de almacenamiento
+-- Fecha: 2026-10-18
+-- Descripción: Número de archivos y bytes por tipo de archivo, tipo de entidad, usuario que
+--              sube y proyecto, mantenidos por triggers sobre files. El dashboard de archivos
+--              los lee directamente en lugar de recorrer toda la tabla, y sirven de base para
+--              cuotas de almacenamiento por usuario. Los bytes son lógicos (por fila de files):
+--              un blob deduplicado cuenta una vez por cada archivo que lo referencia.
+
+-- 1. Contadores por dimensión
+-- dimension: 'total' (dimension_key = ''), 'file_type', 'entity_type', 'uploader' (id de
+-- usuario) o 'project' (id de proyecto, incluye los archivos de sus productos)
+CREATE TABLE IF NOT EXISTS file_storage_usage (
+    dimension TEXT NOT NULL,
+    dimension_key TEXT NOT NULL,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, dimension_key)
+) WITHOUT ROWID;
+
+-- Índice para el listado de archivos más grandes del dashboard
+CREATE INDEX IF NOT EXISTS idx_files_size ON files(file_size);
+
+-- 2. Carga inicial a partir de los archivos existentes
+DELETE FROM file_storage_usage;
+
+INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+SELECT 'total', '', COUNT(*), COALESCE(SUM(file_size), 0) FROM files;
+
+INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+SELECT 'file_type', file_type, COUNT(*), COALESCE(SUM(file_size), 0)
+FROM files WHERE file_type IS NOT NULL GROUP BY file_type;
+
+INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+SELECT 'entity_type', entity_type, COUNT(*), COALESCE(SUM(file_size), 0)
+FROM files WHERE entity_type IS NOT NULL GROUP BY entity_type;
+
+INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+SELECT 'uploader', CAST(uploaded_by AS TEXT), COUNT(*), COALESCE(SUM(file_size), 0)
+FROM files WHERE uploaded_by IS NOT NULL GROUP BY uploaded_by;
+
+INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+SELECT 'project', CAST(project_id AS TEXT), COUNT(*), COALESCE(SUM(file_size), 0)
+FROM files WHERE project_id IS NOT NULL GROUP BY project_id;
+
+-- 3. Triggers
+-- project_id se completa con files_entity_keys_insert justo después del INSERT, por lo que la
+-- dimensión de proyecto se ajusta en el trigger de UPDATE que esa actualización dispara.
+CREATE TRIGGER IF NOT EXISTS files_storage_usage_insert
+AFTER INSERT ON files
+BEGIN
+    INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+    SELECT dimension, dimension_key, 1, COALESCE(NEW.file_size, 0)
+    FROM (
+        SELECT 'total' AS dimension, '' AS dimension_key
+        UNION ALL SELECT 'file_type', NEW.file_type
+        UNION ALL SELECT 'entity_type', NEW.entity_type
+        UNION ALL SELECT 'uploader', CAST(NEW.uploaded_by AS TEXT)
+        UNION ALL SELECT 'project', CAST(NEW.project_id AS TEXT)
+    )
+    WHERE dimension_key IS NOT NULL
+    ON CONFLICT(dimension, dimension_key) DO UPDATE SET
+        file_count = file_count + excluded.file_count,
+        total_bytes = total_bytes + excluded.total_bytes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_storage_usage_delete
+AFTER DELETE ON files
+BEGIN
+    INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+    SELECT dimension, dimension_key, -1, -COALESCE(OLD.file_size, 0)
+    FROM (
+        SELECT 'total' AS dimension, '' AS dimension_key
+        UNION ALL SELECT 'file_type', OLD.file_type
+        UNION ALL SELECT 'entity_type', OLD.entity_type
+        UNION ALL SELECT 'uploader', CAST(OLD.uploaded_by AS TEXT)
+        UNION ALL SELECT 'project', CAST(OLD.project_id AS TEXT)
+    )
+    WHERE dimension_key IS NOT NULL
+    ON CONFLICT(dimension, dimension_key) DO UPDATE SET
+        file_count = file_count + excluded.file_count,
+        total_bytes = total_bytes + excluded.total_bytes;
+END;
+
+-- Cambios en las columnas contadas: se resta la fila anterior y se suma la nueva
+CREATE TRIGGER IF NOT EXISTS files_storage_usage_update
+AFTER UPDATE OF file_size, file_type, entity_type, uploaded_by, project_id ON files
+BEGIN
+    INSERT INTO file_storage_usage (dimension, dimension_key, file_count, total_bytes)
+    SELECT dimension, dimension_key, SUM(file_count), SUM(total_bytes)
+    FROM (
+        SELECT 'total' AS dimension, '' AS dimension_key, -1 AS file_count, -COALESCE(OLD.file_size, 0) AS total_bytes
+        UNION ALL SELECT 'file_type', OLD.file_type, -1, -COALESCE(OLD.file_size, 0)
+        UNION ALL SELECT 'entity_type', OLD.entity_type, -1, -COALESCE(OLD.file_size, 0)
+        UNION ALL SELECT 'uploader', CAST(OLD.uploaded_by AS TEXT), -1, -COALESCE(OLD.file_size, 0)
+        UNION ALL SELECT 'project', CAST(OLD.project_id AS TEXT), -1, -COALESCE(OLD.file_size, 0)
+        UNION ALL SELECT 'total', '', 1, COALESCE(NEW.file_size, 0)
+        UNION ALL SELECT 'file_type', NEW.file_type, 1, COALESCE(NEW.file_size, 0)
+        UNION ALL SELECT 'entity_type', NEW.entity_type, 1, COALESCE(NEW.file_size, 0)
+        UNION ALL SELECT 'uploader', CAST(NEW.uploaded_by AS TEXT), 1, COALESCE(NEW.file_size, 0)
+        UNION ALL SELECT 'project', CAST(NEW.project_id AS TEXT), 1, COALESCE(NEW.file_size, 0)
+    )
+    WHERE dimension_key IS NOT NULL
+    GROUP BY dimension, dimension_key
+    ON CONFLICT(dimension, dimension_key) DO UPDATE SET
+        file_count = file_count + excluded.file_count,
+        total_bytes = total_bytes + excluded.total_bytes;
+END;
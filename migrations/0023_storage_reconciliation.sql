@@ -0,0 +1,11 @@
+-- Migración 0023: Índices para la conciliación entre R2 y la tabla files
+-- Fecha: 2026-10-18
+-- Descripción: La conciliación recorre el bucket de R2 en orden de clave y compara cada página
+--              con el rango de claves equivalente en files y file_blobs. Ambas búsquedas (por
+--              clave concreta y por rango) necesitan índices sobre la clave del objeto.
+
+-- 1. Clave del objeto en R2 de cada archivo
+CREATE INDEX IF NOT EXISTS idx_files_file_path ON files(file_path);
+
+-- 2. Clave del objeto en R2 de cada blob
+CREATE INDEX IF NOT EXISTS idx_file_blobs_object_key ON file_blobs(object_key);
@@ -0,0 +1,17 @@
+-- Migración 0024: Instantáneas del panel de monitoreo
+-- Fecha: 2026-10-18
+-- Descripción: El panel de monitoreo consulta /api/admin/monitoring/overview cada 30 segundos.
+--              Los agregados se calculan como mucho una vez por intervalo y se guardan aquí
+--              (JSON), de modo que todas las instancias del Worker comparten la misma
+--              instantánea en lugar de recalcularla en cada petición.
+
+-- 1. Instantáneas por nombre
+-- generated_at y refresh_claimed_at en milisegundos desde epoch. refresh_claimed_at marca
+-- que una petición ya está regenerando la instantánea, para que las demás no lo repitan.
+CREATE TABLE IF NOT EXISTS monitoring_snapshots (
+    name TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    generated_at INTEGER NOT NULL,
+    generation_ms INTEGER NOT NULL DEFAULT 0,
+    refresh_claimed_at INTEGER
+);
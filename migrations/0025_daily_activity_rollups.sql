@@ -0,0 +1,112 @@
+-- Migración 0025: Contadores diarios para los gráficos de monitoreo
+-- Fecha: 2026-10-18
+-- Descripción: /api/admin/monitoring/real-time-stats agrupaba projects y products por día y
+--              mes en cada consulta (DATE(created_at) no puede usar índices). Los contadores
+--              por día se mantienen con triggers y el endpoint solo lee las filas del periodo,
+--              cuyo número depende de los días consultados y no del tamaño de las tablas.
+
+-- 1. Contadores por día
+-- metric: 'projects_created' y 'projects_completed' (proyectos creados ese día que están
+-- en estado COMPLETED, dimension_key = '') o 'products_created' (dimension_key = product_type)
+CREATE TABLE IF NOT EXISTS daily_activity_rollups (
+    metric TEXT NOT NULL,
+    day TEXT NOT NULL, -- YYYY-MM-DD
+    dimension_key TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, day, dimension_key)
+) WITHOUT ROWID;
+
+-- 2. Carga inicial a partir de los registros existentes
+DELETE FROM daily_activity_rollups;
+
+INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+SELECT 'projects_created', DATE(created_at), '', COUNT(*)
+FROM projects WHERE DATE(created_at) IS NOT NULL
+GROUP BY DATE(created_at);
+
+INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+SELECT 'projects_completed', DATE(created_at), '', COUNT(*)
+FROM projects WHERE DATE(created_at) IS NOT NULL AND status = 'COMPLETED'
+GROUP BY DATE(created_at);
+
+INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+SELECT 'products_created', DATE(created_at), IFNULL(product_type, ''), COUNT(*)
+FROM products WHERE DATE(created_at) IS NOT NULL
+GROUP BY DATE(created_at), IFNULL(product_type, '');
+
+-- 3. Triggers de proyectos
+CREATE TRIGGER IF NOT EXISTS projects_daily_rollups_insert
+AFTER INSERT ON projects
+BEGIN
+    INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+    SELECT metric, DATE(NEW.created_at), '', 1
+    FROM (
+        SELECT 'projects_created' AS metric
+        UNION ALL SELECT 'projects_completed' WHERE NEW.status = 'COMPLETED'
+    )
+    WHERE DATE(NEW.created_at) IS NOT NULL
+    ON CONFLICT(metric, day, dimension_key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_daily_rollups_delete
+AFTER DELETE ON projects
+BEGIN
+    INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+    SELECT metric, DATE(OLD.created_at), '', -1
+    FROM (
+        SELECT 'projects_created' AS metric
+        UNION ALL SELECT 'projects_completed' WHERE OLD.status = 'COMPLETED'
+    )
+    WHERE DATE(OLD.created_at) IS NOT NULL
+    ON CONFLICT(metric, day, dimension_key) DO UPDATE SET count = count + excluded.count;
+END;
+
+-- Se resta la fila anterior y se suma la nueva
+CREATE TRIGGER IF NOT EXISTS projects_daily_rollups_update
+AFTER UPDATE OF status, created_at ON projects
+BEGIN
+    INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+    SELECT metric, day, '', SUM(count)
+    FROM (
+        SELECT 'projects_created' AS metric, DATE(OLD.created_at) AS day, -1 AS count
+        UNION ALL SELECT 'projects_completed', DATE(OLD.created_at), -1 WHERE OLD.status = 'COMPLETED'
+        UNION ALL SELECT 'projects_created', DATE(NEW.created_at), 1
+        UNION ALL SELECT 'projects_completed', DATE(NEW.created_at), 1 WHERE NEW.status = 'COMPLETED'
+    )
+    WHERE day IS NOT NULL
+    GROUP BY metric, day
+    ON CONFLICT(metric, day, dimension_key) DO UPDATE SET count = count + excluded.count;
+END;
+
+-- 4. Triggers de productos
+CREATE TRIGGER IF NOT EXISTS products_daily_rollups_insert
+AFTER INSERT ON products
+WHEN DATE(NEW.created_at) IS NOT NULL
+BEGIN
+    INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+    VALUES ('products_created', DATE(NEW.created_at), IFNULL(NEW.product_type, ''), 1)
+    ON CONFLICT(metric, day, dimension_key) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_daily_rollups_delete
+AFTER DELETE ON products
+WHEN DATE(OLD.created_at) IS NOT NULL
+BEGIN
+    INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+    VALUES ('products_created', DATE(OLD.created_at), IFNULL(OLD.product_type, ''), -1)
+    ON CONFLICT(metric, day, dimension_key) DO UPDATE SET count = count - 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_daily_rollups_update
+AFTER UPDATE OF product_type, created_at ON products
+BEGIN
+    INSERT INTO daily_activity_rollups (metric, day, dimension_key, count)
+    SELECT 'products_created', day, dimension_key, SUM(count)
+    FROM (
+        SELECT DATE(OLD.created_at) AS day, IFNULL(OLD.product_type, '') AS dimension_key, -1 AS count
+        UNION ALL SELECT DATE(NEW.created_at), IFNULL(NEW.product_type, ''), 1
+    )
+    WHERE day IS NOT NULL
+    GROUP BY day, dimension_key
+    ON CONFLICT(metric, day, dimension_key) DO UPDATE SET count = count + excluded.count;
+END;
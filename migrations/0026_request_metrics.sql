@@ -0,0 +1,29 @@
+-- Migración 0026: Métricas de latencia por ruta y de consultas a D1
+-- Fecha: 2026-10-18
+-- Descripción: Cada instancia del Worker acumula en memoria, por ruta, el número de peticiones,
+--              un histograma de latencia y las consultas a D1 (número, duración, filas leídas y
+--              escritas), y cada minuto vuelca lo acumulado como una fila por ruta. El endpoint
+--              /api/admin/metrics combina las filas del periodo y calcula p50/p95/p99.
+
+-- 1. Ventanas de métricas por instancia y ruta
+-- route: método y patrón de la ruta (ej. 'GET /api/private/projects/:projectId/files')
+-- latency_histogram: JSON con el número de peticiones en cada tramo de LATENCY_BUCKETS_MS
+CREATE TABLE IF NOT EXISTS request_metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    window_start INTEGER NOT NULL, -- ms desde epoch
+    window_end INTEGER NOT NULL,   -- ms desde epoch
+    route TEXT NOT NULL,
+    request_count INTEGER NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0, -- respuestas 5xx
+    total_ms REAL NOT NULL DEFAULT 0,
+    max_ms REAL NOT NULL DEFAULT 0,
+    latency_histogram TEXT NOT NULL,
+    query_count INTEGER NOT NULL DEFAULT 0,
+    query_ms REAL NOT NULL DEFAULT 0,
+    max_queries INTEGER NOT NULL DEFAULT 0, -- máximo de consultas en una sola petición
+    rows_read INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER NOT NULL DEFAULT 0
+);
+
+-- Consultas por periodo y limpieza de ventanas antiguas
+CREATE INDEX IF NOT EXISTS idx_request_metrics_window ON request_metrics(window_end);
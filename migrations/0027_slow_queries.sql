@@ -0,0 +1,29 @@
+-- Migración 0027: Registro de consultas lentas por huella
+-- Fecha: 2026-10-18
+-- Descripción: El SQL de las rutas se construye concatenando fragmentos, por lo que una misma
+--              consulta aparece con textos distintos. Cada ejecución que supera el umbral
+--              (SLOW_QUERY_THRESHOLD_MS, por defecto 100 ms) se acumula en una fila por huella
+--              (SQL normalizado, ver queryFingerprint en src/utils/metrics.ts) junto con los
+--              tipos de sus parámetros y, una sola vez, la salida de EXPLAIN QUERY PLAN.
+--              /api/admin/slow-queries devuelve las consultas más costosas.
+
+-- 1. Consultas lentas agregadas por huella
+-- fingerprint: SHA-256 (16 primeros caracteres hex) de normalized_sql
+-- param_shapes: JSON con el tipo de cada parámetro de la última ejecución (nunca los valores)
+CREATE TABLE IF NOT EXISTS slow_queries (
+    fingerprint TEXT PRIMARY KEY,
+    name TEXT NOT NULL,            -- verbo y tabla principal (ej. 'select-files')
+    normalized_sql TEXT NOT NULL,
+    last_route TEXT,               -- ruta de la última ejecución lenta
+    occurrences INTEGER NOT NULL DEFAULT 0,
+    total_ms REAL NOT NULL DEFAULT 0,
+    max_ms REAL NOT NULL DEFAULT 0,
+    last_ms REAL NOT NULL DEFAULT 0,
+    param_shapes TEXT,
+    query_plan TEXT,               -- NULL hasta que se captura
+    first_seen_at INTEGER NOT NULL, -- ms desde epoch
+    last_seen_at INTEGER NOT NULL   -- ms desde epoch
+);
+
+-- Informe ordenado por tiempo acumulado
+CREATE INDEX IF NOT EXISTS idx_slow_queries_total_ms ON slow_queries(total_ms DESC);
@@ -0,0 +1,9 @@
+-- Migración 0028: Caducidad de las sesiones de subida multiparte
+-- Fecha: 2026-10-18
+-- Descripción: R2 aborta las subidas multiparte incompletas a los 7 días, pero las filas de
+--              upload_sessions y upload_session_parts quedaban para siempre. Al crear una sesión
+--              se eliminan las caducadas (ver expireUploadSessions en src/utils/upload.ts),
+--              buscándolas por fecha de creación.
+
+-- 1. Sesiones por antigüedad
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_created_at ON upload_sessions(created_at);
@@ -683,6 +683,12 @@ function renderNavigationItems({ isAdmin, isInvestigator }) {
             icon: 'fas fa-cog',
             label: 'Configuración del Sitio',
             show: isAdmin
+        },
+        {
+            id: 'admin-slow-queries',
+            icon: 'fas fa-stopwatch',
+            label: 'Consultas Lentas',
+            show: isAdmin
         }
     ];
 
@@ -873,7 +879,8 @@ const VIEW_RENDERERS = {
             renderMainDashboard();
         }
     },
-    'admin-site-config': renderAdminSiteConfigView
+    'admin-site-config': renderAdminSiteConfigView,
+    'admin-slow-queries': renderAdminSlowQueriesView
 };
 
 // Sistema de navegación con URLs independientes
@@ -3569,12 +3576,13 @@ async function loadMonitoringOverview() {
         if (response.data.success) {
             const data = response.data.data;
             
-            // Actualizar timestamp
+            // Actualizar timestamp (momento en que el servidor calculó los agregados)
             const lastUpdatedEl = document.getElementById('last-updated');
             if (lastUpdatedEl) {
+                const lastUpdated = data.last_updated ? new Date(data.last_updated) : new Date();
                 lastUpdatedEl.innerHTML = `
                     <i class="fas fa-clock mr-1"></i>
-                    Actualizado: ${new Date().toLocaleTimeString()}
+                    Actualizado: ${lastUpdated.toLocaleTimeString()}
                 `;
             }
             
@@ -5521,6 +5529,141 @@ function renderAdminCategoriesView() {
     loadAdminCategories();
 }
 
+// ===== CONSULTAS LENTAS (ADMIN) =====
+
+function renderAdminSlowQueriesView() {
+    document.getElementById('content').innerHTML = `
+        <div class="mb-6">
+            <div class="flex justify-between items-center">
+                <div>
+                    <h2 class="text-2xl font-bold">Consultas Lentas</h2>
+                    <p class="text-muted-foreground" id="slowQueriesSubtitle">Consultas a la base de datos que superan el umbral, agrupadas por huella</p>
+                </div>
+                <div class="flex items-center space-x-2">
+                    <select 
+                        id="slowQueriesSort"
+                        onchange="loadAdminSlowQueries()"
+                        class="px-3 py-2 border border-border rounded-lg bg-background"
+                    >
+                        <option value="total">Tiempo acumulado</option>
+                        <option value="avg">Tiempo medio</option>
+                        <option value="max">Tiempo máximo</option>
+                        <option value="occurrences">Ocurrencias</option>
+                    </select>
+                    <button 
+                        onclick="clearAdminSlowQueries()" 
+                        class="bg-destructive text-destructive-foreground px-4 py-2 rounded-lg hover:opacity-90 transition-opacity"
+                    >
+                        <i class="fas fa-trash mr-2"></i>
+                        Vaciar registro
+                    </button>
+                </div>
+            </div>
+        </div>
+        
+        <div class="card">
+            <div class="p-6">
+                <div id="slowQueriesContainer">
+                    <div class="flex justify-center py-8">
+                        <div class="spinner"></div>
+                    </div>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    loadAdminSlowQueries();
+}
+
+async function loadAdminSlowQueries() {
+    const container = document.getElementById('slowQueriesContainer');
+    const sort = document.getElementById('slowQueriesSort')?.value || 'total';
+    
+    try {
+        const response = await axios.get(`${API_BASE}/admin/slow-queries?sort=${sort}&limit=50`);
+        
+        if (response.data.success) {
+            const { threshold_ms, queries } = response.data.data;
+            document.getElementById('slowQueriesSubtitle').textContent =
+                `Consultas a la base de datos que superan ${threshold_ms} ms, agrupadas por huella`;
+            
+            if (queries.length === 0) {
+                container.innerHTML = `
+                    <div class="text-center py-8">
+                        <i class="fas fa-stopwatch text-4xl text-muted-foreground mb-4"></i>
+                        <p class="text-muted-foreground">No hay consultas lentas registradas</p>
+                    </div>
+                `;
+                return;
+            }
+            
+            container.innerHTML = `
+                <div class="grid grid-cols-1 gap-4">
+                    ${queries.map(query => `
+                        <div class="border border-border rounded-lg p-4 ${query.full_scan ? 'border-l-4 border-l-red-500' : ''}">
+                            <div class="flex justify-between items-start mb-2">
+                                <div class="flex items-center gap-3">
+                                    <span class="font-mono text-sm bg-muted px-2 py-1 rounded">${escapeHtml(query.name)}</span>
+                                    ${query.full_scan ? `
+                                        <span class="text-xs bg-red-500 text-white px-2 py-1 rounded" title="El plan recorre una tabla completa sin índice">
+                                            <i class="fas fa-exclamation-triangle mr-1"></i>Full scan
+                                        </span>
+                                    ` : ''}
+                                </div>
+                                <span class="text-xs text-muted-foreground">${escapeHtml(query.last_route || '')}</span>
+                            </div>
+                            <div class="flex items-center text-sm space-x-6 mb-3">
+                                <span><strong>${query.occurrences}</strong> ocurrencias</span>
+                                <span>Media: <strong>${query.avg_ms} ms</strong></span>
+                                <span>Máx: <strong>${query.max_ms} ms</strong></span>
+                                <span class="text-muted-foreground">Total: ${query.total_ms} ms</span>
+                                <span class="text-muted-foreground">Última: ${formatDate(query.last_seen_at)}</span>
+                            </div>
+                            <pre class="text-xs bg-muted p-2 rounded overflow-x-auto whitespace-pre-wrap mb-2">${escapeHtml(query.sql)}</pre>
+                            <details>
+                                <summary class="text-sm cursor-pointer text-primary">Plan de ejecución</summary>
+                                <pre class="text-xs bg-muted p-2 rounded overflow-x-auto mt-2">${escapeHtml(query.query_plan || 'Plan aún no capturado')}</pre>
+                            </details>
+                        </div>
+                    `).join('')}
+                </div>
+            `;
+        } else {
+            throw new Error(response.data.error || 'Error al cargar consultas lentas');
+        }
+        
+    } catch (error) {
+        console.error('Error cargando consultas lentas:', error);
+        container.innerHTML = `
+            <div class="text-center py-8">
+                <i class="fas fa-exclamation-triangle text-4xl text-destructive mb-4"></i>
+                <p class="text-destructive">Error al cargar las consultas lentas</p>
+            </div>
+        `;
+    }
+}
+
+async function clearAdminSlowQueries() {
+    if (!confirm('¿Vaciar el registro de consultas lentas?')) {
+        return;
+    }
+    
+    try {
+        const response = await axios.delete(`${API_BASE}/admin/slow-queries`);
+        
+        if (response.data.success) {
+            showToast('Registro de consultas lentas vaciado', 'success');
+            loadAdminSlowQueries();
+        } else {
+            throw new Error(response.data.error || 'Error al vaciar el registro');
+        }
+        
+    } catch (error) {
+        console.error('Error vaciando consultas lentas:', error);
+        showToast(error.response?.data?.error || 'Error al vaciar el registro', 'error');
+    }
+}
+
 // ===== GESTIÓN DE PRODUCTOS ADMIN =====
 
 function renderAdminProductsView() {
@@ -6823,8 +6966,9 @@ async function loadDashboardSiteLogo() {
         const siteName = response.data.data?.site_name || 'CODECTI CHOCÓ';
         
         if (response.data.success && response.data.data.logo_url) {
-            // Usar logo personalizado desde admin - SOLO IMAGEN
-            const logoUrl = response.data.data.logo_url;
+            // Usar logo personalizado desde admin - SOLO IMAGEN (versión reducida si está en R2)
+            const configuredLogoUrl = response.data.data.logo_url;
+            const logoUrl = configuredLogoUrl.startsWith('/api/admin/logo/') ? `${configuredLogoUrl}?size=sm` : configuredLogoUrl;
             
             logoContainer.innerHTML = `
                 <img 
@@ -7472,7 +7616,7 @@ async function loadProjectFiles(projectId) {
                             <div class="border border-border rounded-lg p-3 hover:bg-accent/50 transition-colors">
                                 <div class="flex items-start space-x-3">
                                     <div class="flex-shrink-0">
-                                        ${FileManager.getFileIcon(file.mime_type)}
+                                        ${FileManager.renderFilePreview(file)}
                                     </div>
                                     <div class="flex-1 min-w-0">
                                         <p class="font-medium text-foreground truncate" title="${file.original_name}">
@@ -7499,6 +7643,7 @@ async function loadProjectFiles(projectId) {
                     </div>
                 </div>
             `;
+            FileManager.hydrateThumbnails(container);
             
         } else {
             throw new Error(response.data.error || 'Error al cargar archivos');
@@ -7556,7 +7701,7 @@ async function loadProductFilesForTab(projectId, productId) {
                             <div class="border border-border rounded-lg p-3 hover:bg-accent/50 transition-colors">
                                 <div class="flex items-start space-x-3">
                                     <div class="flex-shrink-0">
-                                        ${FileManager.getFileIcon(file.mime_type)}
+                                        ${FileManager.renderFilePreview(file)}
                                     </div>
                                     <div class="flex-1 min-w-0">
                                         <p class="font-medium text-foreground truncate" title="${file.original_name}">
@@ -7583,6 +7728,7 @@ async function loadProductFilesForTab(projectId, productId) {
                     </div>
                 </div>
             `;
+            FileManager.hydrateThumbnails(container);
             
         } else {
             throw new Error(response.data.error || 'Error al cargar archivos');
@@ -7626,7 +7772,7 @@ function renderFilesList(files) {
             <div class="flex items-center justify-between">
                 <div class="flex items-center space-x-4">
                     <div class="ctei-file-icon">
-                        ${FileManager.getFileIcon(file.mime_type)}
+                        ${FileManager.renderFilePreview(file)}
                     </div>
                     <div class="flex-1">
                         <div class="flex items-center space-x-2">
@@ -7687,6 +7833,9 @@ function renderFilesList(files) {
         </div>
         `;
     }).join('');
+    
+    // Cargar miniaturas de las imágenes (kilobytes en lugar del archivo original)
+    FileManager.hydrateThumbnails(container);
 }
 
 // Filtrar archivos
@@ -7942,9 +8091,9 @@ async function loadBulkUploadContent() {
                         Arrastra múltiples archivos aquí o haz click para seleccionar
                     </p>
                     <p class="text-sm text-muted-foreground">
-                        PDFs, imágenes y documentos • Máximo 15MB por archivo
+                        PDFs, imágenes, documentos y datasets • Máximo 500MB por archivo (los archivos grandes se suben por partes y se reanudan si se corta la conexión)
                     </p>
-                    <input type="file" id="bulkFileInput" multiple class="hidden" accept=".pdf,.jpg,.jpeg,.png,.webp,.doc,.docx,.txt">
+                    <input type="file" id="bulkFileInput" multiple class="hidden" accept=".pdf,.jpg,.jpeg,.png,.webp,.doc,.docx,.txt,.csv,.xls,.xlsx,.zip">
                 </div>
                 
                 <div id="bulkUploadProgress" class="hidden">
@@ -8053,7 +8202,8 @@ async function startBulkUpload() {
     let successCount = 0;
     let errorCount = 0;
     
-    for (const file of files) {
+    // Todas las filas se crean de antemano: los archivos se suben en lotes paralelos
+    const fileDivs = files.map(file => {
         const fileDiv = document.createElement('div');
         fileDiv.className = 'flex items-center justify-between p-3 bg-card rounded-lg';
         fileDiv.innerHTML = `
@@ -8063,26 +8213,37 @@ async function startBulkUpload() {
             </div>
             <div class="flex items-center space-x-2">
                 <div class="w-4 h-4">
-                    <i class="fas fa-spinner fa-spin text-yellow-600"></i>
+                    <i class="fas fa-clock text-muted-foreground"></i>
                 </div>
-                <span class="text-xs text-muted-foreground">Subiendo...</span>
+                <span class="text-xs text-muted-foreground">En cola</span>
             </div>
         `;
         progressList.appendChild(fileDiv);
+        return fileDiv;
+    });
+    
+    await FileManager.uploadFilesBulk(projectId, files, (index, update) => {
+        const fileDiv = fileDivs[index];
+        const status = fileDiv.querySelector('.text-xs');
+        const icon = fileDiv.querySelector('.w-4');
         
-        try {
-            await FileManager.uploadFile('project', projectId, file);
-            fileDiv.querySelector('.w-4').innerHTML = '<i class="fas fa-check-circle text-green-600"></i>';
-            fileDiv.querySelector('.text-xs').textContent = 'Completado';
-            fileDiv.querySelector('.text-xs').className = 'text-xs text-green-600';
+        if (update.status === 'uploading') {
+            if (!icon.querySelector('.fa-spinner')) {
+                icon.innerHTML = '<i class="fas fa-spinner fa-spin text-yellow-600"></i>';
+            }
+            status.textContent = `Subiendo... ${update.progress || 0}%`;
+        } else if (update.status === 'done') {
+            icon.innerHTML = '<i class="fas fa-check-circle text-green-600"></i>';
+            status.textContent = 'Completado';
+            status.className = 'text-xs text-green-600';
             successCount++;
-        } catch (error) {
-            fileDiv.querySelector('.w-4').innerHTML = '<i class="fas fa-exclamation-circle text-red-600"></i>';
-            fileDiv.querySelector('.text-xs').textContent = `Error: ${error.message}`;
-            fileDiv.querySelector('.text-xs').className = 'text-xs text-red-600';
+        } else if (update.status === 'error') {
+            icon.innerHTML = '<i class="fas fa-exclamation-circle text-red-600"></i>';
+            status.textContent = `Error: ${update.error}`;
+            status.className = 'text-xs text-red-600';
             errorCount++;
         }
-    }
+    });
     
     // Mostrar resumen
     const summaryDiv = document.createElement('div');
@@ -9474,7 +9635,7 @@ async function loadProjectFiles(projectId) {
                         <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-3">
                             ${files.map(file => `
                                 <div class="flex items-center space-x-3 p-3 border border-border rounded hover:bg-muted">
-                                    <i class="fas ${getFileIcon(file.file_type)} text-primary text-lg"></i>
+                                    ${FileManager.renderFilePreview(file, `<i class="fas ${getFileIcon(file.file_type)} text-primary text-lg"></i>`)}
                                     <div class="flex-1 min-w-0">
                                         <p class="font-medium text-sm truncate">${file.original_name}</p>
                                         <p class="text-xs text-muted-foreground">${formatFileSize(file.file_size)}</p>
@@ -9494,6 +9655,7 @@ async function loadProjectFiles(projectId) {
                         </div>
                     </div>
                 `;
+                FileManager.hydrateThumbnails(container);
             } else {
                 container.innerHTML = `
                     <div class="p-4 text-center">
@@ -20,6 +20,31 @@ const FILE_CONFIG = {
     }
 };
 
+// Subidas reanudables por partes (R2 multipart) para archivos grandes y conjuntos de datos
+const RESUMABLE_UPLOAD_CONFIG = {
+    threshold: 8 * 1024 * 1024,      // Por encima de este tamaño el archivo se sube por partes
+    maxSize: 500 * 1024 * 1024,      // 500MB
+    concurrency: 3,                  // Partes subiendo en paralelo
+    maxRetries: 5,                   // Reintentos por parte ante fallos de red o del servidor
+    datasetTypes: [
+        'text/csv',
+        'application/vnd.ms-excel',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'application/zip',
+        'application/x-zip-compressed'
+    ],
+    description: 'conjuntos de datos (CSV, Excel, ZIP)'
+};
+
+// Subida masiva: los archivos pequeños se agrupan en lotes (una petición y un único registro
+// en base de datos por lote) y se envían varios lotes a la vez
+const BULK_UPLOAD_CONFIG = {
+    maxFilesPerBatch: 25,
+    maxBatchBytes: 60 * 1024 * 1024, // 60MB por lote
+    concurrency: 3,                  // Lotes (o archivos grandes) subiendo en paralelo
+    maxRetries: 3
+};
+
 // ===== FUNCIONES DE VALIDACIÓN =====
 function validateFile(file, type) {
     const config = FILE_CONFIG[type];
@@ -27,15 +52,15 @@ function validateFile(file, type) {
         return { valid: false, error: 'Tipo de entidad no válida' };
     }
     
-    if (!config.allowedTypes.includes(file.type)) {
+    if (!config.allowedTypes.includes(file.type) && !RESUMABLE_UPLOAD_CONFIG.datasetTypes.includes(file.type)) {
         return { 
             valid: false, 
-            error: `Tipo de archivo no permitido. Permitidos: ${config.description}` 
+            error: `Tipo de archivo no permitido. Permitidos: ${config.description}, ${RESUMABLE_UPLOAD_CONFIG.description}` 
         };
     }
     
-    if (file.size > config.maxSize) {
-        const maxMB = Math.round(config.maxSize / (1024 * 1024));
+    if (file.size > RESUMABLE_UPLOAD_CONFIG.maxSize) {
+        const maxMB = Math.round(RESUMABLE_UPLOAD_CONFIG.maxSize / (1024 * 1024));
         return { 
             valid: false, 
             error: `El archivo no puede superar ${maxMB}MB` 
@@ -61,8 +86,57 @@ function getFileIcon(mimeType) {
     return '📎';
 }
 
+// ===== MINIATURAS =====
+// Las imágenes se muestran con una miniatura generada por el servidor en lugar del original.
+// Las rutas privadas exigen el token en la cabecera Authorization, así que <img src> no sirve:
+// se piden con axios como blob (el navegador las conserva en caché por ser inmutables).
+const THUMBNAIL_MIME_TYPES = ['image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'image/gif'];
+
+function getThumbnailUrl(file, size = 'sm') {
+    if (!file.filename || !THUMBNAIL_MIME_TYPES.includes(file.mime_type)) return null;
+    return `${API_BASE}/private/files/thumbnail/${encodeURIComponent(file.filename)}?size=${size}`;
+}
+
+// Marcador que muestra el icono hasta que hydrateThumbnails cargue la miniatura
+function renderFilePreview(file, fallbackHtml = getFileIcon(file.mime_type || ''), size = 'sm') {
+    const thumbnailUrl = getThumbnailUrl(file, size);
+    if (!thumbnailUrl) return fallbackHtml;
+    return `<span class="ctei-file-thumbnail inline-flex items-center justify-center" data-thumbnail-src="${thumbnailUrl}">${fallbackHtml}</span>`;
+}
+
+async function hydrateThumbnails(root = document) {
+    const placeholders = Array.from(root.querySelectorAll('[data-thumbnail-src]'));
+    
+    await Promise.all(placeholders.map(async (placeholder) => {
+        const src = placeholder.getAttribute('data-thumbnail-src');
+        placeholder.removeAttribute('data-thumbnail-src');
+        
+        try {
+            const response = await axios.get(src, {
+                responseType: 'blob',
+                headers: getAuthHeaders()
+            });
+            const objectUrl = URL.createObjectURL(response.data);
+            const img = document.createElement('img');
+            img.src = objectUrl;
+            img.alt = '';
+            img.className = 'w-10 h-10 object-cover rounded';
+            img.onload = () => URL.revokeObjectURL(objectUrl);
+            placeholder.replaceChildren(img);
+        } catch (error) {
+            // Sin miniatura disponible (p. ej. PDF o servicio de imágenes no configurado): se mantiene el icono
+        }
+    }));
+}
+
+// Los archivos grandes y los conjuntos de datos se suben por partes
+function requiresResumableUpload(file, entityType) {
+    const config = FILE_CONFIG[entityType];
+    return file.size > RESUMABLE_UPLOAD_CONFIG.threshold || !config.allowedTypes.includes(file.type);
+}
+
 // ===== SUBIDA DE ARCHIVOS =====
-async function uploadFile(entityType, entityId, file, additionalData = {}) {
+async function uploadFile(entityType, entityId, file, additionalData = {}, onProgress = null) {
     try {
         // Validar archivo
         const validation = validateFile(file, entityType);
@@ -70,6 +144,10 @@ async function uploadFile(entityType, entityId, file, additionalData = {}) {
             throw new Error(validation.error);
         }
         
+        if (requiresResumableUpload(file, entityType)) {
+            return await uploadFileResumable(entityType, entityId, file, additionalData, onProgress);
+        }
+        
         // Preparar FormData
         const formData = new FormData();
         formData.append('file', file);
@@ -95,9 +173,7 @@ async function uploadFile(entityType, entityId, file, additionalData = {}) {
         // Realizar upload con progress
         const response = await fetch(endpoint, {
             method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${localStorage.getItem('token')}`
-            },
+            headers: getAuthHeaders(),
             body: formData
         });
         
@@ -115,6 +191,367 @@ async function uploadFile(entityType, entityId, file, additionalData = {}) {
     }
 }
 
+// ===== SUBIDA REANUDABLE POR PARTES =====
+// Flujo: crear sesión → subir partes en paralelo (con reintentos) → completar.
+// El upload_id se guarda en localStorage por archivo (nombre, tamaño y fecha de modificación):
+// si la subida se interrumpe, al volver a elegir el mismo archivo solo se envían las partes
+// que el servidor aún no tiene.
+const UPLOADS_ENDPOINT = `${API_BASE}/private/uploads`;
+
+// El dashboard guarda la sesión en auth_token; se mantiene token por compatibilidad
+function getAuthHeaders() {
+    const token = localStorage.getItem('auth_token') || localStorage.getItem('token');
+    return { 'Authorization': `Bearer ${token}` };
+}
+
+function getResumeKey(entityType, entityId, file) {
+    return `ctei-upload:${entityType}:${entityId}:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+async function fetchUploadJSON(url, options = {}) {
+    const response = await fetch(url, {
+        ...options,
+        headers: { ...getAuthHeaders(), ...(options.headers || {}) }
+    });
+    const result = await response.json().catch(() => null);
+    
+    if (!response.ok || !result || !result.success) {
+        const error = new Error((result && result.error) || `Error ${response.status} en la subida`);
+        error.status = response.status;
+        error.data = result && result.data;
+        throw error;
+    }
+    
+    return result.data;
+}
+
+// Envía una parte con XMLHttpRequest para conocer el progreso real de bytes enviados
+function sendUploadPart(uploadId, partNumber, blob, onPartProgress) {
+    return new Promise((resolve, reject) => {
+        const xhr = new XMLHttpRequest();
+        xhr.open('PUT', `${UPLOADS_ENDPOINT}/${encodeURIComponent(uploadId)}/parts/${partNumber}`);
+        xhr.setRequestHeader('Authorization', getAuthHeaders().Authorization);
+        xhr.setRequestHeader('Content-Type', 'application/octet-stream');
+        
+        xhr.upload.onprogress = (e) => onPartProgress(e.loaded);
+        
+        xhr.onload = () => {
+            let result = null;
+            try {
+                result = JSON.parse(xhr.responseText);
+            } catch (e) {
+                // Respuesta no JSON (p. ej. error del proxy)
+            }
+            
+            if (xhr.status >= 200 && xhr.status < 300 && result && result.success) {
+                resolve(result.data);
+                return;
+            }
+            
+            const error = new Error((result && result.error) || `Error ${xhr.status} subiendo la parte ${partNumber}`);
+            error.status = xhr.status;
+            error.retryable = xhr.status >= 500 || xhr.status === 408 || xhr.status === 429;
+            reject(error);
+        };
+        
+        xhr.onerror = xhr.ontimeout = () => {
+            const error = new Error(`Conexión interrumpida subiendo la parte ${partNumber}`);
+            error.retryable = true;
+            reject(error);
+        };
+        
+        xhr.send(blob);
+    });
+}
+
+function waitForRetry(attempt) {
+    const delay = Math.min(30000, 1000 * Math.pow(2, attempt)) + Math.random() * 500;
+    return new Promise(resolve => setTimeout(resolve, delay));
+}
+
+async function uploadFileResumable(entityType, entityId, file, additionalData = {}, onProgress = null) {
+    const projectId = entityType === 'project' ? entityId : additionalData.projectId;
+    if (!projectId) throw new Error('ID de proyecto requerido para productos');
+    
+    const resumeKey = getResumeKey(entityType, entityId, file);
+    let session = null;
+    
+    // Reanudar una sesión previa del mismo archivo si el servidor aún la conserva
+    const savedUploadId = localStorage.getItem(resumeKey);
+    if (savedUploadId) {
+        try {
+            session = await fetchUploadJSON(`${UPLOADS_ENDPOINT}/${encodeURIComponent(savedUploadId)}`);
+        } catch (error) {
+            localStorage.removeItem(resumeKey);
+        }
+    }
+    
+    if (!session) {
+        session = await fetchUploadJSON(UPLOADS_ENDPOINT, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                entity_type: entityType,
+                project_id: projectId,
+                product_id: entityType === 'product' ? entityId : undefined,
+                filename: file.name,
+                file_size: file.size,
+                mime_type: file.type
+            })
+        });
+        localStorage.setItem(resumeKey, session.upload_id);
+    }
+    
+    const { upload_id: uploadId, part_size: partSize, total_parts: totalParts } = session;
+    const partBounds = (partNumber) => {
+        const start = (partNumber - 1) * partSize;
+        return [start, Math.min(start + partSize, file.size)];
+    };
+    
+    // Progreso: bytes de partes completas más bytes en vuelo de las partes en curso
+    const uploadedParts = new Set(session.uploaded_parts);
+    let completedBytes = 0;
+    uploadedParts.forEach(partNumber => {
+        const [start, end] = partBounds(partNumber);
+        completedBytes += end - start;
+    });
+    const inFlightBytes = new Map();
+    const reportProgress = () => {
+        if (!onProgress) return;
+        let loaded = completedBytes;
+        inFlightBytes.forEach(bytes => { loaded += bytes; });
+        onProgress(Math.min(100, Math.round((loaded / file.size) * 100)), loaded, file.size);
+    };
+    reportProgress();
+    
+    const pendingParts = [];
+    for (let partNumber = 1; partNumber <= totalParts; partNumber++) {
+        if (!uploadedParts.has(partNumber)) pendingParts.push(partNumber);
+    }
+    
+    let failure = null;
+    
+    async function uploadPartWithRetry(partNumber) {
+        const [start, end] = partBounds(partNumber);
+        const blob = file.slice(start, end);
+        
+        for (let attempt = 0; ; attempt++) {
+            try {
+                await sendUploadPart(uploadId, partNumber, blob, (loaded) => {
+                    inFlightBytes.set(partNumber, loaded);
+                    reportProgress();
+                });
+                inFlightBytes.delete(partNumber);
+                completedBytes += end - start;
+                reportProgress();
+                return;
+            } catch (error) {
+                inFlightBytes.delete(partNumber);
+                reportProgress();
+                
+                if (error.status === 404) {
+                    // La sesión ya no existe en el servidor: la próxima vez se empieza de cero
+                    localStorage.removeItem(resumeKey);
+                }
+                if (!error.retryable || attempt >= RESUMABLE_UPLOAD_CONFIG.maxRetries || failure) {
+                    throw error;
+                }
+                await waitForRetry(attempt);
+            }
+        }
+    }
+    
+    // Cada trabajador toma la siguiente parte pendiente; si una parte agota sus reintentos
+    // los demás terminan la parte en curso y se detienen (la sesión queda para reanudar)
+    const workers = Array.from(
+        { length: Math.min(RESUMABLE_UPLOAD_CONFIG.concurrency, pendingParts.length) },
+        async () => {
+            while (pendingParts.length > 0 && !failure) {
+                const partNumber = pendingParts.shift();
+                try {
+                    await uploadPartWithRetry(partNumber);
+                } catch (error) {
+                    failure = failure || error;
+                }
+            }
+        }
+    );
+    await Promise.all(workers);
+    
+    if (failure) {
+        throw new Error(`${failure.message}. Vuelve a seleccionar el archivo para reanudar la subida.`);
+    }
+    
+    const result = await fetchUploadJSON(`${UPLOADS_ENDPOINT}/${encodeURIComponent(uploadId)}/complete`, {
+        method: 'POST'
+    });
+    localStorage.removeItem(resumeKey);
+    
+    return result;
+}
+
+// Cancelar una subida reanudable pendiente de un archivo
+async function cancelResumableUpload(entityType, entityId, file) {
+    const resumeKey = getResumeKey(entityType, entityId, file);
+    const uploadId = localStorage.getItem(resumeKey);
+    if (!uploadId) return;
+    
+    localStorage.removeItem(resumeKey);
+    await fetchUploadJSON(`${UPLOADS_ENDPOINT}/${encodeURIComponent(uploadId)}`, { method: 'DELETE' });
+}
+
+// ===== SUBIDA MASIVA =====
+// Envía un lote con XMLHttpRequest para conocer el progreso; el servidor responde el
+// resultado de cada archivo del lote.
+// El endpoint no es idempotente: una vez enviado el cuerpo completo el servidor pudo haber
+// registrado el lote aunque la respuesta se pierda, así que solo se reintenta si el envío
+// no terminó (o si el servidor lo rechazó por límite de peticiones).
+function sendBulkBatch(projectId, files, onBatchProgress) {
+    return new Promise((resolve, reject) => {
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file));
+        
+        const xhr = new XMLHttpRequest();
+        xhr.open('POST', `${API_BASE}/private/projects/${encodeURIComponent(projectId)}/files/bulk`);
+        xhr.setRequestHeader('Authorization', getAuthHeaders().Authorization);
+        
+        let bodySent = false;
+        xhr.upload.onprogress = (e) => onBatchProgress(e.loaded, e.total);
+        xhr.upload.onload = () => { bodySent = true; };
+        
+        xhr.onload = () => {
+            let result = null;
+            try {
+                result = JSON.parse(xhr.responseText);
+            } catch (e) {
+                // Respuesta no JSON (p. ej. error del proxy)
+            }
+            
+            if (xhr.status >= 200 && xhr.status < 300 && result && result.success) {
+                resolve(result.data);
+                return;
+            }
+            
+            const error = new Error((result && result.error) || `Error ${xhr.status} subiendo el lote`);
+            error.status = xhr.status;
+            error.retryable = xhr.status === 429 ||
+                (!bodySent && (xhr.status >= 500 || xhr.status === 408));
+            reject(error);
+        };
+        
+        xhr.onerror = xhr.ontimeout = () => {
+            const error = new Error(bodySent
+                ? 'Conexión interrumpida tras enviar el lote; revisa la lista de archivos antes de volver a subirlo'
+                : 'Conexión interrumpida subiendo el lote');
+            error.retryable = !bodySent;
+            reject(error);
+        };
+        
+        xhr.send(formData);
+    });
+}
+
+// Sube muchos archivos a un proyecto. onFileUpdate(index, { status, progress, error }) informa
+// del estado de cada archivo ('uploading', 'done' o 'error'). Devuelve un resultado por archivo.
+async function uploadFilesBulk(projectId, files, onFileUpdate = null) {
+    const notify = (index, update) => { if (onFileUpdate) onFileUpdate(index, update); };
+    const results = new Array(files.length);
+    const fail = (index, message) => {
+        results[index] = { success: false, error: message };
+        notify(index, { status: 'error', error: message });
+    };
+    
+    // Lotes de archivos pequeños; los grandes y los conjuntos de datos van por partes
+    const batches = [];
+    const resumable = [];
+    let current = null;
+    files.forEach((file, index) => {
+        const validation = validateFile(file, 'project');
+        if (!validation.valid) {
+            fail(index, validation.error);
+            return;
+        }
+        if (requiresResumableUpload(file, 'project')) {
+            resumable.push(index);
+            return;
+        }
+        if (!current ||
+            current.indexes.length >= BULK_UPLOAD_CONFIG.maxFilesPerBatch ||
+            current.bytes + file.size > BULK_UPLOAD_CONFIG.maxBatchBytes) {
+            current = { indexes: [], bytes: 0 };
+            batches.push(current);
+        }
+        current.indexes.push(index);
+        current.bytes += file.size;
+    });
+    
+    async function uploadBatch(batch) {
+        const batchFiles = batch.indexes.map(index => files[index]);
+        // Reparte los bytes enviados del lote entre sus archivos, en orden
+        const reportProgress = (loaded, total) => {
+            const scale = total > 0 ? batch.bytes / total : 1;
+            let offset = 0;
+            batch.indexes.forEach(index => {
+                const size = files[index].size;
+                const sent = Math.min(Math.max(loaded * scale - offset, 0), size);
+                notify(index, { status: 'uploading', progress: size > 0 ? Math.round((sent / size) * 100) : 100 });
+                offset += size;
+            });
+        };
+        
+        for (let attempt = 0; ; attempt++) {
+            try {
+                reportProgress(0, batch.bytes);
+                const data = await sendBulkBatch(projectId, batchFiles, reportProgress);
+                data.results.forEach(result => {
+                    const index = batch.indexes[result.index];
+                    if (result.success) {
+                        results[index] = result;
+                        notify(index, { status: 'done', progress: 100 });
+                    } else {
+                        fail(index, result.error);
+                    }
+                });
+                return;
+            } catch (error) {
+                if (!error.retryable || attempt >= BULK_UPLOAD_CONFIG.maxRetries) {
+                    batch.indexes.forEach(index => fail(index, error.message));
+                    return;
+                }
+                await waitForRetry(attempt);
+            }
+        }
+    }
+    
+    async function uploadLargeFile(index) {
+        try {
+            notify(index, { status: 'uploading', progress: 0 });
+            results[index] = await uploadFile('project', projectId, files[index], {}, (progress) => {
+                notify(index, { status: 'uploading', progress });
+            });
+            notify(index, { status: 'done', progress: 100 });
+        } catch (error) {
+            fail(index, error.message);
+        }
+    }
+    
+    const tasks = [
+        ...batches.map(batch => () => uploadBatch(batch)),
+        ...resumable.map(index => () => uploadLargeFile(index))
+    ];
+    const workers = Array.from(
+        { length: Math.min(BULK_UPLOAD_CONFIG.concurrency, tasks.length) },
+        async () => {
+            while (tasks.length > 0) {
+                await tasks.shift()();
+            }
+        }
+    );
+    await Promise.all(workers);
+    
+    return results;
+}
+
 // ===== LISTADO DE ARCHIVOS =====
 async function listFiles(entityType, entityId, additionalData = {}) {
     try {
@@ -173,7 +610,8 @@ function createFileUploadComponent(entityType, entityId, options = {}) {
     } = options;
     
     const config = FILE_CONFIG[entityType];
-    const maxMB = Math.round(config.maxSize / (1024 * 1024));
+    const maxMB = Math.round(RESUMABLE_UPLOAD_CONFIG.maxSize / (1024 * 1024));
+    const acceptedTypes = [...config.allowedTypes, ...RESUMABLE_UPLOAD_CONFIG.datasetTypes];
     
     return `
         <div class="ctei-file-upload ${containerClass}">
@@ -188,7 +626,7 @@ function createFileUploadComponent(entityType, entityId, options = {}) {
                         type="file" 
                         id="fileInput-${entityType}-${entityId}" 
                         class="hidden"
-                        accept="${config.allowedTypes.join(',')}"
+                        accept="${acceptedTypes.join(',')}"
                     >
                     <div 
                         id="dropZone-${entityType}-${entityId}"
@@ -200,7 +638,7 @@ function createFileUploadComponent(entityType, entityId, options = {}) {
                             Haz click aquí o arrastra un archivo
                         </p>
                         <p class="text-sm text-muted-foreground">
-                            Máximo ${maxMB}MB • ${config.description}
+                            Máximo ${maxMB}MB • ${config.description}, ${RESUMABLE_UPLOAD_CONFIG.description}
                         </p>
                     </div>
                 </div>
@@ -275,12 +713,16 @@ function initFileUpload(entityType, entityId, options = {}) {
             uploadProgress.classList.remove('hidden');
             uploadResult.classList.add('hidden');
             
-            // Simular progreso (en una implementación real usarías XMLHttpRequest para progreso real)
+            const setProgress = (progress) => {
+                document.getElementById(`progressBar-${entityType}-${entityId}`).style.width = `${progress}%`;
+                document.getElementById(`progressPercent-${entityType}-${entityId}`).textContent = `${progress}%`;
+            };
+            
+            // Las subidas por partes informan el progreso real; las simples lo simulan
             let progress = 0;
             const progressInterval = setInterval(() => {
                 progress += 10;
-                document.getElementById(`progressBar-${entityType}-${entityId}`).style.width = `${progress}%`;
-                document.getElementById(`progressPercent-${entityType}-${entityId}`).textContent = `${progress}%`;
+                setProgress(progress);
                 
                 if (progress >= 90) {
                     clearInterval(progressInterval);
@@ -289,7 +731,10 @@ function initFileUpload(entityType, entityId, options = {}) {
             
             // Subir archivo
             const additionalData = projectId ? { projectId } : {};
-            const result = await uploadFile(entityType, entityId, file, additionalData);
+            const result = await uploadFile(entityType, entityId, file, additionalData, (realProgress) => {
+                clearInterval(progressInterval);
+                setProgress(realProgress);
+            });
             
             // Completar progreso
             clearInterval(progressInterval);
@@ -415,7 +860,7 @@ async function loadFileList(entityType, entityId, options = {}) {
             <div class="level-1 p-3 hover:bg-muted/50 transition-colors">
                 <div class="flex items-center justify-between">
                     <div class="flex items-center space-x-3">
-                        <span class="text-2xl">${getFileIcon(file.mime_type)}</span>
+                        <span class="text-2xl">${renderFilePreview(file)}</span>
                         <div>
                             <div class="font-medium text-foreground">${file.original_name}</div>
                             <div class="text-sm text-muted-foreground">
@@ -446,6 +891,8 @@ async function loadFileList(entityType, entityId, options = {}) {
             </div>
         `).join('');
         
+        hydrateThumbnails(container);
+        
     } catch (error) {
         console.error('Error loading file list:', error);
         container.innerHTML = `
@@ -554,6 +1001,9 @@ function initCompleteFileManager(entityType, entityId, containerId, options = {}
 // ===== EXPORT PARA USO GLOBAL =====
 window.FileManager = {
     uploadFile,
+    uploadFileResumable,
+    cancelResumableUpload,
+    uploadFilesBulk,
     listFiles,
     deleteFile,
     createFileUploadComponent,
@@ -564,6 +1014,9 @@ window.FileManager = {
     validateFile,
     formatFileSize,
     getFileIcon,
+    getThumbnailUrl,
+    renderFilePreview,
+    hydrateThumbnails,
     toggleFileUpload,
     confirmDeleteFile,
     handleDeleteFile
@@ -1,15 +1,24 @@
 // Aplicación principal CTeI-Manager
 import { Hono } from 'hono'
 import { cors } from 'hono/cors'
+import { timing } from 'hono/timing'
 import { serveStatic } from 'hono/cloudflare-workers'
 import { auth } from './routes/auth'
 import { publicRoutes } from './routes/public'
 import { privateRoutes } from './routes/private'
 import { adminRoutes } from './routes/admin'
 import { Bindings } from './types/index'
+import { metricsMiddleware } from './middleware/metrics'
+import { isServerTimingEnabled } from './utils/server-timing'
 
 const app = new Hono<{ Bindings: Bindings }>()
 
+// Cabecera Server-Timing: siempre en desarrollo, muestreada en producción (ver utils/server-timing)
+app.use('/api/*', timing({ enabled: isServerTimingEnabled }))
+
+// Latencia por ruta y consultas a D1 (ver /api/admin/metrics)
+app.use('/api/*', metricsMiddleware)
+
 // Configurar CORS para permitir comunicación frontend-backend
 app.use('/api/*', cors({
   origin: '*',
@@ -1,5 +1,6 @@
 // Middleware de autenticación
 import { Context, Next } from 'hono';
+import { startTime, endTime } from 'hono/timing';
 import { verifyJWT } from '../utils/jwt';
 import { JWTPayload, Bindings } from '../types/index';
 
@@ -13,7 +14,9 @@ export async function authMiddleware(c: Context<{ Bindings: Bindings; Variables:
   const token = authorization.slice(7); // Remover 'Bearer '
   
   try {
+    startTime(c, 'auth', 'verifyJWT');
     const payload = await verifyJWT(token);
+    endTime(c, 'auth');
     
     if (!payload) {
       return c.json({ success: false, error: 'Token inválido o expirado' }, 401);
@@ -0,0 +1,78 @@
+// Middleware de métricas: latencia por ruta y consultas a D1 de cada petición
+import { Context, Next } from 'hono';
+import { matchedRoutes } from 'hono/route';
+import { Bindings } from '../types/index';
+import {
+  QueryObserver, createQueryStats, instrumentD1, queryFingerprint, recordRequest, takeMetricsFlush, writeMetricsFlush
+} from '../utils/metrics';
+import {
+  KV_TIMED_METHODS, R2_TIMED_METHODS, TimingCollector, addTiming, instrumentBinding, isServerTimingEnabled,
+  reportTimings, timeSerialization
+} from '../utils/server-timing';
+import { MAX_SLOW_QUERIES_PER_REQUEST, SlowQuery, slowQueryThreshold, writeSlowQueries } from '../utils/slow-queries';
+
+// Patrón de la ruta que atendió la petición (los middleware se registran con método ALL)
+function routeLabel(c: Context): string {
+  const handler = matchedRoutes(c).filter(route => route.method !== 'ALL').pop();
+  return handler ? `${c.req.method} ${handler.path}` : `${c.req.method} (sin ruta)`;
+}
+
+function runInBackground(c: Context, task: Promise<unknown>) {
+  try {
+    c.executionCtx.waitUntil(task);
+  } catch {
+    // Sin ExecutionContext (desarrollo local): la tarea continúa sin waitUntil
+  }
+}
+
+export async function metricsMiddleware(c: Context<{ Bindings: Bindings }>, next: Next) {
+  const startedAt = performance.now();
+  const queries = createQueryStats();
+  const db = c.env.DB;
+  const slowThreshold = slowQueryThreshold(c.env);
+  const slowQueries: SlowQuery[] = [];
+
+  // Desglose para la cabecera Server-Timing (solo en las peticiones muestreadas)
+  const timings: TimingCollector | undefined = isServerTimingEnabled(c) ? new Map() : undefined;
+
+  const onQuery: QueryObserver = (sql, durationMs, params) => {
+    if (timings) {
+      addTiming(timings, `d1-${queryFingerprint(sql).name}`, durationMs);
+    }
+    if (durationMs >= slowThreshold && sql && slowQueries.length < MAX_SLOW_QUERIES_PER_REQUEST) {
+      slowQueries.push({ sql, durationMs, params });
+    }
+  };
+
+  // env es compartido entre peticiones del isolate: se sustituye por una copia con DB instrumentada
+  if (db) {
+    c.env = { ...c.env, DB: instrumentD1(db, queries, onQuery) };
+  }
+  if (timings) {
+    c.env = {
+      ...c.env,
+      R2: c.env.R2 && instrumentBinding(c.env.R2, 'r2', R2_TIMED_METHODS, timings),
+      KV: c.env.KV && instrumentBinding(c.env.KV, 'kv', KV_TIMED_METHODS, timings)
+    };
+    timeSerialization(c, timings);
+  }
+
+  await next();
+
+  const route = routeLabel(c);
+  recordRequest(route, c.res.status, performance.now() - startedAt, queries);
+  if (timings) {
+    reportTimings(c, timings);
+  }
+
+  if (slowQueries.length > 0 && db) {
+    runInBackground(c, writeSlowQueries(db, route, slowQueries)
+      .catch(error => console.error('Error registrando consultas lentas:', error)));
+  }
+
+  const flush = takeMetricsFlush();
+  if (flush && db) {
+    runInBackground(c, writeMetricsFlush(db, flush)
+      .catch(error => console.error('Error guardando métricas:', error)));
+  }
+}
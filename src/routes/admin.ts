@@ -3,6 +3,18 @@ import { Hono } from 'hono';
 import { authMiddleware, requireRole } from '../middleware/auth';
 import { hashPassword } from '../utils/jwt';
 import { Bindings, JWTPayload } from '../types/index';
+import { purgeCacheTags, purgeProjectCache, purgeProductCache } from '../utils/cache';
+import { rebuildPublicStats } from '../utils/stats';
+import { exceedsUploadLimit, putFileStream } from '../utils/upload';
+import { serveR2Object } from '../utils/download';
+import { serveThumbnail, parseThumbnailSize, thumbnailKeys } from '../utils/thumbnails';
+import { storeFileBlob, releaseStoredFiles, deleteEntityFilesStatement, StoredFileRef } from '../utils/blobs';
+import { reconcileStorage, RECONCILE_MAX_PAGES } from '../utils/reconcile';
+import { summarizeRouteMetrics, RouteMetricsRow, LATENCY_BUCKETS_MS } from '../utils/metrics';
+import { slowQueryThreshold } from '../utils/slow-queries';
+import { getSnapshot, buildMonitoringOverview, buildMonitoringDistributions, MONITORING_OVERVIEW_TTL_SECONDS } from '../utils/monitoring';
+import { loadScoringFeatures, loadScoringWeights, scoreProjects, saveProjectScores, claimDirtyProjects, claimDirtyProjectsForRecompute, DirtyProjectClaim, ScoringScope, DIRTY_SCORING_LIMIT } from '../utils/scoring';
+import { isCursorMode, decodeCursor, clampCursorLimit, keysetCondition, buildCursorPage, countWithCache } from '../utils/pagination';
 
 const adminRoutes = new Hono<{ Bindings: Bindings; Variables: { user?: JWTPayload } }>();
 
@@ -27,20 +39,45 @@ adminRoutes.get('/files/:type/:filename', async (c) => {
       return c.text('R2 storage no configurado', 500);
     }
     
-    const object = await c.env.R2.get(`${type}/${filename}`);
-    if (!object) {
+    // Los nombres en R2 son únicos, pero la ruta requiere sesión de administrador: caché solo privada
+    return await serveR2Object(c, c.env.R2, `${type}/${filename}`, {
+      filename,
+      cacheControl: 'private, max-age=31536000, immutable',
+    });
+  } catch (error) {
+    console.error('Error sirviendo archivo:', error);
+    return c.text('Error interno del servidor', 500);
+  }
+});
+
+// Miniatura de una imagen almacenada en R2
+adminRoutes.get('/files/:type/:filename/thumbnail', async (c) => {
+  try {
+    const { type, filename } = c.req.param();
+    
+    const allowedTypes = ['logos', 'documents', 'images', 'projects', 'products'];
+    if (!allowedTypes.includes(type) || !c.env.R2) {
       return c.notFound();
     }
     
-    return new Response(object.body, {
-      headers: {
-        'Content-Type': object.httpMetadata?.contentType || 'application/octet-stream',
-        'Cache-Control': 'public, max-age=31536000',
-        'Content-Disposition': `inline; filename="${filename}"`,
-      },
-    });
+    const key = `${type}/${filename}`;
+    const original = await c.env.R2.head(key);
+    if (!original) {
+      return c.notFound();
+    }
+    
+    try {
+      const thumbnail = await serveThumbnail(
+        c, key, original.httpMetadata?.contentType, parseThumbnailSize(c.req.query('size'))
+      );
+      if (thumbnail) return thumbnail;
+    } catch (error) {
+      // Imagen corrupta o fallo de Images: se trata como miniatura no disponible
+      console.warn('No se pudo generar la miniatura:', error);
+    }
+    return c.text('Miniatura no disponible', 404);
   } catch (error) {
-    console.error('Error sirviendo archivo:', error);
+    console.error('Error sirviendo miniatura:', error);
     return c.text('Error interno del servidor', 500);
   }
 });
@@ -48,6 +85,11 @@ adminRoutes.get('/files/:type/:filename', async (c) => {
 // Subir archivos para productos/proyectos
 adminRoutes.post('/upload-file', async (c) => {
   try {
+    // Rechazar cuerpos que superan el mayor límite por tipo (20MB) sin leerlos
+    if (exceedsUploadLimit(c, 20 * 1024 * 1024)) {
+      return c.json({ success: false, error: 'El archivo no puede superar 20MB' }, 413);
+    }
+
     const formData = await c.req.formData();
     const file = formData.get('file') as File;
     const fileType = formData.get('type') as string; // 'document', 'image', 'project', 'product'
@@ -118,11 +160,32 @@ adminRoutes.post('/upload-file', async (c) => {
     const randomId = Math.random().toString(36).substring(2, 15);
     const extension = file.name.split('.').pop();
     const fileName = `${entityId}-${timestamp}-${randomId}.${extension}`;
-    const fullPath = `${folder}/${fileName}`;
     
-    // Subir a R2
-    const arrayBuffer = await file.arrayBuffer();
-    await c.env.R2.put(fullPath, arrayBuffer, {
+    // Fila de files: el blob puede estar en la carpeta de otro archivo con el mismo contenido,
+    // así que la ruta y la URL se toman de la clave real del objeto
+    const insertFile = (hash: string) => c.env.DB.prepare(`
+      INSERT INTO files (
+        filename, original_name, file_path, file_url, file_type, 
+        file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at, blob_hash
+      )
+      SELECT ?, ?, object_key, '/api/admin/files/' || object_key, ?, ?, ?, ?, ?, ?, ?, hash
+      FROM file_blobs WHERE hash = ?
+      RETURNING file_url
+    `).bind(
+      fileName,
+      file.name,
+      fileType,
+      file.size,
+      file.type,
+      fileType === 'project' || fileType === 'product' ? fileType : 'general',
+      entityId,
+      c.get('user')?.id || null,
+      new Date().toISOString(),
+      hash
+    );
+    
+    // Subir a R2 (stream directo y deduplicado por contenido) y registrar en base de datos
+    const blob = await storeFileBlob<{ file_url: string }>(c.env.DB, c.env.R2, `${folder}/${fileName}`, file, insertFile, {
       httpMetadata: {
         contentType: file.type,
       },
@@ -134,31 +197,7 @@ adminRoutes.post('/upload-file', async (c) => {
         uploadedAt: new Date().toISOString(),
       },
     });
-    
-    // Generar URL del archivo
-    const fileUrl = `/api/admin/files/${folder}/${fileName}`;
-    
-    // Registrar en base de datos
-    if (c.env.DB) {
-      await c.env.DB.prepare(`
-        INSERT INTO files (
-          filename, original_name, file_path, file_url, file_type, 
-          file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-      `).bind(
-        fileName,
-        file.name,
-        fullPath,
-        fileUrl,
-        fileType,
-        file.size,
-        file.type,
-        fileType === 'project' || fileType === 'product' ? fileType : 'general',
-        entityId,
-        c.get('user')?.id || null,
-        new Date().toISOString()
-      ).run();
-    }
+    const fileUrl = blob.row.file_url;
     
     const response = {
       success: true,
@@ -228,18 +267,18 @@ adminRoutes.delete('/files/:fileId', async (c) => {
       return c.json({ success: false, error: 'Archivo no encontrado' }, 404);
     }
     
-    // Eliminar de R2
-    try {
-      await c.env.R2.delete(file.file_path as string);
-    } catch (error) {
-      console.warn('Error eliminando de R2:', error);
-    }
-    
     // Eliminar de base de datos
     await c.env.DB.prepare(`
       DELETE FROM files WHERE id = ?
     `).bind(fileId).run();
     
+    // Liberar de R2 (los blobs compartidos solo se borran al quedar sin referencias)
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, [file as unknown as StoredFileRef]);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
+    
     const response = {
       success: true,
       data: { message: 'Archivo eliminado exitosamente' }
@@ -252,6 +291,52 @@ adminRoutes.delete('/files/:fileId', async (c) => {
   }
 });
 
+// Conciliar R2 con la tabla files (objetos huérfanos y filas que apuntan a objetos inexistentes)
+// Cloudflare Pages no ejecuta tareas programadas: la conciliación se lanza bajo demanda y avanza
+// por páginas; si la respuesta trae complete=false se repite con cursor y after_key.
+adminRoutes.post('/files/reconcile', async (c) => {
+  try {
+    if (!c.env.DB || !c.env.R2) {
+      return c.json({ success: false, error: 'Servicios no disponibles' }, 500);
+    }
+    
+    const body = await c.req.json().catch(() => ({})) as {
+      cursor?: string;
+      after_key?: string;
+      max_pages?: number;
+      min_age_minutes?: number;
+      delete?: boolean;
+    };
+    
+    const maxPages = Math.min(Math.max(Number(body.max_pages) || 5, 1), RECONCILE_MAX_PAGES);
+    const minAgeMinutes = Math.max(Number(body.min_age_minutes ?? 60) || 0, 0);
+    
+    // El logo vigente se guarda en KV; sin KV no se puede saber cuáles sobran
+    const logoUrl = c.env.KV ? await c.env.KV.get('site_logo_url') : undefined;
+    const currentLogoKey = logoUrl === undefined
+      ? undefined
+      : logoUrl?.startsWith('/api/admin/logo/') ? `logos/${logoUrl.split('/').pop()}` : null;
+    
+    const report = await reconcileStorage(c.env.DB, c.env.R2, {
+      cursor: body.cursor || undefined,
+      afterKey: body.after_key || undefined,
+      maxPages,
+      minAgeMs: minAgeMinutes * 60 * 1000,
+      deleteOrphans: body.delete === true,
+      currentLogoKey
+    });
+    
+    return c.json({
+      success: true,
+      data: { ...report, dry_run: body.delete !== true }
+    });
+    
+  } catch (error) {
+    console.error('Error conciliando almacenamiento:', error);
+    return c.json({ success: false, error: 'Error al conciliar el almacenamiento' }, 500);
+  }
+});
+
 // ===== GESTIÓN DE CONFIGURACIÓN =====
 
 // Obtener configuración actual del sitio
@@ -319,15 +404,13 @@ adminRoutes.post('/upload-logo', async (c) => {
     
     // Subir a R2 Storage de Cloudflare
     if (c.env.R2) {
-      const arrayBuffer = await logoFile.arrayBuffer();
-      
       // Eliminar logo anterior si existe
       const oldLogoUrl = await c.env.KV?.get('site_logo_url');
       if (oldLogoUrl) {
         try {
           const oldFileName = oldLogoUrl.split('/').pop();
           if (oldFileName && oldFileName.startsWith('logo-')) {
-            await c.env.R2.delete(`logos/${oldFileName}`);
+            await c.env.R2.delete([`logos/${oldFileName}`, ...thumbnailKeys(`logos/${oldFileName}`)]);
           }
         } catch (error) {
           console.warn('Error eliminando logo anterior:', error);
@@ -335,7 +418,7 @@ adminRoutes.post('/upload-logo', async (c) => {
       }
       
       // Subir nuevo logo
-      await c.env.R2.put(`logos/${fileName}`, arrayBuffer, {
+      await putFileStream(c.env.R2, `logos/${fileName}`, logoFile, {
         httpMetadata: {
           contentType: logoFile.type,
         },
@@ -390,8 +473,20 @@ adminRoutes.post('/upload-logo', async (c) => {
 adminRoutes.get('/logo/:fileName', async (c) => {
   try {
     const fileName = c.req.param('fileName');
+    const size = c.req.query('size');
     
     if (c.env.R2) {
+      // Versión reducida del logo (?size=sm|md); si no se puede generar se sirve el original
+      if (size) {
+        const contentType = fileName.toLowerCase().endsWith('.png') ? 'image/png' : 'image/jpeg';
+        try {
+          const thumbnail = await serveThumbnail(c, `logos/${fileName}`, contentType, parseThumbnailSize(size));
+          if (thumbnail) return thumbnail;
+        } catch (error) {
+          console.warn('No se pudo generar la miniatura del logo, se sirve el original:', error);
+        }
+      }
+      
       const object = await c.env.R2.get(`logos/${fileName}`);
       
       if (!object) {
@@ -422,7 +517,7 @@ adminRoutes.delete('/logo', async (c) => {
       if (logoUrl.startsWith('/api/admin/logo/')) {
         const fileName = logoUrl.split('/').pop();
         if (fileName) {
-          await c.env.R2.delete(`logos/${fileName}`);
+          await c.env.R2.delete([`logos/${fileName}`, ...thumbnailKeys(`logos/${fileName}`)]);
         }
       }
     }
@@ -497,11 +592,6 @@ adminRoutes.get('/products', async (c) => {
       params.push(isPublic === 'true' ? 1 : 0);
     }
 
-    query += ` ORDER BY pr.created_at DESC LIMIT ? OFFSET ?`;
-    params.push(limit, offset);
-
-    const products = await c.env.DB.prepare(query).bind(...params).all();
-
     // Contar total para paginación
     let countQuery = `
       SELECT COUNT(*) as total 
@@ -532,6 +622,47 @@ adminRoutes.get('/products', async (c) => {
       countParams.push(isPublic === 'true' ? 1 : 0);
     }
 
+    // Modo cursor (opt-in): keyset sobre (created_at, id), sin OFFSET y con conteo opcional
+    const cursor = c.req.query('cursor');
+    if (isCursorMode(cursor)) {
+      const cursorLimit = clampCursorLimit(limit);
+      const position = cursor ? decodeCursor(cursor) : null;
+      if (cursor && !position) {
+        return c.json({ success: false, error: 'Cursor inválido' }, 400);
+      }
+
+      if (position) {
+        query += ` AND ${keysetCondition('pr.created_at', 'pr.id')}`;
+        params.push(position.value, position.id);
+      }
+      query += ` ORDER BY pr.created_at DESC, pr.id DESC LIMIT ?`;
+      params.push(cursorLimit + 1);
+
+      const rows = await c.env.DB.prepare(query).bind(...params).all();
+      const cursorPage = buildCursorPage(rows.results as any[], cursorLimit, 'created_at');
+      const total = c.req.query('with_total') === 'true'
+        ? await countWithCache(c.env.DB, countQuery, countParams)
+        : null;
+
+      return c.json({
+        success: true,
+        data: {
+          products: cursorPage.items,
+          pagination: {
+            limit: cursorLimit,
+            next_cursor: cursorPage.next_cursor,
+            has_more: cursorPage.has_more,
+            total
+          }
+        }
+      });
+    }
+
+    query += ` ORDER BY pr.created_at DESC LIMIT ? OFFSET ?`;
+    params.push(limit, offset);
+
+    const products = await c.env.DB.prepare(query).bind(...params).all();
+
     const totalCount = await c.env.DB.prepare(countQuery).bind(...countParams).first();
     const total = totalCount?.total || 0;
 
@@ -617,6 +748,9 @@ adminRoutes.put('/products/:id/visibility', async (c) => {
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeProductCache(c.env.DB, productId);
+
     return c.json({
       success: true,
       message: `Producto ${is_public ? 'publicado' : 'hecho privado'} exitosamente`
@@ -637,7 +771,7 @@ adminRoutes.delete('/products/:id', async (c) => {
     const productId = parseInt(c.req.param('id'));
 
     // Verificar que el producto existe
-    const product = await c.env.DB.prepare('SELECT id FROM products WHERE id = ?').bind(productId).first();
+    const product = await c.env.DB.prepare('SELECT id, project_id FROM products WHERE id = ?').bind(productId).first<{ id: number; project_id: number }>();
     
     if (!product) {
       return c.json({ 
@@ -646,8 +780,11 @@ adminRoutes.delete('/products/:id', async (c) => {
       }, 404);
     }
 
-    // Eliminar el producto
-    const result = await c.env.DB.prepare('DELETE FROM products WHERE id = ?').bind(productId).run();
+    // Eliminar el producto junto con sus archivos
+    const [deletedFiles, result] = await c.env.DB.batch([
+      deleteEntityFilesStatement(c.env.DB, product.project_id, productId),
+      c.env.DB.prepare('DELETE FROM products WHERE id = ?').bind(productId)
+    ]);
 
     if (!result.success) {
       return c.json({ 
@@ -656,6 +793,16 @@ adminRoutes.delete('/products/:id', async (c) => {
       }, 500);
     }
 
+    // Liberar el almacenamiento de los archivos eliminados
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, deletedFiles.results as StoredFileRef[]);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
+
+    // Invalidar caché pública
+    await purgeProductCache(c.env.DB, productId, product.project_id);
+
     return c.json({
       success: true,
       message: 'Producto eliminado exitosamente'
@@ -913,10 +1060,9 @@ adminRoutes.get('/projects', async (c) => {
         p.status, p.start_date, p.end_date, p.institution, p.funding_source, 
         p.budget, p.project_code, p.action_line_id,
         u.full_name as owner_name, u.email as owner_email,
-        COUNT(DISTINCT prod.id) as product_count
+        (SELECT COUNT(*) FROM products prod WHERE prod.project_id = p.id) as product_count
       FROM projects p 
       JOIN users u ON p.owner_id = u.id 
-      LEFT JOIN products prod ON p.id = prod.project_id
       WHERE 1=1
     `;
     
@@ -943,11 +1089,6 @@ adminRoutes.get('/projects', async (c) => {
       params.push(status);
     }
 
-    query += ` GROUP BY p.id ORDER BY p.updated_at DESC LIMIT ? OFFSET ?`;
-    params.push(limit, offset);
-
-    const projects = await c.env.DB.prepare(query).bind(...params).all();
-
     // Contar total (con mismos filtros, SIN action_lines)
     let countQuery = `
       SELECT COUNT(DISTINCT p.id) as total 
@@ -977,6 +1118,52 @@ adminRoutes.get('/projects', async (c) => {
       countParams.push(status);
     }
 
+    // Modo cursor (opt-in): keyset sobre (updated_at, id), sin OFFSET y con conteo opcional
+    const cursor = c.req.query('cursor');
+    if (isCursorMode(cursor)) {
+      const cursorLimit = clampCursorLimit(limit);
+      const position = cursor ? decodeCursor(cursor) : null;
+      if (cursor && !position) {
+        return c.json({ success: false, error: 'Cursor inválido' }, 400);
+      }
+
+      if (position) {
+        query += ` AND ${keysetCondition('p.updated_at', 'p.id')}`;
+        params.push(position.value, position.id);
+      }
+      query += ` ORDER BY p.updated_at DESC, p.id DESC LIMIT ?`;
+      params.push(cursorLimit + 1);
+
+      const rows = await c.env.DB.prepare(query).bind(...params).all();
+      const cursorPage = buildCursorPage(rows.results as any[], cursorLimit, 'updated_at');
+      const total = c.req.query('with_total') === 'true'
+        ? await countWithCache(c.env.DB, countQuery, countParams)
+        : null;
+
+      return c.json({
+        success: true,
+        data: {
+          projects: cursorPage.items,
+          pagination: {
+            limit: cursorLimit,
+            next_cursor: cursorPage.next_cursor,
+            has_more: cursorPage.has_more,
+            total
+          },
+          filters: {
+            status,
+            is_public,
+            search
+          }
+        }
+      });
+    }
+
+    query += ` ORDER BY p.updated_at DESC LIMIT ? OFFSET ?`;
+    params.push(limit, offset);
+
+    const projects = await c.env.DB.prepare(query).bind(...params).all();
+
     const totalResult = await c.env.DB.prepare(countQuery).bind(...countParams).first<{ total: number }>();
     const total = totalResult?.total || 0;
 
@@ -1017,9 +1204,11 @@ adminRoutes.delete('/projects/:id', async (c) => {
   try {
     const projectId = parseInt(c.req.param('id'));
 
-    const result = await c.env.DB.prepare(
-      'DELETE FROM projects WHERE id = ?'
-    ).bind(projectId).run();
+    // Eliminar el proyecto junto con los archivos del proyecto y de sus productos
+    const [deletedFiles, result] = await c.env.DB.batch([
+      deleteEntityFilesStatement(c.env.DB, projectId),
+      c.env.DB.prepare('DELETE FROM projects WHERE id = ?').bind(projectId)
+    ]);
 
     if (!result.success) {
       return c.json({ 
@@ -1028,6 +1217,16 @@ adminRoutes.delete('/projects/:id', async (c) => {
       }, 500);
     }
 
+    // Liberar el almacenamiento de los archivos eliminados
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, deletedFiles.results as StoredFileRef[]);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
+
+    // Invalidar caché pública
+    await purgeProjectCache(c.env.DB, projectId);
+
     return c.json({
       success: true,
       message: 'Proyecto eliminado exitosamente'
@@ -1061,6 +1260,9 @@ adminRoutes.post('/projects/:id/publish', async (c) => {
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeProjectCache(c.env.DB, projectId);
+
     return c.json({
       success: true,
       message: `Proyecto ${is_public ? 'publicado' : 'despublicado'} exitosamente`
@@ -1149,6 +1351,9 @@ adminRoutes.post('/product-categories', async (c) => {
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeCacheTags(c.env.DB, ['product-categories', 'products', 'stats']);
+
     return c.json({
       success: true,
       message: 'Categoría creada exitosamente'
@@ -1231,6 +1436,9 @@ adminRoutes.put('/product-categories/:code', async (c) => {
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeCacheTags(c.env.DB, ['product-categories', 'products', 'stats']);
+
     return c.json({
       success: true,
       message: 'Categoría actualizada exitosamente'
@@ -1280,6 +1488,9 @@ adminRoutes.delete('/product-categories/:code', async (c) => {
       }, 404);
     }
 
+    // Invalidar caché pública
+    await purgeCacheTags(c.env.DB, ['product-categories', 'products', 'stats']);
+
     return c.json({
       success: true,
       message: 'Categoría eliminada exitosamente'
@@ -1296,6 +1507,28 @@ adminRoutes.delete('/product-categories/:code', async (c) => {
 
 // ===== ESTADÍSTICAS GLOBALES =====
 
+// Reconstruir las estadísticas públicas materializadas (reparación)
+adminRoutes.post('/stats/rebuild', async (c) => {
+  try {
+    const startTime = Date.now();
+    await rebuildPublicStats(c.env.DB);
+    await purgeCacheTags(c.env.DB, ['stats']);
+
+    return c.json({
+      success: true,
+      message: 'Estadísticas públicas reconstruidas exitosamente',
+      data: { duration_ms: Date.now() - startTime }
+    });
+
+  } catch (error) {
+    console.error('Error reconstruyendo estadísticas públicas:', error);
+    return c.json({ 
+      success: false, 
+      error: 'Error interno del servidor' 
+    }, 500);
+  }
+});
+
 // Dashboard completo de administrador
 adminRoutes.get('/dashboard/stats', async (c) => {
   try {
@@ -1480,110 +1713,37 @@ adminRoutes.put('/action-lines/:id', async (c) => {
 
 // ===== DASHBOARD DE MONITOREO EN TIEMPO REAL =====
 
-// Dashboard de monitoreo general - VERSIÓN ULTRA BÁSICA
+// Dashboard de monitoreo general
+// Se sirve desde una instantánea regenerada como mucho cada MONITORING_OVERVIEW_TTL_SECONDS
+// (?refresh=1 fuerza la regeneración); last_updated indica cuándo se calcularon los datos.
 adminRoutes.get('/monitoring/overview', async (c) => {
   try {
-    // Version con datos estáticos y dinámicos básicos
+    const snapshot = await getSnapshot(
+      c, 'overview', MONITORING_OVERVIEW_TTL_SECONDS, buildMonitoringOverview, c.req.query('refresh') === '1'
+    );
+    const overview = snapshot.data;
+
     return c.json({
       success: true,
       data: {
-        system_metrics: {
-          total_projects: 3,
-          active_projects: 3,
-          completed_projects: 0,
-          total_products: 6,
-          total_researchers: 3,
-          total_action_lines: 5,
-          avg_project_score: 24
-        },
-        recent_alerts: [
-          {
-            id: 1,
-            title: "Sistema de Monitoreo Operativo",
-            severity_level: 5,
-            status: "ACTIVE",
-            category: "PERFORMANCE",
-            color_code: "#10B981",
-            icon: "fas fa-check-circle"
-          },
-          {
-            id: 2,
-            title: "Nuevas Líneas de Acción Implementadas",
-            severity_level: 4,
-            status: "ACTIVE", 
-            category: "PERFORMANCE",
-            color_code: "#3B82F6",
-            icon: "fas fa-info"
-          }
-        ],
-        attention_projects: [
-          {
-            id: 1,
-            title: "IA para Conservación Marina del Pacífico",
-            status: "ACTIVE",
-            owner_name: "Dr. Investigador Demo",
-            attention_reason: "Score: 27 (NECESITA_MEJORA)",
-            product_count: 2,
-            collaborator_count: 0
-          },
-          {
-            id: 2,
-            title: "Blockchain para Agricultura Sostenible",
-            status: "ACTIVE",
-            owner_name: "Dra. Community Demo",
-            attention_reason: "Score: 23 (NECESITA_MEJORA)",
-            product_count: 2,
-            collaborator_count: 0
-          }
-        ],
-        scoring_stats: {
-          total_scored_projects: 3,
-          avg_total_score: 24,
-          excellent_projects: 0,
-          good_projects: 0,
-          regular_projects: 0,
-          needs_improvement_projects: 3
-        },
-        action_lines_distribution: [
-          {
-            name: "Mentalidad y Cultura de Innovación",
-            code: "MENTALIDAD_CULTURA",
-            project_count: 1
-          },
-          {
-            name: "Servicios de Apoyo Empresarial", 
-            code: "SERVICIOS_APOYO",
-            project_count: 0
-          },
-          {
-            name: "Financiación para la Innovación",
-            code: "FINANCIACION", 
-            project_count: 0
-          },
-          {
-            name: "Expansión de Mercados",
-            code: "EXPANSION_MERCADOS",
-            project_count: 2
-          },
-          {
-            name: "Fomento de la Inversión",
-            code: "FOMENTO_INVERSION",
-            project_count: 0
-          }
-        ],
-        recent_trends: [
-          { date: "2024-01-20", projects_created: 3 }
-        ],
+        ...overview,
+        action_lines_distribution: overview.action_line_metrics.map(line => ({
+          name: line.name,
+          code: line.code,
+          project_count: line.project_count
+        })),
         real_time_data: {
           timestamp: new Date().toISOString(),
-          active_users_simulation: Math.floor(Math.random() * 15) + 5,
-          system_health: 'HEALTHY',
-          database_status: 'CONNECTED',
-          cpu_usage: Math.floor(Math.random() * 30) + 20,
-          memory_usage: Math.floor(Math.random() * 40) + 30,
-          response_time: Math.floor(Math.random() * 50) + 25
+          system_health: overview.alert_counts.critical_alerts > 0 ? 'WARNING' : 'HEALTHY',
+          database_status: 'CONNECTED'
+        },
+        snapshot: {
+          generated_at: snapshot.generated_at,
+          age_seconds: snapshot.age_seconds,
+          ttl_seconds: snapshot.ttl_seconds,
+          stale: snapshot.stale
         },
-        last_updated: new Date().toISOString()
+        last_updated: snapshot.generated_at
       }
     });
 
@@ -1598,81 +1758,49 @@ adminRoutes.get('/monitoring/overview', async (c) => {
 });
 
 // Estadísticas en tiempo real para gráficos
+// Las series por día y mes se leen de daily_activity_rollups (migración 0025); las
+// distribuciones actuales se sirven desde una instantánea como el resumen general.
 adminRoutes.get('/monitoring/real-time-stats', async (c) => {
   try {
-    const timeframe = c.req.query('timeframe') || '30'; // días
-
-    // Proyectos creados en el tiempo (simplificado)
-    const projectProgress = await c.env.DB.prepare(`
-      SELECT 
-        DATE(created_at) as date,
-        COUNT(*) as projects_created,
-        COUNT(CASE WHEN status = 'COMPLETED' THEN 1 END) as projects_completed
-      FROM projects 
-      WHERE DATE(created_at) >= DATE('now', '-' || ? || ' days')
-      GROUP BY DATE(created_at)
-      ORDER BY date ASC
-    `).bind(timeframe).all();
-
-    // Productos creados por mes (simplificado)
-    const productionTrend = await c.env.DB.prepare(`
-      SELECT
-        strftime('%Y-%m', created_at) as month,
-        product_type as category,
-        COUNT(*) as count
-      FROM products
-      WHERE DATE(created_at) >= DATE('now', '-' || ? || ' days')
-      GROUP BY month, product_type
-      ORDER BY month ASC
-    `).bind(timeframe).all();
-
-    // Distribución de estado de proyectos
-    const statusDistribution = await c.env.DB.prepare(`
-      SELECT status, COUNT(*) as count
-      FROM projects
-      GROUP BY status
-    `).all();
-
-    // Distribución por líneas de acción con proyectos activos
-    const actionLinesDistribution = await c.env.DB.prepare(`
-      SELECT
-        al.name,
-        al.code,
-        COUNT(p.id) as project_count,
-        COALESCE(AVG(ps.total_score), 0) as avg_score
-      FROM action_lines al
-      LEFT JOIN projects p ON al.id = p.action_line_id AND p.status = 'ACTIVE'
-      LEFT JOIN project_scores ps ON p.id = ps.project_id AND ps.is_current = 1
-      GROUP BY al.id, al.name
-      ORDER BY project_count DESC
-    `).all();
-
-    // Métricas de scoring por categoría
-    const scoringDistribution = await c.env.DB.prepare(`
-      SELECT 
-        evaluation_category,
-        COUNT(*) as count,
-        AVG(total_score) as avg_score
-      FROM project_scores 
-      WHERE is_current = 1
-      GROUP BY evaluation_category
-    `).all();
+    const timeframe = Math.min(Math.max(parseInt(c.req.query('timeframe') || '30') || 30, 1), 3650); // días
+    const since = `-${timeframe} days`;
+
+    const [projectProgress, productionTrend] = await c.env.DB.batch([
+      // Proyectos creados por día (y cuántos de ellos están completados)
+      c.env.DB.prepare(`
+        SELECT
+          day as date,
+          SUM(CASE WHEN metric = 'projects_created' THEN count ELSE 0 END) as projects_created,
+          SUM(CASE WHEN metric = 'projects_completed' THEN count ELSE 0 END) as projects_completed
+        FROM daily_activity_rollups
+        WHERE metric IN ('projects_created', 'projects_completed') AND day >= DATE('now', ?)
+        GROUP BY day
+        HAVING projects_created > 0
+        ORDER BY date ASC
+      `).bind(since),
+      // Productos creados por mes y tipo
+      c.env.DB.prepare(`
+        SELECT
+          substr(day, 1, 7) as month,
+          dimension_key as category,
+          SUM(count) as count
+        FROM daily_activity_rollups
+        WHERE metric = 'products_created' AND day >= DATE('now', ?)
+        GROUP BY month, dimension_key
+        HAVING SUM(count) > 0
+        ORDER BY month ASC
+      `).bind(since)
+    ]);
+
+    const distributions = await getSnapshot(c, 'real-time-distributions', MONITORING_OVERVIEW_TTL_SECONDS, buildMonitoringDistributions);
 
     return c.json({
       success: true,
       data: {
         project_progress: projectProgress.results || [],
         production_trend: productionTrend.results || [],
-        status_distribution: statusDistribution.results || [],
-        action_lines_distribution: actionLinesDistribution.results || [],
-        scoring_distribution: scoringDistribution.results || [],
-        real_time_metrics: {
-          active_sessions: Math.floor(Math.random() * 20) + 5,
-          system_load: Math.floor(Math.random() * 30) + 20,
-          memory_usage: Math.floor(Math.random() * 40) + 30,
-          database_connections: Math.floor(Math.random() * 10) + 5,
-          response_time_ms: Math.floor(Math.random() * 50) + 25
-        },
+        ...distributions.data,
+        distributions_updated_at: distributions.generated_at,
         generated_at: new Date().toISOString()
       }
     });
@@ -1687,6 +1815,132 @@ adminRoutes.get('/monitoring/real-time-stats', async (c) => {
   }
 });
 
+// Latencia por ruta y consultas a D1 (p50/p95/p99 a partir de los histogramas volcados)
+// Las últimas peticiones de cada instancia se incorporan al volcar su ventana (cada minuto).
+adminRoutes.get('/metrics', async (c) => {
+  try {
+    const hours = Math.min(Math.max(parseInt(c.req.query('hours') || '24') || 24, 1), 168);
+    const route = c.req.query('route');
+    const to = Date.now();
+    const from = to - hours * 60 * 60 * 1000;
+
+    const rows = await c.env.DB.prepare(`
+      SELECT
+        route, request_count, error_count, total_ms, max_ms, latency_histogram,
+        query_count, query_ms, max_queries, rows_read, rows_written
+      FROM request_metrics
+      WHERE window_end >= ? ${route ? 'AND route = ?' : ''}
+    `).bind(...(route ? [from, route] : [from])).all<RouteMetricsRow>();
+
+    const routes = summarizeRouteMetrics(rows.results);
+
+    return c.json({
+      success: true,
+      data: {
+        period: {
+          from: new Date(from).toISOString(),
+          to: new Date(to).toISOString(),
+          hours
+        },
+        latency_buckets_ms: LATENCY_BUCKETS_MS,
+        totals: {
+          requests: routes.reduce((sum, item) => sum + item.requests, 0),
+          errors: routes.reduce((sum, item) => sum + item.errors, 0),
+          routes: routes.length
+        },
+        routes
+      }
+    });
+
+  } catch (error) {
+    console.error('Error obteniendo métricas:', error);
+    return c.json({ 
+      success: false, 
+      error: 'Error interno del servidor' 
+    }, 500);
+  }
+});
+
+// Consultas lentas agrupadas por huella (ver utils/slow-queries)
+// sort: total (tiempo acumulado, por defecto), max, avg u occurrences
+const SLOW_QUERY_SORTS: Record<string, string> = {
+  total: 'total_ms DESC',
+  max: 'max_ms DESC',
+  avg: 'total_ms / occurrences DESC',
+  occurrences: 'occurrences DESC'
+};
+
+adminRoutes.get('/slow-queries', async (c) => {
+  try {
+    const limit = Math.min(Math.max(parseInt(c.req.query('limit') || '20') || 20, 1), 100);
+    const requestedSort = c.req.query('sort') || 'total';
+    const sort = Object.keys(SLOW_QUERY_SORTS).includes(requestedSort) ? requestedSort : 'total';
+
+    const rows = await c.env.DB.prepare(`
+      SELECT
+        fingerprint, name, normalized_sql, last_route, occurrences, total_ms, max_ms, last_ms,
+        param_shapes, query_plan, first_seen_at, last_seen_at
+      FROM slow_queries
+      ORDER BY ${SLOW_QUERY_SORTS[sort]}
+      LIMIT ?
+    `).bind(limit).all<Record<string, any>>();
+
+    const queries = rows.results.map(row => ({
+      fingerprint: row.fingerprint,
+      name: row.name,
+      sql: row.normalized_sql,
+      last_route: row.last_route,
+      occurrences: row.occurrences,
+      total_ms: Math.round(row.total_ms),
+      avg_ms: Math.round(row.total_ms / (row.occurrences || 1)),
+      max_ms: Math.round(row.max_ms),
+      last_ms: Math.round(row.last_ms),
+      param_shapes: row.param_shapes ? JSON.parse(row.param_shapes) : [],
+      query_plan: row.query_plan,
+      // Un SCAN sin índice en el plan suele ser la causa
+      full_scan: typeof row.query_plan === 'string' && /\bSCAN (?!.*USING (?:COVERING )?INDEX)/.test(row.query_plan),
+      first_seen_at: new Date(row.first_seen_at).toISOString(),
+      last_seen_at: new Date(row.last_seen_at).toISOString()
+    }));
+
+    return c.json({
+      success: true,
+      data: {
+        threshold_ms: slowQueryThreshold(c.env),
+        sort,
+        queries
+      }
+    });
+
+  } catch (error) {
+    console.error('Error obteniendo consultas lentas:', error);
+    return c.json({ 
+      success: false, 
+      error: 'Error interno del servidor' 
+    }, 500);
+  }
+});
+
+// Vaciar el registro (p. ej. tras desplegar un índice, para medir de nuevo)
+adminRoutes.delete('/slow-queries', async (c) => {
+  try {
+    const result = await c.env.DB.prepare(`DELETE FROM slow_queries`).run();
+
+    return c.json({
+      success: true,
+      message: 'Registro de consultas lentas vaciado',
+      data: { deleted: result.meta.changes }
+    });
+
+  } catch (error) {
+    console.error('Error vaciando consultas lentas:', error);
+    return c.json({ 
+      success: false, 
+      error: 'Error interno del servidor' 
+    }, 500);
+  }
+});
+
 // Resolver alerta
 adminRoutes.put('/alerts/:id/resolve', async (c) => {
   try {
@@ -2095,126 +2349,67 @@ function getTimeAgo(dateString: string): string {
 
 // ===== ENDPOINTS FASE 3A: SISTEMA DE SCORING Y EVALUACIÓN AUTOMATIZADA =====
 
-// Calcular scoring para todos los proyectos o un proyecto específico
+// Calcular scoring para todos los proyectos, un proyecto específico o, con mode: 'dirty',
+// solo los proyectos cuyos datos cambiaron desde el último cálculo
 adminRoutes.post('/scoring/calculate', async (c) => {
   try {
-    const { project_id } = await c.req.json();
-    
-    let projects: any[] = [];
-    
+    const { project_id, mode, limit } = await c.req.json();
+    const startedAt = Date.now();
+
+    const dirtyMode = !project_id && mode === 'dirty';
+    const dirtyLimit = Math.max(1, Math.min(Math.floor(Number(limit)) || DIRTY_SCORING_LIMIT, DIRTY_SCORING_LIMIT));
+    let dirtyClaims: DirtyProjectClaim[] = [];
+    let scope: ScoringScope = {};
     if (project_id) {
-      // Calcular para un proyecto específico
-      const projectResult = await c.env.DB.prepare(`
-        SELECT * FROM projects WHERE id = ?
-      `).bind(project_id).first();
-      
-      if (!projectResult) {
-        return c.json({ success: false, error: 'Proyecto no encontrado' }, 404);
-      }
-      projects = [projectResult];
+      scope = { projectId: Number(project_id) };
+      dirtyClaims = await claimDirtyProjectsForRecompute(c.env.DB, Number(project_id));
+    } else if (dirtyMode) {
+      dirtyClaims = await claimDirtyProjects(c.env.DB, dirtyLimit);
+      scope = { projectIds: dirtyClaims.map(claim => claim.project_id) };
     } else {
-      // Calcular para todos los proyectos activos
-      const projectsResult = await c.env.DB.prepare(`
-        SELECT * FROM projects WHERE status IN ('ACTIVE', 'REVIEW', 'COMPLETED')
-      `).all();
-      projects = projectsResult.results;
+      // El recálculo completo cubre todas las marcas pendientes: se eliminan al guardar
+      dirtyClaims = await claimDirtyProjectsForRecompute(c.env.DB);
     }
 
-    const results: any[] = [];
-    
-    for (const project of projects) {
-      // Calcular cada criterio de scoring
-      const completenessScore = await calculateCompletenessScore(c.env.DB, project);
-      const collaborationScore = await calculateCollaborationScore(c.env.DB, project);
-      const productivityScore = await calculateProductivityScore(c.env.DB, project);
-      const impactScore = await calculateImpactScore(c.env.DB, project);
-      const innovationScore = await calculateInnovationScore(c.env.DB, project);
-      const timelineScore = await calculateTimelineScore(c.env.DB, project);
-      
-      // Calcular score total ponderado
-      const totalScore = Math.round(
-        (completenessScore * 0.25) +
-        (collaborationScore * 0.20) +
-        (productivityScore * 0.25) +
-        (impactScore * 0.15) +
-        (innovationScore * 0.10) +
-        (timelineScore * 0.05)
-      );
-      
-      // Determinar categoría de evaluación
-      let evaluationCategory = 'NECESITA_MEJORA';
-      if (totalScore >= 85) evaluationCategory = 'EXCELENTE';
-      else if (totalScore >= 70) evaluationCategory = 'BUENO';
-      else if (totalScore >= 50) evaluationCategory = 'REGULAR';
-      
-      // Generar recomendaciones
-      const recommendations = generateRecommendations({
-        completenessScore,
-        collaborationScore,
-        productivityScore,
-        impactScore,
-        innovationScore,
-        timelineScore,
-        totalScore
-      });
-      
-      // Actualizar o insertar score en la base de datos
-      const existingScore = await c.env.DB.prepare(`
-        SELECT id FROM project_scores WHERE project_id = ? AND is_current = 1
-      `).bind(project.id).first<{ id: number }>();
-      
-      if (existingScore) {
-        // Marcar el score anterior como no actual
-        await c.env.DB.prepare(`
-          UPDATE project_scores SET is_current = 0 WHERE id = ?
-        `).bind(existingScore.id).run();
-      }
-      
-      // Insertar nuevo score
-      const insertResult = await c.env.DB.prepare(`
-        INSERT INTO project_scores (
-          project_id, completeness_score, collaboration_score, productivity_score,
-          impact_score, innovation_score, timeline_score, total_score,
-          evaluation_category, recommendations, last_calculated_at, is_current
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-      `).bind(
-        project.id,
-        completenessScore,
-        collaborationScore,
-        productivityScore,
-        impactScore,
-        innovationScore,
-        timelineScore,
-        totalScore,
-        evaluationCategory,
-        JSON.stringify(recommendations),
-        new Date().toISOString()
-      ).run();
-      
-      results.push({
-        project_id: project.id,
-        project_title: project.title,
-        scores: {
-          completeness: completenessScore,
-          collaboration: collaborationScore,
-          productivity: productivityScore,
-          impact: impactScore,
-          innovation: innovationScore,
-          timeline: timelineScore,
-          total: totalScore
-        },
-        evaluation_category: evaluationCategory,
-        recommendations,
-        score_id: insertResult.meta.last_row_id
-      });
+    // Insumos de todos los criterios en una sola consulta agregada
+    const [features, weights] = await Promise.all([
+      loadScoringFeatures(c.env.DB, scope),
+      loadScoringWeights(c.env.DB)
+    ]);
+
+    if (project_id && features.length === 0) {
+      return c.json({ success: false, error: 'Proyecto no encontrado' }, 404);
     }
-    
+    const loadedAt = Date.now();
+
+    const results = scoreProjects(features, weights);
+    const computedAt = Date.now();
+
+    // Escribir todos los scores en un único batch
+    const calculatedAt = new Date().toISOString();
+    const scoreIds = await saveProjectScores(c.env.DB, results, calculatedAt, dirtyClaims);
+    for (const result of results) {
+      result.score_id = scoreIds.get(result.project_id);
+    }
+    const savedAt = Date.now();
+
     return c.json({
       success: true,
       data: {
         message: `Scoring calculado para ${results.length} proyecto(s)`,
+        mode: project_id ? 'project' : (dirtyMode ? 'dirty' : 'all'),
         results,
-        calculated_at: new Date().toISOString()
+        calculated_at: calculatedAt,
+        ...(dirtyMode ? {
+          dirty_processed: dirtyClaims.length,
+          has_more_dirty: dirtyClaims.length === dirtyLimit
+        } : {}),
+        timing: {
+          load_ms: loadedAt - startedAt,
+          compute_ms: computedAt - loadedAt,
+          write_ms: savedAt - computedAt,
+          total_ms: savedAt - startedAt
+        }
       }
     });
     
@@ -2512,217 +2707,6 @@ adminRoutes.get('/scoring/criteria', async (c) => {
   }
 });
 
-// ===== FUNCIONES AUXILIARES DE CÁLCULO DE SCORING =====
-
-// Calcular score de completitud (0-100)
-async function calculateCompletenessScore(db: D1Database, project: any): Promise<number> {
-  const fields = [
-    project.title,
-    project.abstract,
-    project.methodology,
-    project.start_date,
-    project.end_date,
-    project.institution,
-    project.budget
-  ];
-  
-  const completedFields = fields.filter(field => {
-    if (field === null || field === undefined) return false;
-    if (typeof field === 'string') return field.trim() !== '';
-    return true; // Para campos numéricos como budget
-  }).length;
-  
-  return Math.round((completedFields / fields.length) * 100);
-}
-
-// Calcular score de colaboración (0-100)
-async function calculateCollaborationScore(db: D1Database, project: any): Promise<number> {
-  const collaboratorsResult = await db.prepare(`
-    SELECT COUNT(*) as count FROM project_collaborators WHERE project_id = ?
-  `).bind(project.id).first<{ count: number }>();
-  
-  const collaboratorCount = collaboratorsResult?.count || 0;
-  
-  // Score basado en número de colaboradores (máximo realista: 10 colaboradores = 100 puntos)
-  let score = Math.min((collaboratorCount / 10) * 100, 100);
-  
-  // Bonus por diversidad institucional (si hay colaboradores externos)
-  const externalCollabsResult = await db.prepare(`
-    SELECT COUNT(*) as count FROM project_collaborators 
-    WHERE project_id = ? AND collaboration_role = 'EXTERNAL_COLLABORATOR'
-  `).bind(project.id).first<{ count: number }>();
-  
-  const externalCount = externalCollabsResult?.count || 0;
-  if (externalCount > 0) {
-    score += Math.min(externalCount * 10, 20); // Bonus hasta 20 puntos
-  }
-  
-  return Math.min(Math.round(score), 100);
-}
-
-// Calcular score de productividad (0-100)
-async function calculateProductivityScore(db: D1Database, project: any): Promise<number> {
-  const productsResult = await db.prepare(`
-    SELECT COUNT(*) as count FROM products WHERE project_id = ?
-  `).bind(project.id).first<{ count: number }>();
-  
-  const productCount = productsResult?.count || 0;
-  
-  // Score basado en productos generados (5 productos = 100 puntos)
-  const score = Math.min((productCount / 5) * 100, 100);
-  
-  return Math.round(score);
-}
-
-// Calcular score de impacto (0-100)
-async function calculateImpactScore(db: D1Database, project: any): Promise<number> {
-  const impactResult = await db.prepare(`
-    SELECT 
-      COUNT(CASE WHEN doi IS NOT NULL THEN 1 END) as products_with_doi,
-      COUNT(CASE WHEN impact_factor IS NOT NULL THEN 1 END) as products_with_if,
-      AVG(CASE WHEN impact_factor IS NOT NULL THEN impact_factor ELSE 0 END) as avg_impact_factor,
-      SUM(CASE WHEN citation_count IS NOT NULL THEN citation_count ELSE 0 END) as total_citations,
-      COUNT(*) as total_products
-    FROM products 
-    WHERE project_id = ?
-  `).bind(project.id).first();
-  
-  if (!impactResult || impactResult.total_products === 0) {
-    return 0;
-  }
-  
-  let score = 0;
-  
-  // Puntos por productos con DOI (30% del score)
-  const doiPercentage = impactResult.products_with_doi / impactResult.total_products;
-  score += doiPercentage * 30;
-  
-  // Puntos por factor de impacto promedio (40% del score)
-  const avgImpactFactor = impactResult.avg_impact_factor || 0;
-  score += Math.min((avgImpactFactor / 5) * 40, 40); // Factor de impacto 5 = máximo
-  
-  // Puntos por citaciones (30% del score)
-  const totalCitations = impactResult.total_citations || 0;
-  score += Math.min((totalCitations / 50) * 30, 30); // 50 citaciones = máximo
-  
-  return Math.min(Math.round(score), 100);
-}
-
-// Calcular score de innovación (0-100)
-async function calculateInnovationScore(db: D1Database, project: any): Promise<number> {
-  const innovationResult = await db.prepare(`
-    SELECT 
-      pc.category_group,
-      COUNT(*) as count
-    FROM products p
-    JOIN product_categories pc ON p.product_type = pc.code
-    WHERE p.project_id = ?
-    GROUP BY pc.category_group
-  `).bind(project.id).all();
-  
-  if (!innovationResult.results.length) {
-    return 0;
-  }
-  
-  let score = 0;
-  const categories = innovationResult.results;
-  
-  // Puntos por diversidad de categorías (más tipos = más innovación)
-  score += Math.min(categories.length * 15, 60); // Máximo 4 categorías
-  
-  // Bonus por categorías específicamente innovadoras
-  const innovativeCategories = ['SOFTWARE', 'PATENT', 'DATABASE'];
-  for (const cat of categories) {
-    if (innovativeCategories.includes(cat.category_group)) {
-      score += 20;
-      break; // Solo un bonus por tener categorías innovadoras
-    }
-  }
-  
-  return Math.min(Math.round(score), 100);
-}
-
-// Calcular score de cronograma (0-100)
-async function calculateTimelineScore(db: D1Database, project: any): Promise<number> {
-  if (!project.start_date || !project.end_date) {
-    return 50; // Score neutral si no hay fechas definidas
-  }
-  
-  const startDate = new Date(project.start_date);
-  const endDate = new Date(project.end_date);
-  const currentDate = new Date();
-  
-  // Si el proyecto no ha comenzado
-  if (currentDate < startDate) {
-    return 100; // Perfecto timing
-  }
-  
-  // Si el proyecto ya terminó
-  if (currentDate > endDate) {
-    const daysOverdue = Math.floor((currentDate.getTime() - endDate.getTime()) / (1000 * 60 * 60 * 24));
-    if (daysOverdue <= 30) return 80; // Ligeramente atrasado
-    if (daysOverdue <= 90) return 60; // Moderadamente atrasado
-    return 30; // Muy atrasado
-  }
-  
-  // Proyecto en progreso: calcular progreso esperado vs real
-  const projectDuration = endDate.getTime() - startDate.getTime();
-  const elapsedTime = currentDate.getTime() - startDate.getTime();
-  const expectedProgress = (elapsedTime / projectDuration) * 100;
-  
-  const actualProgress = project.progress_percentage || 0;
-  const progressDifference = actualProgress - expectedProgress;
-  
-  // Score basado en qué tan cerca está el progreso real del esperado
-  if (progressDifference >= 0) return 100; // Adelantado o en tiempo
-  if (progressDifference >= -10) return 90; // Ligeramente atrasado
-  if (progressDifference >= -20) return 70; // Moderadamente atrasado
-  return 50; // Significativamente atrasado
-}
-
-// Generar recomendaciones basadas en los scores
-function generateRecommendations(scores: {
-  completenessScore: number;
-  collaborationScore: number;
-  productivityScore: number;
-  impactScore: number;
-  innovationScore: number;
-  timelineScore: number;
-  totalScore: number;
-}): string[] {
-  const recommendations: string[] = [];
-  
-  if (scores.completenessScore < 70) {
-    recommendations.push('Completar información del proyecto (metodología, fechas, presupuesto)');
-  }
-  
-  if (scores.collaborationScore < 60) {
-    recommendations.push('Ampliar el equipo de colaboradores y buscar alianzas institucionales');
-  }
-  
-  if (scores.productivityScore < 50) {
-    recommendations.push('Incrementar la generación de productos científicos y resultados');
-  }
-  
-  if (scores.impactScore < 40) {
-    recommendations.push('Publicar en revistas indexadas y obtener DOI para los productos');
-  }
-  
-  if (scores.innovationScore < 60) {
-    recommendations.push('Explorar categorías de productos más innovadoras (software, patentes)');
-  }
-  
-  if (scores.timelineScore < 70) {
-    recommendations.push('Revisar cronograma y actualizar progreso del proyecto');
-  }
-  
-  if (scores.totalScore >= 85) {
-    recommendations.push('¡Excelente desempeño! Considerar compartir mejores prácticas');
-  }
-  
-  return recommendations;
-}
-
 // Funciones auxiliares para labels y colores
 function getCategoryLabel(category: string): string {
   const labels: { [key: string]: string } = {
@@ -2783,61 +2767,70 @@ adminRoutes.get('/files/dashboard', async (c) => {
       return c.json({ success: false, error: 'Base de datos no disponible' }, 500);
     }
 
-    // Estadísticas generales
-    const totalFiles = await c.env.DB.prepare(`
-      SELECT COUNT(*) as count FROM files
-    `).first();
-
-    // Archivos por tipo
-    const filesByType = await c.env.DB.prepare(`
-      SELECT file_type, COUNT(*) as count 
-      FROM files 
-      GROUP BY file_type 
-      ORDER BY count DESC
-    `).all();
-
-    // Archivos por entidad
-    const filesByEntity = await c.env.DB.prepare(`
-      SELECT entity_type, COUNT(*) as count 
-      FROM files 
-      WHERE entity_type IS NOT NULL
-      GROUP BY entity_type 
-      ORDER BY count DESC
-    `).all();
-
-    // Archivos recientes (últimos 7 días)
-    const recentFiles = await c.env.DB.prepare(`
-      SELECT f.*, u.full_name as uploaded_by_name
-      FROM files f
-      LEFT JOIN users u ON f.uploaded_by = u.id
-      WHERE f.uploaded_at >= datetime('now', '-7 days')
-      ORDER BY f.uploaded_at DESC
-      LIMIT 10
-    `).all();
-
-    // Tamaño total de archivos (en MB)
-    const totalSize = await c.env.DB.prepare(`
-      SELECT SUM(file_size) as total_size FROM files
-    `).first();
-
-    // Archivos más grandes
-    const largestFiles = await c.env.DB.prepare(`
-      SELECT f.*, u.full_name as uploaded_by_name
-      FROM files f
-      LEFT JOIN users u ON f.uploaded_by = u.id
-      ORDER BY f.file_size DESC
-      LIMIT 5
-    `).all();
+    // Totales y desgloses desde los contadores mantenidos por triggers (migración 0022)
+    // en lugar de agregar toda la tabla files en cada visita
+    const [usage, recentFiles, largestFiles] = await c.env.DB.batch([
+      c.env.DB.prepare(`
+        SELECT u.dimension, u.dimension_key, u.file_count, u.total_bytes, us.full_name
+        FROM file_storage_usage u
+        LEFT JOIN users us ON u.dimension = 'uploader' AND us.id = CAST(u.dimension_key AS INTEGER)
+        WHERE u.dimension IN ('total', 'file_type', 'entity_type', 'uploader') AND u.file_count > 0
+        ORDER BY u.file_count DESC
+      `),
+      // Archivos recientes (últimos 7 días)
+      c.env.DB.prepare(`
+        SELECT f.*, u.full_name as uploaded_by_name
+        FROM files f
+        LEFT JOIN users u ON f.uploaded_by = u.id
+        WHERE f.uploaded_at >= datetime('now', '-7 days')
+        ORDER BY f.uploaded_at DESC
+        LIMIT 10
+      `),
+      // Archivos más grandes
+      c.env.DB.prepare(`
+        SELECT f.*, u.full_name as uploaded_by_name
+        FROM files f
+        LEFT JOIN users u ON f.uploaded_by = u.id
+        ORDER BY f.file_size DESC
+        LIMIT 5
+      `)
+    ]);
+
+    const usageRows = usage.results as {
+      dimension: string;
+      dimension_key: string;
+      file_count: number;
+      total_bytes: number;
+      full_name: string | null;
+    }[];
+    const total = usageRows.find(row => row.dimension === 'total');
+    const filesByType = usageRows
+      .filter(row => row.dimension === 'file_type')
+      .map(row => ({ file_type: row.dimension_key, count: row.file_count, total_bytes: row.total_bytes }));
+    const filesByEntity = usageRows
+      .filter(row => row.dimension === 'entity_type')
+      .map(row => ({ entity_type: row.dimension_key, count: row.file_count, total_bytes: row.total_bytes }));
+    const storageByUploader = usageRows
+      .filter(row => row.dimension === 'uploader')
+      .sort((a, b) => b.total_bytes - a.total_bytes)
+      .slice(0, 10)
+      .map(row => ({
+        user_id: Number(row.dimension_key),
+        full_name: row.full_name,
+        count: row.file_count,
+        total_bytes: row.total_bytes
+      }));
 
     const response = {
       success: true,
       data: {
         statistics: {
-          total_files: totalFiles?.count || 0,
-          total_size_mb: Math.round((totalSize?.total_size || 0) / (1024 * 1024) * 100) / 100
+          total_files: total?.file_count || 0,
+          total_size_mb: Math.round((total?.total_bytes || 0) / (1024 * 1024) * 100) / 100
         },
-        files_by_type: filesByType.results,
-        files_by_entity: filesByEntity.results,
+        files_by_type: filesByType,
+        files_by_entity: filesByEntity,
+        storage_by_uploader: storageByUploader,
         recent_files: recentFiles.results,
         largest_files: largestFiles.results
       }
@@ -2876,8 +2869,8 @@ adminRoutes.get('/files/search', async (c) => {
         END as entity_name
       FROM files f
       LEFT JOIN users u ON f.uploaded_by = u.id
-      LEFT JOIN projects p ON f.entity_type = 'project' AND f.entity_id = CAST(p.id AS TEXT)
-      LEFT JOIN products pr ON f.entity_type = 'product' AND f.entity_id = CAST(pr.id AS TEXT)
+      LEFT JOIN projects p ON f.entity_type = 'project' AND p.id = f.project_id
+      LEFT JOIN products pr ON f.entity_type = 'product' AND pr.id = f.product_id
       WHERE 1=1
     `;
     const params: any[] = [];
@@ -2913,11 +2906,6 @@ adminRoutes.get('/files/search', async (c) => {
       params.push(dateTo);
     }
 
-    query += ` ORDER BY f.uploaded_at DESC LIMIT ? OFFSET ?`;
-    params.push(limit, offset);
-
-    const files = await c.env.DB.prepare(query).bind(...params).all();
-
     // Contar total para paginación
     let countQuery = `
       SELECT COUNT(*) as total
@@ -2957,6 +2945,47 @@ adminRoutes.get('/files/search', async (c) => {
       countParams.push(dateTo);
     }
 
+    // Modo cursor (opt-in): keyset sobre (uploaded_at, id), sin OFFSET y con conteo opcional
+    const cursor = c.req.query('cursor');
+    if (isCursorMode(cursor)) {
+      const cursorLimit = clampCursorLimit(limit);
+      const position = cursor ? decodeCursor(cursor) : null;
+      if (cursor && !position) {
+        return c.json({ success: false, error: 'Cursor inválido' }, 400);
+      }
+
+      if (position) {
+        query += ` AND ${keysetCondition('f.uploaded_at', 'f.id')}`;
+        params.push(position.value, position.id);
+      }
+      query += ` ORDER BY f.uploaded_at DESC, f.id DESC LIMIT ?`;
+      params.push(cursorLimit + 1);
+
+      const rows = await c.env.DB.prepare(query).bind(...params).all();
+      const cursorPage = buildCursorPage(rows.results as any[], cursorLimit, 'uploaded_at');
+      const total = c.req.query('with_total') === 'true'
+        ? await countWithCache(c.env.DB, countQuery, countParams)
+        : null;
+
+      return c.json({
+        success: true,
+        data: {
+          files: cursorPage.items,
+          pagination: {
+            items_per_page: cursorLimit,
+            next_cursor: cursorPage.next_cursor,
+            has_more: cursorPage.has_more,
+            total_items: total
+          }
+        }
+      });
+    }
+
+    query += ` ORDER BY f.uploaded_at DESC LIMIT ? OFFSET ?`;
+    params.push(limit, offset);
+
+    const files = await c.env.DB.prepare(query).bind(...params).all();
+
     const totalResult = await c.env.DB.prepare(countQuery).bind(...countParams).first();
     const total = totalResult?.total || 0;
 
@@ -2998,8 +3027,8 @@ adminRoutes.get('/files/details/:fileId', async (c) => {
         END as entity_name
       FROM files f
       LEFT JOIN users u ON f.uploaded_by = u.id
-      LEFT JOIN projects p ON f.entity_type = 'project' AND f.entity_id = CAST(p.id AS TEXT)
-      LEFT JOIN products pr ON f.entity_type = 'product' AND f.entity_id = CAST(pr.id AS TEXT)
+      LEFT JOIN projects p ON f.entity_type = 'project' AND p.id = f.project_id
+      LEFT JOIN products pr ON f.entity_type = 'product' AND pr.id = f.product_id
       WHERE f.id = ?
     `).bind(fileId).first();
 
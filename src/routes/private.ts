@@ -2,6 +2,18 @@
 import { Hono } from 'hono';
 import { authMiddleware, requireRole } from '../middleware/auth';
 import { Bindings, APIResponse, JWTPayload, CreateProjectRequest, UpdateProjectRequest, CreateProductRequest, UpdateProductRequest, AddCollaboratorRequest, AddProductAuthorRequest } from '../types/index';
+import { purgeCacheTags, purgeProjectCache, purgeProductCache } from '../utils/cache';
+import { getProjectAccess, getProjectMemberships, canViewProject, invalidateProjectAccess } from '../utils/access';
+import {
+  exceedsUploadLimit, putFileStreamHashed, uploadPartStream, getExpectedPartSize, getFileTypeFromMime, expireUploadSessions,
+  MULTIPART_PART_SIZE, MULTIPART_MAX_FILE_SIZE, MULTIPART_ALLOWED_TYPES,
+  BULK_UPLOAD_MAX_FILES, BULK_UPLOAD_MAX_BYTES, BULK_UPLOAD_CONCURRENCY
+} from '../utils/upload';
+import { serveR2Object } from '../utils/download';
+import { serveThumbnail, parseThumbnailSize } from '../utils/thumbnails';
+import { createZipStream, zipArchiveSize, ZipEntry, ZIP_MAX_SIZE } from '../utils/zip';
+import { storeFileBlob, reserveBlobStatement, releaseStoredFiles, deleteEntityFilesStatement, StoredFileRef } from '../utils/blobs';
+import { loadScoringFeatures, loadScoringWeights, scoreProjects, saveProjectScores, ProjectScoreResult } from '../utils/scoring';
 
 const privateRoutes = new Hono<{ Bindings: Bindings; Variables: { user?: JWTPayload } }>();
 
@@ -160,6 +172,9 @@ privateRoutes.post('/projects', requireRole('INVESTIGATOR', 'ADMIN'), async (c)
       }, 500);
     }
 
+    // El nuevo proyecto cambia las membresías del propietario
+    invalidateProjectAccess(c, user.userId);
+
     return c.json<APIResponse<{ id: number }>>({
       success: true,
       data: { id: result.meta.last_row_id as number },
@@ -227,21 +242,15 @@ privateRoutes.get('/projects/:id/permissions', async (c) => {
 // Obtener proyecto individual para edición
 privateRoutes.get('/projects/:id', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('id'));
 
     // Verificar acceso al proyecto (excepto admins)
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(
-        'SELECT owner_id FROM projects WHERE id = ?'
-      ).bind(projectId).first<{ owner_id: number }>();
-
-      if (!project || project.owner_id !== user.userId) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para acceder a este proyecto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.isAdmin && !access.isOwner) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para acceder a este proyecto' 
+      }, 403);
     }
 
     // Obtener datos completos del proyecto
@@ -430,6 +439,9 @@ privateRoutes.put('/projects/:id', requireRole('INVESTIGATOR', 'ADMIN'), async (
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeProjectCache(c.env.DB, projectId);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Proyecto actualizado exitosamente'
@@ -458,22 +470,16 @@ privateRoutes.put('/projects/:id', requireRole('INVESTIGATOR', 'ADMIN'), async (
 // Publicar/despublicar proyecto
 privateRoutes.post('/projects/:id/publish', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('id'));
     const { is_public } = await c.req.json<{ is_public: boolean }>();
 
     // Verificar propiedad del proyecto (excepto admins)
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(
-        'SELECT owner_id FROM projects WHERE id = ?'
-      ).bind(projectId).first<{ owner_id: number }>();
-
-      if (!project || project.owner_id !== user.userId) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para modificar este proyecto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.isAdmin && !access.isOwner) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para modificar este proyecto' 
+      }, 403);
     }
 
     const result = await c.env.DB.prepare(`
@@ -489,6 +495,9 @@ privateRoutes.post('/projects/:id/publish', requireRole('INVESTIGATOR', 'ADMIN')
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeProjectCache(c.env.DB, projectId);
+
     return c.json<APIResponse>({
       success: true,
       message: `Proyecto ${is_public ? 'publicado' : 'despublicado'} exitosamente`
@@ -506,26 +515,22 @@ privateRoutes.post('/projects/:id/publish', requireRole('INVESTIGATOR', 'ADMIN')
 // Eliminar proyecto
 privateRoutes.delete('/projects/:id', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('id'));
 
     // Verificar propiedad del proyecto (excepto admins)
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(
-        'SELECT owner_id FROM projects WHERE id = ?'
-      ).bind(projectId).first<{ owner_id: number }>();
-
-      if (!project || project.owner_id !== user.userId) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para eliminar este proyecto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.isAdmin && !access.isOwner) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para eliminar este proyecto' 
+      }, 403);
     }
 
-    const result = await c.env.DB.prepare(
-      'DELETE FROM projects WHERE id = ?'
-    ).bind(projectId).run();
+    // Eliminar el proyecto junto con los archivos del proyecto y de sus productos
+    const [deletedFiles, result] = await c.env.DB.batch([
+      deleteEntityFilesStatement(c.env.DB, projectId),
+      c.env.DB.prepare('DELETE FROM projects WHERE id = ?').bind(projectId)
+    ]);
 
     if (!result.success) {
       return c.json<APIResponse>({ 
@@ -534,6 +539,16 @@ privateRoutes.delete('/projects/:id', requireRole('INVESTIGATOR', 'ADMIN'), asyn
       }, 500);
     }
 
+    // Liberar el almacenamiento de los archivos eliminados
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, deletedFiles.results as StoredFileRef[]);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
+
+    // Invalidar caché pública
+    await purgeProjectCache(c.env.DB, projectId);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Proyecto eliminado exitosamente'
@@ -581,19 +596,12 @@ privateRoutes.post('/projects/:projectId/products', requireRole('INVESTIGATOR',
     }
 
     // Verificar que el proyecto existe y el usuario tiene permisos
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(`
-        SELECT p.owner_id, pc.can_add_products FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR (pc.user_id = ? AND pc.can_add_products = 1))
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
-
-      if (!project) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'Proyecto no encontrado o sin permisos para añadir productos' 
-        }, 404);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canAddProducts) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'Proyecto no encontrado o sin permisos para añadir productos' 
+      }, 404);
     }
 
     const result = await c.env.DB.prepare(`
@@ -667,7 +675,6 @@ privateRoutes.post('/projects/:projectId/products', requireRole('INVESTIGATOR',
 // Asociar producto existente a un proyecto
 privateRoutes.post('/projects/:projectId/products/:productId', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
     const productId = parseInt(c.req.param('productId'));
 
@@ -683,26 +690,19 @@ privateRoutes.post('/projects/:projectId/products/:productId', requireRole('INVE
       }, 404);
     }
 
-    // Verificar permisos
-    if (user.role !== 'ADMIN' && projectCheck.owner_id !== user.userId) {
-      // También verificar si es colaborador con permisos
-      const collaborator = await c.env.DB.prepare(`
-        SELECT can_add_products FROM project_collaborators 
-        WHERE project_id = ? AND user_id = ? AND can_add_products = 1
-      `).bind(projectId, user.userId).first<{ can_add_products: number }>();
-
-      if (!collaborator) {
-        return c.json<APIResponse>({
-          success: false,
-          error: 'No tienes permisos para asociar productos a este proyecto'
-        }, 403);
-      }
+    // Verificar permisos (propietario, admin o colaborador con permiso de añadir productos)
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canAddProducts) {
+      return c.json<APIResponse>({
+        success: false,
+        error: 'No tienes permisos para asociar productos a este proyecto'
+      }, 403);
     }
 
     // Verificar que el producto existe
     const productCheck = await c.env.DB.prepare(
-      'SELECT id, description FROM products WHERE id = ?'
-    ).bind(productId).first<{ id: number; description: string }>();
+      'SELECT id, description, project_id FROM products WHERE id = ?'
+    ).bind(productId).first<{ id: number; description: string; project_id: number }>();
 
     if (!productCheck) {
       return c.json<APIResponse>({
@@ -737,6 +737,10 @@ privateRoutes.post('/projects/:projectId/products/:productId', requireRole('INVE
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeProductCache(c.env.DB, productId, projectId);
+    await purgeCacheTags(c.env.DB, [`project:${productCheck.project_id}`]);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Producto asociado exitosamente al proyecto'
@@ -754,23 +758,14 @@ privateRoutes.post('/projects/:projectId/products/:productId', requireRole('INVE
 // Obtener productos de un proyecto
 privateRoutes.get('/projects/:projectId/products', async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
 
     // Verificar acceso al proyecto
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(`
-        SELECT p.id FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id
-        WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ? OR p.is_public = 1)
-      `).bind(projectId, user.userId, user.userId).first();
-
-      if (!project) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'Proyecto no encontrado o sin permisos' 
-        }, 404);
-      }
+    if (!(await canViewProject(c, projectId))) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'Proyecto no encontrado o sin permisos' 
+      }, 404);
     }
 
     const products = await c.env.DB.prepare(`
@@ -862,23 +857,17 @@ privateRoutes.get('/private/products/search', async (c) => {
 // Añadir colaborador a proyecto
 privateRoutes.post('/projects/:projectId/collaborators', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
     const body: AddCollaboratorRequest = await c.req.json();
     const { user_id, collaboration_role, can_edit_project = false, can_add_products = true, can_manage_team = false, role_description } = body;
 
     // Verificar que el proyecto existe y el usuario tiene permisos
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(
-        'SELECT owner_id FROM projects WHERE id = ?'
-      ).bind(projectId).first<{ owner_id: number }>();
-
-      if (!project || project.owner_id !== user.userId) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para añadir colaboradores a este proyecto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.isAdmin && !access.isOwner) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para añadir colaboradores a este proyecto' 
+      }, 403);
     }
 
     // Verificar que el usuario a añadir existe
@@ -910,6 +899,10 @@ privateRoutes.post('/projects/:projectId/collaborators', requireRole('INVESTIGAT
       }, 500);
     }
 
+    // Invalidar caché pública y permisos cacheados del colaborador
+    await purgeCacheTags(c.env.DB, [`project:${projectId}`]);
+    invalidateProjectAccess(c, user_id);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Colaborador añadido exitosamente'
@@ -927,23 +920,14 @@ privateRoutes.post('/projects/:projectId/collaborators', requireRole('INVESTIGAT
 // Listar colaboradores de un proyecto
 privateRoutes.get('/projects/:projectId/collaborators', async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
 
     // Verificar acceso al proyecto
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(`
-        SELECT p.id FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id
-        WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ? OR p.is_public = 1)
-      `).bind(projectId, user.userId, user.userId).first();
-
-      if (!project) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'Proyecto no encontrado o sin permisos' 
-        }, 404);
-      }
+    if (!(await canViewProject(c, projectId))) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'Proyecto no encontrado o sin permisos' 
+      }, 404);
     }
 
     const collaborators = await c.env.DB.prepare(`
@@ -974,24 +958,16 @@ privateRoutes.get('/projects/:projectId/collaborators', async (c) => {
 // Remover colaborador de un proyecto
 privateRoutes.delete('/projects/:projectId/collaborators/:userId', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
     const userId = parseInt(c.req.param('userId'));
 
     // Verificar que el proyecto existe y el usuario tiene permisos
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(`
-        SELECT p.owner_id, pc.can_manage_team FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR (pc.user_id = ? AND pc.can_manage_team = 1))
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
-
-      if (!project) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para gestionar colaboradores en este proyecto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canManageTeam) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para gestionar colaboradores en este proyecto' 
+      }, 403);
     }
 
     // Remover colaborador
@@ -1007,6 +983,10 @@ privateRoutes.delete('/projects/:projectId/collaborators/:userId', requireRole('
       }, 500);
     }
 
+    // Invalidar caché pública y permisos cacheados del colaborador
+    await purgeCacheTags(c.env.DB, [`project:${projectId}`]);
+    invalidateProjectAccess(c, userId);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Colaborador removido exitosamente'
@@ -1030,17 +1010,14 @@ privateRoutes.post('/projects/:projectId/products/:productId/authors', requireRo
     const body: AddProductAuthorRequest = await c.req.json();
     const { user_id, author_role, author_order, contribution_type } = body;
 
-    // Verificar permisos sobre el producto
-    if (user.role !== 'ADMIN') {
-      const canEdit = await c.env.DB.prepare(`
-        SELECT 1 FROM products pr
-        JOIN projects p ON pr.project_id = p.id
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE pr.id = ? AND pr.project_id = ? 
-        AND (pr.creator_id = ? OR p.owner_id = ? OR (pc.user_id = ? AND pc.can_add_products = 1))
-      `).bind(user.userId, productId, projectId, user.userId, user.userId, user.userId).first();
+    // Verificar permisos sobre el producto (creador o miembro con permiso de añadir productos)
+    const access = await getProjectAccess(c, projectId);
+    if (!access.isAdmin) {
+      const product = await c.env.DB.prepare(
+        'SELECT creator_id FROM products WHERE id = ? AND project_id = ?'
+      ).bind(productId, projectId).first<{ creator_id: number }>();
 
-      if (!canEdit) {
+      if (!product || (product.creator_id !== user.userId && !access.canAddProducts)) {
         return c.json<APIResponse>({ 
           success: false, 
           error: 'No tienes permiso para gestionar autores de este producto' 
@@ -1076,6 +1053,9 @@ privateRoutes.post('/projects/:projectId/products/:productId/authors', requireRo
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeCacheTags(c.env.DB, [`product:${productId}`]);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Autor añadido exitosamente al producto'
@@ -1170,20 +1150,12 @@ privateRoutes.delete('/projects/:projectId/products/:productId/authors/:userId',
     }
 
     // Verificar permisos de edición
-    if (user.role !== 'ADMIN') {
-      const canEdit = await c.env.DB.prepare(`
-        SELECT 1 FROM products pr
-        JOIN projects p ON pr.project_id = p.id
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE pr.id = ? AND (pr.creator_id = ? OR p.owner_id = ? OR (pc.user_id = ? AND pc.can_add_products = 1))
-      `).bind(user.userId, productId, user.userId, user.userId, user.userId).first();
-
-      if (!canEdit) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para gestionar autores de este producto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (product.creator_id !== user.userId && !access.canAddProducts) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para gestionar autores de este producto' 
+      }, 403);
     }
 
     // Remover autor
@@ -1199,6 +1171,9 @@ privateRoutes.delete('/projects/:projectId/products/:productId/authors/:userId',
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeCacheTags(c.env.DB, [`product:${productId}`]);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Autor removido exitosamente del producto'
@@ -1260,6 +1235,9 @@ privateRoutes.post('/projects/:projectId/products/:productId/publish', requireRo
       }, 500);
     }
 
+    // Invalidar caché pública
+    await purgeProductCache(c.env.DB, productId, projectId);
+
     return c.json<APIResponse>({
       success: true,
       message: `Producto ${is_public ? 'publicado' : 'despublicado'} exitosamente`
@@ -1486,6 +1464,9 @@ privateRoutes.put('/projects/:projectId/products/:productId', requireRole('INVES
       }, 404);
     }
 
+    // Invalidar caché pública
+    await purgeProductCache(c.env.DB, productId, projectId);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Producto actualizado exitosamente'
@@ -1524,10 +1505,13 @@ privateRoutes.delete('/projects/:projectId/products/:productId', requireRole('IN
       }
     }
 
-    // Eliminar producto (CASCADE eliminará autores automáticamente)
-    const result = await c.env.DB.prepare(
-      'DELETE FROM products WHERE id = ? AND project_id = ?'
-    ).bind(productId, projectId).run();
+    // Eliminar producto (CASCADE eliminará autores automáticamente) y sus archivos
+    const [deletedFiles, result] = await c.env.DB.batch([
+      deleteEntityFilesStatement(c.env.DB, projectId, productId),
+      c.env.DB.prepare(
+        'DELETE FROM products WHERE id = ? AND project_id = ?'
+      ).bind(productId, projectId)
+    ]);
 
     if (!result.success || result.meta.changes === 0) {
       return c.json<APIResponse>({ 
@@ -1536,6 +1520,16 @@ privateRoutes.delete('/projects/:projectId/products/:productId', requireRole('IN
       }, 404);
     }
 
+    // Liberar el almacenamiento de los archivos eliminados
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, deletedFiles.results as StoredFileRef[]);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
+
+    // Invalidar caché pública
+    await purgeProductCache(c.env.DB, productId, projectId);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Producto eliminado exitosamente'
@@ -1649,13 +1643,9 @@ privateRoutes.post('/products', requireRole('INVESTIGATOR', 'ADMIN'), async (c)
 
     // Si se especifica project_id, verificar permisos sobre el proyecto
     if (project_id) {
-      const projectCheck = await c.env.DB.prepare(`
-        SELECT p.owner_id, pc.can_add_products FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR (pc.user_id = ? AND pc.can_add_products = 1))
-      `).bind(user.userId, project_id, user.userId, user.userId).first();
-
-      if (!projectCheck) {
+      // Propietario o colaborador con permiso para añadir productos
+      const access = await getProjectAccess(c, Number(project_id));
+      if (!access.isOwner && !(access.isCollaborator && access.canAddProducts)) {
         return c.json<APIResponse>({
           success: false,
           error: 'Proyecto no encontrado o sin permisos para añadir productos'
@@ -1855,6 +1845,9 @@ privateRoutes.put('/products/:productId', requireRole('INVESTIGATOR', 'ADMIN'),
       }, 400);
     }
 
+    // Invalidar caché pública
+    await purgeProductCache(c.env.DB, productId);
+
     return c.json<APIResponse>({
       success: true,
       message: 'Producto actualizado exitosamente'
@@ -1880,15 +1873,19 @@ privateRoutes.get('/products/:productId/files', async (c) => {
     if (user.role === 'ADMIN') {
       hasAccess = true;
     } else {
-      const productCheck = await c.env.DB.prepare(`
-        SELECT 1 
+      const product = await c.env.DB.prepare(`
+        SELECT pr.project_id, pr.creator_id, pr.is_public
         FROM products pr
         JOIN projects p ON pr.project_id = p.id
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE pr.id = ? AND (pr.creator_id = ? OR p.owner_id = ? OR pc.user_id = ? OR pr.is_public = 1)
-      `).bind(user.userId, productId, user.userId, user.userId, user.userId).first();
+        WHERE pr.id = ?
+      `).bind(productId).first<{ project_id: number; creator_id: number; is_public: number }>();
       
-      hasAccess = !!productCheck;
+      // Creador, producto público o miembro del proyecto
+      hasAccess = !!product && (
+        product.creator_id === user.userId ||
+        product.is_public === 1 ||
+        (await getProjectAccess(c, product.project_id)).canView
+      );
     }
     
     if (!hasAccess) {
@@ -1899,9 +1896,9 @@ privateRoutes.get('/products/:productId/files', async (c) => {
     const files = await c.env.DB.prepare(`
       SELECT id, filename, original_name, file_size, mime_type, uploaded_at, uploaded_by
       FROM files 
-      WHERE entity_type = 'product' AND entity_id = ?
+      WHERE product_id = ?
       ORDER BY uploaded_at DESC
-    `).bind(productId.toString()).all();
+    `).bind(productId).all();
 
     return c.json({
       success: true,
@@ -1941,7 +1938,11 @@ privateRoutes.post('/products/:productId/files', requireRole('INVESTIGATOR', 'AD
       return c.json({ success: false, error: 'No tienes permisos para subir archivos a este producto' }, 403);
     }
     
-    // Procesar archivo (simplificado - en producción usar storage real)
+    if (exceedsUploadLimit(c, 50 * 1024 * 1024)) {
+      return c.json({ success: false, error: 'El archivo es demasiado grande (máximo 50MB)' }, 413);
+    }
+    
+    // Procesar archivo
     const formData = await c.req.formData();
     const file = formData.get('file') as File;
     
@@ -1958,7 +1959,6 @@ privateRoutes.post('/products/:productId/files', requireRole('INVESTIGATOR', 'AD
     // Generar nombres únicos para el archivo
     const timestamp = Date.now();
     const uniqueFilename = `product_${productId}_${timestamp}_${file.name}`;
-    const filePath = `/uploads/products/${productId}/${uniqueFilename}`;
     const fileUrl = `/api/files/${uniqueFilename}`;
     
     // Mapear MIME type a file_type permitido por la constraint de DB
@@ -1975,27 +1975,58 @@ privateRoutes.post('/products/:productId/files', requireRole('INVESTIGATOR', 'AD
     }
     
     const mappedFileType = getFileTypeFromMime(file.type);
+    let fileId: number;
     
-    // Guardar información del archivo en la base de datos usando la tabla files existente
-    const result = await c.env.DB.prepare(`
-      INSERT INTO files 
-      (filename, original_name, file_path, file_url, file_type, file_size, mime_type, 
-       entity_type, entity_id, uploaded_by, uploaded_at)
-      VALUES (?, ?, ?, ?, ?, ?, ?, 'product', ?, ?, datetime('now'))
-    `).bind(
-      uniqueFilename, file.name, filePath, fileUrl, mappedFileType, 
-      file.size, file.type, productId.toString(), user.userId
-    ).run();
-    
-    if (!result.success) {
-      return c.json({ success: false, error: 'No se pudo guardar la información del archivo' }, 500);
+    if (c.env.R2) {
+      // Guardar el contenido en R2 (stream directo y deduplicado por contenido) y la información
+      // del archivo en la tabla files, con la ruta real del blob
+      const insertFile = (hash: string) => c.env.DB.prepare(`
+        INSERT INTO files 
+        (filename, original_name, file_path, file_url, file_type, file_size, mime_type, 
+         entity_type, entity_id, uploaded_by, uploaded_at, blob_hash)
+        SELECT ?, ?, object_key, ?, ?, ?, ?, 'product', ?, ?, datetime('now'), hash
+        FROM file_blobs WHERE hash = ?
+        RETURNING id
+      `).bind(
+        uniqueFilename, file.name, fileUrl, mappedFileType, 
+        file.size, file.type, productId.toString(), user.userId, hash
+      );
+      
+      const blob = await storeFileBlob<{ id: number }>(c.env.DB, c.env.R2, `products/${uniqueFilename}`, file, insertFile, {
+        httpMetadata: {
+          contentType: file.type,
+        },
+        customMetadata: {
+          originalName: file.name,
+          uploadedBy: user.userId.toString(),
+          productId: productId.toString(),
+          uploadedAt: new Date().toISOString(),
+        },
+      });
+      fileId = blob.row.id;
+    } else {
+      // Guardar información del archivo en la base de datos usando la tabla files existente
+      const result = await c.env.DB.prepare(`
+        INSERT INTO files 
+        (filename, original_name, file_path, file_url, file_type, file_size, mime_type, 
+         entity_type, entity_id, uploaded_by, uploaded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'product', ?, ?, datetime('now'))
+      `).bind(
+        uniqueFilename, file.name, `/uploads/products/${productId}/${uniqueFilename}`, fileUrl, mappedFileType, 
+        file.size, file.type, productId.toString(), user.userId
+      ).run();
+      
+      if (!result.success) {
+        return c.json({ success: false, error: 'No se pudo guardar la información del archivo' }, 500);
+      }
+      fileId = result.meta.last_row_id;
     }
     
     return c.json({
       success: true,
       message: 'Archivo subido exitosamente',
       data: {
-        file_id: result.meta.last_row_id,
+        file_id: fileId,
         filename: file.name,
         size: file.size,
         url: fileUrl
@@ -2023,10 +2054,10 @@ privateRoutes.delete('/products/:productId/files/:fileId', requireRole('INVESTIG
       const fileCheck = await c.env.DB.prepare(`
         SELECT f.uploaded_by, pr.creator_id, p.owner_id
         FROM files f
-        JOIN products pr ON f.entity_id = pr.id AND f.entity_type = 'product'
+        JOIN products pr ON pr.id = f.product_id
         JOIN projects p ON pr.project_id = p.id
-        WHERE f.id = ? AND f.entity_id = ?
-      `).bind(fileId, productId.toString()).first();
+        WHERE f.id = ? AND f.product_id = ?
+      `).bind(fileId, productId).first();
       
       if (fileCheck && (fileCheck.uploaded_by === user.userId || fileCheck.creator_id === user.userId || fileCheck.owner_id === user.userId)) {
         canDelete = true;
@@ -2040,13 +2071,21 @@ privateRoutes.delete('/products/:productId/files/:fileId', requireRole('INVESTIG
     // Eliminar archivo
     const result = await c.env.DB.prepare(`
       DELETE FROM files 
-      WHERE id = ? AND entity_type = 'product' AND entity_id = ?
-    `).bind(fileId, productId.toString()).run();
+      WHERE id = ? AND product_id = ?
+      RETURNING file_path, blob_hash
+    `).bind(fileId, productId).all<StoredFileRef>();
     
-    if (!result.success || result.meta.changes === 0) {
+    if (result.results.length === 0) {
       return c.json({ success: false, error: 'Archivo no encontrado' }, 404);
     }
     
+    // Liberar el almacenamiento en R2
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, result.results);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
+    
     return c.json({
       success: true,
       message: 'Archivo eliminado exitosamente'
@@ -2207,23 +2246,15 @@ privateRoutes.get('/timeline', async (c) => {
 // Obtener milestones de un proyecto
 privateRoutes.get('/projects/:projectId/milestones', async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
 
     // Verificar acceso al proyecto
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(`
-        SELECT p.id FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id
-        WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-      `).bind(projectId, user.userId, user.userId).first();
-
-      if (!project) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'Proyecto no encontrado o sin permisos' 
-        }, 404);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canView) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'Proyecto no encontrado o sin permisos' 
+      }, 404);
     }
 
     const milestones = await c.env.DB.prepare(`
@@ -2253,7 +2284,6 @@ privateRoutes.get('/projects/:projectId/milestones', async (c) => {
 // Crear milestone para un proyecto
 privateRoutes.post('/projects/:projectId/milestones', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
     const { 
       milestone_title, 
@@ -2270,19 +2300,12 @@ privateRoutes.post('/projects/:projectId/milestones', requireRole('INVESTIGATOR'
     }
 
     // Verificar permisos sobre el proyecto
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(`
-        SELECT p.owner_id, pc.can_edit_project FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR (pc.user_id = ? AND pc.can_edit_project = 1))
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
-
-      if (!project) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para añadir milestones a este proyecto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canEditProject) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para añadir milestones a este proyecto' 
+      }, 403);
     }
 
     const result = await c.env.DB.prepare(`
@@ -2340,25 +2363,17 @@ privateRoutes.post('/projects/:projectId/milestones', requireRole('INVESTIGATOR'
 // Completar/marcar milestone
 privateRoutes.put('/projects/:projectId/milestones/:milestoneId/complete', requireRole('INVESTIGATOR', 'ADMIN'), async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
     const milestoneId = parseInt(c.req.param('milestoneId'));
     const { status } = await c.req.json<{ status: string }>();
 
     // Verificar permisos sobre el proyecto
-    if (user.role !== 'ADMIN') {
-      const project = await c.env.DB.prepare(`
-        SELECT p.owner_id, pc.can_edit_project FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR (pc.user_id = ? AND pc.can_edit_project = 1))
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
-
-      if (!project) {
-        return c.json<APIResponse>({ 
-          success: false, 
-          error: 'No tienes permiso para modificar milestones de este proyecto' 
-        }, 403);
-      }
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canEditProject) {
+      return c.json<APIResponse>({ 
+        success: false, 
+        error: 'No tienes permiso para modificar milestones de este proyecto' 
+      }, 403);
     }
 
     // Actualizar milestone
@@ -2578,17 +2593,9 @@ privateRoutes.post('/projects/:projectId/upload', async (c) => {
     const user = c.get('user')!;
     
     // Verificar permisos sobre el proyecto (ADMIN tiene acceso completo)
-    if (user.role !== 'ADMIN') {
-      const projectAccess = await c.env.DB.prepare(`
-        SELECT p.*, pc.can_add_products, pc.can_edit_project
-        FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
-      
-      if (!projectAccess) {
-        return c.json({ success: false, error: 'No tienes permisos para subir archivos a este proyecto' }, 403);
-      }
+    const access = await getProjectAccess(c, Number(projectId));
+    if (!access.canView) {
+      return c.json({ success: false, error: 'No tienes permisos para subir archivos a este proyecto' }, 403);
     }
     
     // Verificar que el proyecto existe (para ADMIN)
@@ -2600,6 +2607,10 @@ privateRoutes.post('/projects/:projectId/upload', async (c) => {
       return c.json({ success: false, error: 'Proyecto no encontrado' }, 404);
     }
     
+    if (exceedsUploadLimit(c, 15 * 1024 * 1024)) {
+      return c.json({ success: false, error: 'El archivo no puede superar 15MB' }, 413);
+    }
+    
     const formData = await c.req.formData();
     const file = formData.get('file') as File;
     const fileType = (formData.get('type') as string) || 'project';
@@ -2647,14 +2658,33 @@ privateRoutes.post('/projects/:projectId/upload', async (c) => {
     const extension = file.name.split('.').pop();
     const fileName = `project-${projectId}-${timestamp}-${randomId}.${extension}`;
     
-    let fileUrl;
-    let fullPath;
+    let fileUrl: string;
     
     if (c.env.R2) {
-      // Usar R2 en producción
-      fullPath = `projects/${fileName}`;
-      const arrayBuffer = await file.arrayBuffer();
-      await c.env.R2.put(fullPath, arrayBuffer, {
+      // Usar R2 en producción (deduplicado por contenido). La fila se registra junto con la
+      // referencia al blob y toma su clave real, que puede ser la de otro archivo idéntico.
+      const insertFile = (hash: string) => c.env.DB.prepare(`
+        INSERT INTO files (
+          filename, original_name, file_path, file_url, file_type, 
+          file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at, blob_hash
+        )
+        SELECT ?, ?, object_key, '/api/files/r2/' || object_key, ?, ?, ?, ?, ?, ?, ?, hash
+        FROM file_blobs WHERE hash = ?
+        RETURNING file_url
+      `).bind(
+        fileName,
+        file.name,
+        mappedFileType,
+        file.size,
+        file.type,
+        'project',
+        projectId,
+        user.userId,
+        new Date().toISOString(),
+        hash
+      );
+      
+      const blob = await storeFileBlob<{ file_url: string }>(c.env.DB, c.env.R2, `projects/${fileName}`, file, insertFile, {
         httpMetadata: {
           contentType: file.type,
         },
@@ -2665,34 +2695,33 @@ privateRoutes.post('/projects/:projectId/upload', async (c) => {
           uploadedAt: new Date().toISOString(),
         },
       });
-      fileUrl = `/api/files/r2/${fullPath}`;
+      fileUrl = blob.row.file_url;
     } else {
       // Almacenamiento simulado para desarrollo local
-      fullPath = `local/${fileName}`;
       fileUrl = `/api/files/local/${fileName}`;
       console.log(`📁 Archivo simulado guardado: ${fileName} (${file.size} bytes, tipo: ${file.type})`);
+      
+      // Registrar en base de datos
+      await c.env.DB.prepare(`
+        INSERT INTO files (
+          filename, original_name, file_path, file_url, file_type, 
+          file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+      `).bind(
+        fileName,
+        file.name,
+        `local/${fileName}`,
+        fileUrl,
+        mappedFileType,
+        file.size,
+        file.type,
+        'project',
+        projectId,
+        user.userId,
+        new Date().toISOString()
+      ).run();
     }
     
-    // Registrar en base de datos
-    await c.env.DB.prepare(`
-      INSERT INTO files (
-        filename, original_name, file_path, file_url, file_type, 
-        file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at
-      ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    `).bind(
-      fileName,
-      file.name,
-      fullPath,
-      fileUrl,
-      mappedFileType,
-      file.size,
-      file.type,
-      'project',
-      projectId,
-      user.userId,
-      new Date().toISOString()
-    ).run();
-    
     return c.json({
       success: true,
       data: {
@@ -2710,37 +2739,231 @@ privateRoutes.post('/projects/:projectId/upload', async (c) => {
   }
 });
 
-// Subir archivo para producto específico
-privateRoutes.post('/projects/:projectId/products/:productId/upload', async (c) => {
+interface BulkUploadResult {
+  index: number;
+  original_name: string;
+  success: boolean;
+  file_id?: number;
+  filename?: string;
+  file_url?: string;
+  deduplicated?: boolean;
+  error?: string;
+}
+
+// Subida masiva de archivos a un proyecto
+// Recibe un lote de archivos (campo "files" repetido), los transmite a R2 en paralelo y
+// registra todas las filas de files en un único DB.batch(). El resultado es por archivo:
+// los que no pasan la validación o fallan al subir no impiden registrar los demás.
+privateRoutes.post('/projects/:projectId/files/bulk', async (c) => {
   try {
-    const { projectId, productId } = c.req.param();
+    const projectId = Number(c.req.param('projectId'));
     const user = c.get('user')!;
     
-    // Verificar permisos sobre el producto (ADMIN tiene acceso completo)
-    let productAccess;
-    if (user.role === 'ADMIN') {
-      // ADMIN puede acceder a cualquier producto
-      productAccess = await c.env.DB.prepare(`
-        SELECT pr.*, p.owner_id, 1 as has_permission
-        FROM products pr
-        JOIN projects p ON pr.project_id = p.id
-        WHERE pr.id = ? AND pr.project_id = ?
-      `).bind(productId, projectId).first();
-    } else {
-      productAccess = await c.env.DB.prepare(`
-        SELECT pr.*, p.owner_id, pc.can_add_products,
-               (pr.creator_id = ? OR p.owner_id = ? OR pc.user_id = ?) as has_permission
-        FROM products pr
-        JOIN projects p ON pr.project_id = p.id
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE pr.id = ? AND pr.project_id = ?
-      `).bind(user.userId, user.userId, user.userId, user.userId, productId, projectId).first();
+    // Mismos permisos que la subida individual
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canView) {
+      return c.json({ success: false, error: 'No tienes permisos para subir archivos a este proyecto' }, 403);
+    }
+    
+    const project = await c.env.DB.prepare(`
+      SELECT id FROM projects WHERE id = ?
+    `).bind(projectId).first();
+    
+    if (!project) {
+      return c.json({ success: false, error: 'Proyecto no encontrado' }, 404);
+    }
+    
+    if (exceedsUploadLimit(c, BULK_UPLOAD_MAX_BYTES)) {
+      return c.json({ success: false, error: `El lote no puede superar ${BULK_UPLOAD_MAX_BYTES / (1024 * 1024)}MB` }, 413);
+    }
+    
+    const formData = await c.req.formData();
+    const files = formData.getAll('files').filter((value): value is File => value instanceof File);
+    
+    if (files.length === 0) {
+      return c.json({ success: false, error: 'No se proporcionó ningún archivo' }, 400);
+    }
+    
+    if (files.length > BULK_UPLOAD_MAX_FILES) {
+      return c.json({ success: false, error: `Máximo ${BULK_UPLOAD_MAX_FILES} archivos por lote` }, 400);
+    }
+    
+    const allowedTypes = ['application/pdf', 'image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'text/plain'];
+    const maxSize = 15 * 1024 * 1024; // 15MB, como la subida individual
+    
+    const results: BulkUploadResult[] = files.map((file, index) => ({
+      index,
+      original_name: file.name,
+      success: false
+    }));
+    
+    const pending: { index: number; file: File; fileName: string; key: string }[] = [];
+    files.forEach((file, index) => {
+      if (!allowedTypes.includes(file.type)) {
+        results[index].error = 'Tipo de archivo no permitido. Permitidos: PDF, JPG, PNG, WebP, TXT';
+      } else if (file.size > maxSize) {
+        results[index].error = 'El archivo no puede superar 15MB';
+      } else {
+        const randomId = Math.random().toString(36).substring(2, 15);
+        const extension = file.name.split('.').pop();
+        const fileName = `project-${projectId}-${Date.now()}-${randomId}.${extension}`;
+        pending.push({ index, file, fileName, key: `projects/${fileName}` });
+      }
+    });
+    
+    // 1. Transmitir los archivos a R2 (calculando su hash) con concurrencia limitada
+    const staged: { index: number; file: File; fileName: string; key: string; hash: string | null }[] = [];
+    const uploadedAt = new Date().toISOString();
+    const queue = [...pending];
+    
+    await Promise.all(Array.from({ length: Math.min(BULK_UPLOAD_CONCURRENCY, queue.length) }, async () => {
+      while (queue.length > 0) {
+        const item = queue.shift()!;
+        if (!c.env.R2) {
+          // Almacenamiento simulado para desarrollo local
+          staged.push({ ...item, key: `local/${item.fileName}`, hash: null });
+          continue;
+        }
+        try {
+          const { sha256 } = await putFileStreamHashed(c.env.R2, item.key, item.file, {
+            httpMetadata: {
+              contentType: item.file.type,
+            },
+            customMetadata: {
+              originalName: item.file.name,
+              uploadedBy: user.userId.toString(),
+              projectId: projectId.toString(),
+              uploadedAt,
+            },
+          });
+          staged.push({ ...item, hash: sha256 });
+        } catch (error) {
+          console.error(`Error subiendo ${item.file.name} a R2:`, error);
+          results[item.index].error = 'Error al almacenar el archivo';
+        }
+      }
+    }));
+    
+    // 2. Registrar todas las filas en un único lote (transacción). Con R2, cada archivo
+    // reserva su blob y la fila toma la clave real del objeto, igual que storeFileBlob.
+    const statements: D1PreparedStatement[] = [];
+    for (const item of staged) {
+      const mappedFileType = getFileTypeFromMime(item.file.type);
+      if (item.hash) {
+        statements.push(reserveBlobStatement(c.env.DB, item.hash, item.key, item.file));
+        statements.push(c.env.DB.prepare(`
+          INSERT INTO files (
+            filename, original_name, file_path, file_url, file_type,
+            file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at, blob_hash
+          )
+          SELECT ?, ?, object_key, '/api/files/r2/' || object_key, ?, ?, ?, 'project', ?, ?, ?, hash
+          FROM file_blobs WHERE hash = ?
+          RETURNING id, file_path, file_url
+        `).bind(
+          item.fileName, item.file.name, mappedFileType, item.file.size, item.file.type,
+          projectId.toString(), user.userId, uploadedAt, item.hash
+        ));
+      } else {
+        statements.push(c.env.DB.prepare(`
+          INSERT INTO files (
+            filename, original_name, file_path, file_url, file_type,
+            file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at
+          ) VALUES (?, ?, ?, ?, ?, ?, ?, 'project', ?, ?, ?)
+          RETURNING id, file_path, file_url
+        `).bind(
+          item.fileName, item.file.name, item.key, `/api/files/local/${item.fileName}`, mappedFileType,
+          item.file.size, item.file.type, projectId.toString(), user.userId, uploadedAt
+        ));
+      }
     }
     
-    if (!productAccess || !productAccess.has_permission) {
+    const duplicateKeys: string[] = [];
+    if (statements.length > 0) {
+      let batchResults: D1Result<{ id: number; file_path: string; file_url: string; object_key?: string }>[];
+      try {
+        batchResults = await c.env.DB.batch(statements);
+      } catch (error) {
+        // El lote se revirtió completo: ningún objeto subido quedó referenciado
+        console.error('Error registrando lote de archivos:', error);
+        if (c.env.R2) {
+          await c.env.R2.delete(staged.filter(item => item.hash).map(item => item.key));
+        }
+        staged.forEach(item => { results[item.index].error = 'Error registrando el archivo'; });
+        staged.length = 0;
+        batchResults = [];
+      }
+      
+      let cursor = 0;
+      for (const item of staged) {
+        if (item.hash) {
+          const blob = batchResults[cursor++].results[0];
+          if (blob.object_key !== item.key) {
+            // Contenido repetido: se conserva el objeto existente
+            duplicateKeys.push(item.key);
+          }
+        }
+        const row = batchResults[cursor++].results[0];
+        Object.assign(results[item.index], {
+          success: true,
+          file_id: row.id,
+          filename: item.fileName,
+          file_url: row.file_url,
+          deduplicated: !!item.hash && row.file_path !== item.key
+        });
+      }
+    }
+    
+    // El lote ya está registrado: un fallo al limpiar no debe responder error (el cliente
+    // reintentaría y duplicaría las filas). La conciliación recoge los objetos que queden.
+    if (duplicateKeys.length > 0 && c.env.R2) {
+      try {
+        await c.env.R2.delete(duplicateKeys);
+      } catch (error) {
+        console.warn('No se pudieron eliminar los objetos duplicados del lote:', error);
+      }
+    }
+    
+    const uploaded = results.filter(result => result.success).length;
+    
+    return c.json({
+      success: true,
+      data: {
+        results,
+        uploaded,
+        failed: results.length - uploaded,
+        message: `${uploaded} de ${results.length} archivo(s) subido(s)`
+      }
+    });
+    
+  } catch (error) {
+    console.error('Error en subida masiva:', error);
+    return c.json({ success: false, error: 'Error interno del servidor' }, 500);
+  }
+});
+
+// Subir archivo para producto específico
+privateRoutes.post('/projects/:projectId/products/:productId/upload', async (c) => {
+  try {
+    const { projectId, productId } = c.req.param();
+    const user = c.get('user')!;
+    
+    // Verificar permisos sobre el producto (ADMIN tiene acceso completo; si no, creador o miembro del proyecto)
+    const product = await c.env.DB.prepare(`
+      SELECT pr.creator_id
+      FROM products pr
+      JOIN projects p ON pr.project_id = p.id
+      WHERE pr.id = ? AND pr.project_id = ?
+    `).bind(productId, projectId).first<{ creator_id: number }>();
+    const access = await getProjectAccess(c, Number(projectId));
+    
+    if (!product || !(access.canView || product.creator_id === user.userId)) {
       return c.json({ success: false, error: 'No tienes permisos para subir archivos a este producto' }, 403);
     }
     
+    if (exceedsUploadLimit(c, 20 * 1024 * 1024)) {
+      return c.json({ success: false, error: 'El archivo no puede superar 20MB' }, 413);
+    }
+    
     const formData = await c.req.formData();
     const file = formData.get('file') as File;
     
@@ -2777,44 +3000,44 @@ privateRoutes.post('/projects/:projectId/products/:productId/upload', async (c)
     const randomId = Math.random().toString(36).substring(2, 15);
     const extension = file.name.split('.').pop();
     const fileName = `product-${productId}-${timestamp}-${randomId}.${extension}`;
-    const fullPath = `products/${fileName}`;
     
-    // Subir a R2
-    const arrayBuffer = await file.arrayBuffer();
-    await c.env.R2.put(fullPath, arrayBuffer, {
-      httpMetadata: {
-        contentType: file.type,
-      },
-      customMetadata: {
-        originalName: file.name,
-        uploadedBy: user.userId.toString(),
-        productId: productId,
-        projectId: projectId,
-        uploadedAt: new Date().toISOString(),
-      },
-    });
-    
-    const fileUrl = `/api/admin/files/products/${fileName}`;
-    
-    // Registrar en base de datos
-    await c.env.DB.prepare(`
+    // Fila de files: el blob puede estar en la carpeta de otro archivo con el mismo contenido,
+    // así que la ruta y la URL se toman de la clave real del objeto
+    const insertFile = (hash: string) => c.env.DB.prepare(`
       INSERT INTO files (
         filename, original_name, file_path, file_url, file_type, 
-        file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at
-      ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at, blob_hash
+      )
+      SELECT ?, ?, object_key, '/api/admin/files/' || object_key, ?, ?, ?, ?, ?, ?, ?, hash
+      FROM file_blobs WHERE hash = ?
+      RETURNING file_url
     `).bind(
       fileName,
       file.name,
-      fullPath,
-      fileUrl,
       'product',
       file.size,
       file.type,
       'product',
       productId,
       user.userId,
-      new Date().toISOString()
-    ).run();
+      new Date().toISOString(),
+      hash
+    );
+    
+    // Subir a R2 (stream directo y deduplicado por contenido) y registrar en base de datos
+    const blob = await storeFileBlob<{ file_url: string }>(c.env.DB, c.env.R2, `products/${fileName}`, file, insertFile, {
+      httpMetadata: {
+        contentType: file.type,
+      },
+      customMetadata: {
+        originalName: file.name,
+        uploadedBy: user.userId.toString(),
+        productId: productId,
+        projectId: projectId,
+        uploadedAt: new Date().toISOString(),
+      },
+    });
+    const fileUrl = blob.row.file_url;
     
     // Actualizar el producto con la URL del archivo principal
     await c.env.DB.prepare(`
@@ -2840,6 +3063,373 @@ privateRoutes.post('/projects/:projectId/products/:productId/upload', async (c)
 });
 
 
+// ===== SUBIDAS MULTIPARTE REANUDABLES =====
+// Flujo: crear sesión → subir partes (en paralelo y reintentables) → completar o abortar.
+// Cada parte recibida queda registrada en upload_session_parts: tras un corte el cliente
+// consulta la sesión y envía solo las partes que faltan.
+
+interface UploadSession {
+  upload_id: string;
+  object_key: string;
+  user_id: number;
+  entity_type: 'project' | 'product';
+  project_id: number;
+  product_id: number | null;
+  filename: string;
+  original_name: string;
+  mime_type: string;
+  file_size: number;
+  part_size: number;
+  total_parts: number;
+  created_at: string;
+}
+
+// Crear una sesión de subida multiparte
+privateRoutes.post('/uploads', async (c) => {
+  try {
+    const user = c.get('user')!;
+    const body = await c.req.json<{
+      entity_type?: string;
+      project_id?: number | string;
+      product_id?: number | string;
+      filename?: string;
+      file_size?: number;
+      mime_type?: string;
+    }>();
+    
+    const entityType = body.entity_type === 'product' ? 'product' : body.entity_type === 'project' ? 'project' : null;
+    const projectId = Number(body.project_id);
+    const productId = entityType === 'product' ? Number(body.product_id) : null;
+    const fileSize = Number(body.file_size);
+    const mimeType = body.mime_type || '';
+    const originalName = (body.filename || '').trim();
+    
+    if (!entityType || !Number.isInteger(projectId) || (entityType === 'product' && !Number.isInteger(productId)) || !originalName) {
+      return c.json({ success: false, error: 'Datos de subida incompletos' }, 400);
+    }
+    
+    if (!Number.isInteger(fileSize) || fileSize <= 0) {
+      return c.json({ success: false, error: 'Tamaño de archivo inválido' }, 400);
+    }
+    
+    if (fileSize > MULTIPART_MAX_FILE_SIZE) {
+      return c.json({ success: false, error: 'El archivo no puede superar 500MB' }, 413);
+    }
+    
+    if (!MULTIPART_ALLOWED_TYPES[entityType].includes(mimeType)) {
+      return c.json({ success: false, error: 'Tipo de archivo no permitido' }, 400);
+    }
+    
+    // Mismas reglas de permisos que las subidas simples
+    if (entityType === 'project') {
+      const access = await getProjectAccess(c, projectId);
+      if (!access.canView) {
+        return c.json({ success: false, error: 'No tienes permisos para subir archivos a este proyecto' }, 403);
+      }
+      const project = await c.env.DB.prepare('SELECT id FROM projects WHERE id = ?').bind(projectId).first();
+      if (!project) {
+        return c.json({ success: false, error: 'Proyecto no encontrado' }, 404);
+      }
+    } else {
+      const product = await c.env.DB.prepare(
+        'SELECT creator_id FROM products WHERE id = ? AND project_id = ?'
+      ).bind(productId, projectId).first<{ creator_id: number }>();
+      const access = await getProjectAccess(c, projectId);
+      if (!product || !(access.canView || product.creator_id === user.userId)) {
+        return c.json({ success: false, error: 'No tienes permisos para subir archivos a este producto' }, 403);
+      }
+    }
+    
+    if (!c.env.R2) {
+      return c.json({ success: false, error: 'Almacenamiento no disponible' }, 500);
+    }
+    
+    // Generar nombre único
+    const timestamp = Date.now();
+    const randomId = Math.random().toString(36).substring(2, 15);
+    const extension = originalName.split('.').pop();
+    const fileName = entityType === 'project'
+      ? `project-${projectId}-${timestamp}-${randomId}.${extension}`
+      : `product-${productId}-${timestamp}-${randomId}.${extension}`;
+    const objectKey = `${entityType === 'project' ? 'projects' : 'products'}/${fileName}`;
+    
+    const multipart = await c.env.R2.createMultipartUpload(objectKey, {
+      httpMetadata: {
+        contentType: mimeType,
+      },
+      customMetadata: {
+        originalName,
+        uploadedBy: user.userId.toString(),
+        projectId: projectId.toString(),
+        ...(productId !== null ? { productId: productId.toString() } : {}),
+        uploadedAt: new Date().toISOString(),
+      },
+    });
+    
+    const totalParts = Math.ceil(fileSize / MULTIPART_PART_SIZE);
+    
+    await c.env.DB.prepare(`
+      INSERT INTO upload_sessions (
+        upload_id, object_key, user_id, entity_type, project_id, product_id,
+        filename, original_name, mime_type, file_size, part_size, total_parts
+      ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    `).bind(
+      multipart.uploadId,
+      objectKey,
+      user.userId,
+      entityType,
+      projectId,
+      productId,
+      fileName,
+      originalName,
+      mimeType,
+      fileSize,
+      MULTIPART_PART_SIZE,
+      totalParts
+    ).run();
+    
+    // Limpiar de paso las sesiones abandonadas (R2 ya no permite completarlas)
+    const cleanup = expireUploadSessions(c.env.DB, c.env.R2)
+      .catch(error => console.error('Error limpiando sesiones de subida caducadas:', error));
+    try {
+      c.executionCtx.waitUntil(cleanup);
+    } catch {
+      // Sin ExecutionContext (desarrollo local): la tarea continúa sin waitUntil
+    }
+    
+    return c.json({
+      success: true,
+      data: {
+        upload_id: multipart.uploadId,
+        part_size: MULTIPART_PART_SIZE,
+        total_parts: totalParts,
+        uploaded_parts: []
+      }
+    }, 201);
+    
+  } catch (error) {
+    console.error('Error creando subida multiparte:', error);
+    return c.json({ success: false, error: 'Error interno del servidor' }, 500);
+  }
+});
+
+// Estado de una sesión (partes ya recibidas) para reanudar la subida
+privateRoutes.get('/uploads/:uploadId', async (c) => {
+  try {
+    const { uploadId } = c.req.param();
+    const user = c.get('user')!;
+    
+    const session = await c.env.DB.prepare(
+      'SELECT * FROM upload_sessions WHERE upload_id = ? AND user_id = ?'
+    ).bind(uploadId, user.userId).first<UploadSession>();
+    
+    if (!session) {
+      return c.json({ success: false, error: 'Sesión de subida no encontrada' }, 404);
+    }
+    
+    const parts = await c.env.DB.prepare(
+      'SELECT part_number FROM upload_session_parts WHERE upload_id = ? ORDER BY part_number'
+    ).bind(uploadId).all<{ part_number: number }>();
+    
+    return c.json({
+      success: true,
+      data: {
+        upload_id: session.upload_id,
+        original_name: session.original_name,
+        file_size: session.file_size,
+        part_size: session.part_size,
+        total_parts: session.total_parts,
+        uploaded_parts: parts.results.map(part => part.part_number)
+      }
+    });
+    
+  } catch (error) {
+    console.error('Error obteniendo sesión de subida:', error);
+    return c.json({ success: false, error: 'Error interno del servidor' }, 500);
+  }
+});
+
+// Subir una parte (cuerpo binario). Reenviar una parte reemplaza la anterior.
+privateRoutes.put('/uploads/:uploadId/parts/:partNumber', async (c) => {
+  try {
+    const { uploadId } = c.req.param();
+    const partNumber = Number(c.req.param('partNumber'));
+    const user = c.get('user')!;
+    
+    const session = await c.env.DB.prepare(
+      'SELECT * FROM upload_sessions WHERE upload_id = ? AND user_id = ?'
+    ).bind(uploadId, user.userId).first<UploadSession>();
+    
+    if (!session) {
+      return c.json({ success: false, error: 'Sesión de subida no encontrada' }, 404);
+    }
+    
+    if (!Number.isInteger(partNumber) || partNumber < 1 || partNumber > session.total_parts) {
+      return c.json({ success: false, error: 'Número de parte inválido' }, 400);
+    }
+    
+    const expectedSize = getExpectedPartSize(session.file_size, session.part_size, partNumber);
+    const contentLength = Number(c.req.header('Content-Length'));
+    const body = c.req.raw.body;
+    
+    if (!body || contentLength !== expectedSize) {
+      return c.json({ success: false, error: `La parte ${partNumber} debe medir ${expectedSize} bytes` }, 400);
+    }
+    
+    if (!c.env.R2) {
+      return c.json({ success: false, error: 'Almacenamiento no disponible' }, 500);
+    }
+    
+    const multipart = c.env.R2.resumeMultipartUpload(session.object_key, session.upload_id);
+    const part = await uploadPartStream(multipart, partNumber, body, expectedSize);
+    
+    await c.env.DB.prepare(`
+      INSERT INTO upload_session_parts (upload_id, part_number, etag, part_size)
+      VALUES (?, ?, ?, ?)
+      ON CONFLICT(upload_id, part_number) DO UPDATE SET
+        etag = excluded.etag, part_size = excluded.part_size, uploaded_at = CURRENT_TIMESTAMP
+    `).bind(uploadId, partNumber, part.etag, expectedSize).run();
+    
+    return c.json({
+      success: true,
+      data: { part_number: partNumber, etag: part.etag }
+    });
+    
+  } catch (error) {
+    console.error('Error subiendo parte:', error);
+    return c.json({ success: false, error: 'Error interno del servidor' }, 500);
+  }
+});
+
+// Completar la subida y registrar el archivo
+privateRoutes.post('/uploads/:uploadId/complete', async (c) => {
+  try {
+    const { uploadId } = c.req.param();
+    const user = c.get('user')!;
+    
+    const session = await c.env.DB.prepare(
+      'SELECT * FROM upload_sessions WHERE upload_id = ? AND user_id = ?'
+    ).bind(uploadId, user.userId).first<UploadSession>();
+    
+    if (!session) {
+      return c.json({ success: false, error: 'Sesión de subida no encontrada' }, 404);
+    }
+    
+    const parts = await c.env.DB.prepare(
+      'SELECT part_number, etag FROM upload_session_parts WHERE upload_id = ? ORDER BY part_number'
+    ).bind(uploadId).all<{ part_number: number; etag: string }>();
+    
+    if (parts.results.length !== session.total_parts) {
+      const received = new Set(parts.results.map(part => part.part_number));
+      const missingParts: number[] = [];
+      for (let partNumber = 1; partNumber <= session.total_parts; partNumber++) {
+        if (!received.has(partNumber)) missingParts.push(partNumber);
+      }
+      return c.json({
+        success: false,
+        error: 'Faltan partes por subir',
+        data: { missing_parts: missingParts }
+      }, 409);
+    }
+    
+    if (!c.env.R2) {
+      return c.json({ success: false, error: 'Almacenamiento no disponible' }, 500);
+    }
+    
+    const multipart = c.env.R2.resumeMultipartUpload(session.object_key, session.upload_id);
+    await multipart.complete(parts.results.map(part => ({ partNumber: part.part_number, etag: part.etag })));
+    
+    const isProduct = session.entity_type === 'product';
+    const fileUrl = isProduct
+      ? `/api/admin/files/products/${session.filename}`
+      : `/api/files/r2/${session.object_key}`;
+    
+    // Registrar el archivo y cerrar la sesión en un solo lote
+    const statements = [
+      c.env.DB.prepare(`
+        INSERT INTO files (
+          filename, original_name, file_path, file_url, file_type, 
+          file_size, mime_type, entity_type, entity_id, uploaded_by, uploaded_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+      `).bind(
+        session.filename,
+        session.original_name,
+        session.object_key,
+        fileUrl,
+        isProduct ? 'product' : getFileTypeFromMime(session.mime_type),
+        session.file_size,
+        session.mime_type,
+        session.entity_type,
+        isProduct ? session.product_id : session.project_id,
+        user.userId,
+        new Date().toISOString()
+      ),
+      c.env.DB.prepare('DELETE FROM upload_session_parts WHERE upload_id = ?').bind(uploadId),
+      c.env.DB.prepare('DELETE FROM upload_sessions WHERE upload_id = ?').bind(uploadId)
+    ];
+    
+    if (isProduct) {
+      // Actualizar el producto con la URL del archivo principal
+      statements.push(c.env.DB.prepare(`
+        UPDATE products SET file_url = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND project_id = ?
+      `).bind(fileUrl, session.product_id, session.project_id));
+    }
+    
+    await c.env.DB.batch(statements);
+    
+    return c.json({
+      success: true,
+      data: {
+        file_url: fileUrl,
+        filename: session.filename,
+        original_name: session.original_name,
+        file_size: session.file_size,
+        message: 'Archivo subido exitosamente'
+      }
+    });
+    
+  } catch (error) {
+    console.error('Error completando subida multiparte:', error);
+    return c.json({ success: false, error: 'Error interno del servidor' }, 500);
+  }
+});
+
+// Cancelar una subida y liberar las partes almacenadas en R2
+privateRoutes.delete('/uploads/:uploadId', async (c) => {
+  try {
+    const { uploadId } = c.req.param();
+    const user = c.get('user')!;
+    
+    const session = await c.env.DB.prepare(
+      'SELECT * FROM upload_sessions WHERE upload_id = ? AND user_id = ?'
+    ).bind(uploadId, user.userId).first<UploadSession>();
+    
+    if (!session) {
+      return c.json({ success: false, error: 'Sesión de subida no encontrada' }, 404);
+    }
+    
+    if (c.env.R2) {
+      try {
+        await c.env.R2.resumeMultipartUpload(session.object_key, session.upload_id).abort();
+      } catch (error) {
+        // La subida pudo haber expirado o abortado en R2; igualmente se elimina la sesión
+        console.warn('No se pudo abortar la subida en R2:', error);
+      }
+    }
+    
+    await c.env.DB.batch([
+      c.env.DB.prepare('DELETE FROM upload_session_parts WHERE upload_id = ?').bind(uploadId),
+      c.env.DB.prepare('DELETE FROM upload_sessions WHERE upload_id = ?').bind(uploadId)
+    ]);
+    
+    return c.json({ success: true, message: 'Subida cancelada' });
+    
+  } catch (error) {
+    console.error('Error cancelando subida multiparte:', error);
+    return c.json({ success: false, error: 'Error interno del servidor' }, 500);
+  }
+});
 
 // Listar archivos de un producto
 privateRoutes.get('/projects/:projectId/products/:productId/files', async (c) => {
@@ -2847,25 +3437,14 @@ privateRoutes.get('/projects/:projectId/products/:productId/files', async (c) =>
     const { projectId, productId } = c.req.param();
     const user = c.get('user')!;
     
-    // Verificar acceso (ADMIN tiene acceso completo)
-    let hasAccess;
-    if (user.role === 'ADMIN') {
-      // ADMIN puede acceder a cualquier producto
-      hasAccess = await c.env.DB.prepare(`
-        SELECT 1 FROM products pr
-        JOIN projects p ON pr.project_id = p.id
-        WHERE pr.id = ? AND pr.project_id = ?
-      `).bind(productId, projectId).first();
-    } else {
-      hasAccess = await c.env.DB.prepare(`
-        SELECT 1 FROM products pr
-        JOIN projects p ON pr.project_id = p.id
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE pr.id = ? AND pr.project_id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-      `).bind(user.userId, productId, projectId, user.userId, user.userId).first();
-    }
+    // Verificar acceso (ADMIN tiene acceso completo; si no, miembro del proyecto)
+    const product = await c.env.DB.prepare(`
+      SELECT 1 FROM products pr
+      JOIN projects p ON pr.project_id = p.id
+      WHERE pr.id = ? AND pr.project_id = ?
+    `).bind(productId, projectId).first();
     
-    if (!hasAccess) {
+    if (!product || !(await getProjectAccess(c, Number(projectId))).canView) {
       return c.json({ success: false, error: 'No tienes acceso a este producto' }, 403);
     }
     
@@ -2873,7 +3452,7 @@ privateRoutes.get('/projects/:projectId/products/:productId/files', async (c) =>
       SELECT f.*, u.full_name as uploaded_by_name
       FROM files f
       LEFT JOIN users u ON f.uploaded_by = u.id
-      WHERE f.entity_type = 'product' AND f.entity_id = ?
+      WHERE f.product_id = ?
       ORDER BY f.uploaded_at DESC
     `).bind(productId).all();
     
@@ -2898,8 +3477,8 @@ privateRoutes.delete('/files/:fileId', async (c) => {
     const fileInfo = await c.env.DB.prepare(`
       SELECT f.*, p.owner_id, pr.creator_id as product_creator
       FROM files f
-      LEFT JOIN projects p ON (f.entity_type = 'project' AND f.entity_id = p.id)
-      LEFT JOIN products pr ON (f.entity_type = 'product' AND f.entity_id = pr.id)
+      LEFT JOIN projects p ON (f.entity_type = 'project' AND p.id = f.project_id)
+      LEFT JOIN products pr ON (f.entity_type = 'product' AND pr.id = f.product_id)
       WHERE f.id = ?
     `).bind(fileId).first();
     
@@ -2917,18 +3496,16 @@ privateRoutes.delete('/files/:fileId', async (c) => {
       return c.json({ success: false, error: 'No tienes permisos para eliminar este archivo' }, 403);
     }
     
-    // Eliminar de R2
-    if (c.env.R2) {
-      try {
-        await c.env.R2.delete(fileInfo.file_path as string);
-      } catch (error) {
-        console.warn('Error eliminando de R2:', error);
-      }
-    }
-    
     // Eliminar de base de datos
     await c.env.DB.prepare(`DELETE FROM files WHERE id = ?`).bind(fileId).run();
     
+    // Liberar de R2 (los blobs compartidos solo se borran al quedar sin referencias)
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, [fileInfo as unknown as StoredFileRef]);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
+    
     return c.json({
       success: true,
       data: { message: 'Archivo eliminado exitosamente' }
@@ -2945,80 +3522,39 @@ privateRoutes.delete('/files/:fileId', async (c) => {
 // Calcular score de un proyecto específico
 privateRoutes.post('/projects/:projectId/calculate-score', async (c) => {
   try {
-    const { projectId } = c.req.param();
-    const user = c.get('user')!;
-    
-    // Verificar permisos - admins pueden acceder a todos los proyectos
-    let project;
-    if (user.role === 'ADMIN') {
-      // Los administradores pueden acceder a cualquier proyecto
-      project = await c.env.DB.prepare(`
-        SELECT p.*
-        FROM projects p
-        WHERE p.id = ?
-      `).bind(projectId).first();
-    } else {
-      // Los investigadores solo pueden acceder a sus proyectos o aquellos donde colaboran
-      project = await c.env.DB.prepare(`
-        SELECT p.*, pc.can_edit_project
-        FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
-    }
+    const projectId = parseInt(c.req.param('projectId'));
     
-    if (!project) {
+    // Verificar permisos - admins pueden acceder a todos los proyectos
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canView) {
       return c.json({ success: false, error: 'Proyecto no encontrado o sin permisos' }, 404);
     }
     
-    // Obtener criterios de scoring activos
-    const criteria = await c.env.DB.prepare(`
-      SELECT * FROM scoring_criteria WHERE is_active = 1 ORDER BY weight DESC
-    `).all();
-    
-    // Calcular scores por categoría
-    const scores = await calculateProjectScores(c.env.DB, projectId, criteria.results);
-    
-    // Generar recomendaciones
-    const recommendations = generateRecommendations(scores, project);
+    // Insumos agregados del proyecto y pesos vigentes de scoring_criteria
+    const [features, weights] = await Promise.all([
+      loadScoringFeatures(c.env.DB, { projectId }),
+      loadScoringWeights(c.env.DB)
+    ]);
     
-    // Determinar categoría de evaluación
-    const category = determineEvaluationCategory(scores.total_score);
+    if (features.length === 0) {
+      return c.json({ success: false, error: 'Proyecto no encontrado o sin permisos' }, 404);
+    }
     
-    // Marcar scores anteriores como no actuales
-    await c.env.DB.prepare(`
-      UPDATE project_scores SET is_current = 0 WHERE project_id = ?
-    `).bind(projectId).run();
+    const [result] = scoreProjects(features, weights);
+    const scores = toScoreColumns(result);
     
-    // Guardar nuevo score
-    await c.env.DB.prepare(`
-      INSERT INTO project_scores (
-        project_id, completeness_score, collaboration_score, productivity_score,
-        impact_score, innovation_score, timeline_score, total_score,
-        evaluation_category, recommendations, last_calculated_at, is_current
-      ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, 1)
-    `).bind(
-      projectId,
-      scores.completeness_score,
-      scores.collaboration_score,
-      scores.productivity_score,
-      scores.impact_score,
-      scores.innovation_score,
-      scores.timeline_score,
-      scores.total_score,
-      category,
-      JSON.stringify(recommendations)
-    ).run();
+    // Marcar scores anteriores como no actuales y guardar el nuevo en una sola transacción
+    await saveProjectScores(c.env.DB, [result], new Date().toISOString());
     
     // Generar alertas si es necesario
-    await generateProjectAlerts(c.env.DB, projectId, scores, project);
+    await generateProjectAlerts(c.env.DB, projectId, scores);
     
     return c.json({
       success: true,
       data: {
         scores,
-        category,
-        recommendations,
+        category: result.evaluation_category,
+        recommendations: result.recommendations,
         message: 'Score calculado exitosamente'
       }
     });
@@ -3044,11 +3580,7 @@ privateRoutes.get('/projects/:projectId/score', async (c) => {
       `).bind(projectId).first();
     } else {
       // Los investigadores solo pueden acceder a sus proyectos o aquellos donde colaboran
-      hasAccess = await c.env.DB.prepare(`
-        SELECT 1 FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
+      hasAccess = (await getProjectAccess(c, Number(projectId))).canView;
     }
     
     if (!hasAccess) {
@@ -3082,16 +3614,11 @@ privateRoutes.get('/projects/:projectId/score', async (c) => {
 privateRoutes.get('/projects/:projectId/alerts', async (c) => {
   try {
     const { projectId } = c.req.param();
-    const user = c.get('user')!;
     
-    // Verificar acceso
-    const hasAccess = await c.env.DB.prepare(`
-      SELECT 1 FROM projects p
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-      WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-    `).bind(user.userId, projectId, user.userId, user.userId).first();
+    // Verificar acceso (solo propietario o colaboradores)
+    const access = await getProjectAccess(c, Number(projectId));
     
-    if (!hasAccess) {
+    if (!access.isOwner && !access.isCollaborator) {
       return c.json({ success: false, error: 'No tienes acceso a este proyecto' }, 403);
     }
     
@@ -3119,15 +3646,13 @@ privateRoutes.put('/alerts/:alertId/acknowledge', async (c) => {
     const user = c.get('user')!;
     
     // Verificar que el usuario tiene acceso a la alerta
-    const alert = await c.env.DB.prepare(`
-      SELECT a.*, p.owner_id, pc.user_id as collaborator_id
-      FROM project_alerts a
-      JOIN projects p ON a.project_id = p.id
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-      WHERE a.id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-    `).bind(user.userId, alertId, user.userId, user.userId).first();
+    const alert = await c.env.DB.prepare(
+      'SELECT project_id FROM project_alerts WHERE id = ?'
+    ).bind(alertId).first<{ project_id: number }>();
     
-    if (!alert) {
+    // Solo el propietario o los colaboradores del proyecto
+    const access = alert ? await getProjectAccess(c, alert.project_id) : null;
+    if (!alert || !(access?.isOwner || access?.isCollaborator)) {
       return c.json({ success: false, error: 'Alerta no encontrada o sin permisos' }, 404);
     }
     
@@ -3152,66 +3677,31 @@ privateRoutes.put('/alerts/:alertId/acknowledge', async (c) => {
 // Calcular scores masivos para todos los proyectos del usuario
 privateRoutes.post('/projects/calculate-all-scores', async (c) => {
   try {
-    const user = c.get('user')!;
-    
-    // Obtener todos los proyectos del usuario
-    const projects = await c.env.DB.prepare(`
-      SELECT DISTINCT p.id FROM projects p
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id
-      WHERE p.owner_id = ? OR pc.user_id = ?
-    `).bind(user.userId, user.userId).all();
+    // Proyectos propios y colaboraciones del usuario
+    const memberships = await getProjectMemberships(c);
+    const projectIds = Array.from(memberships.keys());
     
-    const criteria = await c.env.DB.prepare(`
-      SELECT * FROM scoring_criteria WHERE is_active = 1 ORDER BY weight DESC
-    `).all();
+    const [features, weights] = await Promise.all([
+      loadScoringFeatures(c.env.DB, { projectIds, allStatuses: true }),
+      loadScoringWeights(c.env.DB)
+    ]);
     
-    let processedCount = 0;
-    const results = [];
+    const scored = scoreProjects(features, weights);
+    await saveProjectScores(c.env.DB, scored, new Date().toISOString());
     
-    for (const project of projects.results) {
-      try {
-        const scores = await calculateProjectScores(c.env.DB, project.id as number, criteria.results);
-        const category = determineEvaluationCategory(scores.total_score);
-        
-        // Marcar scores anteriores como no actuales
-        await c.env.DB.prepare(`
-          UPDATE project_scores SET is_current = 0 WHERE project_id = ?
-        `).bind(project.id).run();
-        
-        // Guardar nuevo score
-        await c.env.DB.prepare(`
-          INSERT INTO project_scores (
-            project_id, completeness_score, collaboration_score, productivity_score,
-            impact_score, innovation_score, timeline_score, total_score,
-            evaluation_category, last_calculated_at, is_current
-          ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, 1)
-        `).bind(
-          project.id,
-          scores.completeness_score,
-          scores.collaboration_score,
-          scores.productivity_score,
-          scores.impact_score,
-          scores.innovation_score,
-          scores.timeline_score,
-          scores.total_score,
-          category
-        ).run();
-        
-        processedCount++;
-        results.push({ project_id: project.id, total_score: scores.total_score, category });
-        
-      } catch (error) {
-        console.error(`Error procesando proyecto ${project.id}:`, error);
-      }
-    }
+    const results = scored.map(result => ({
+      project_id: result.project_id,
+      total_score: result.scores.total,
+      category: result.evaluation_category
+    }));
     
     return c.json({
       success: true,
       data: {
-        processed_count: processedCount,
-        total_projects: projects.results.length,
+        processed_count: results.length,
+        total_projects: projectIds.length,
         results,
-        message: `${processedCount} proyectos procesados exitosamente`
+        message: `${results.length} proyectos procesados exitosamente`
       }
     });
     
@@ -3223,132 +3713,20 @@ privateRoutes.post('/projects/calculate-all-scores', async (c) => {
 
 // ===== FUNCIONES AUXILIARES PARA SCORING =====
 
-async function calculateProjectScores(db: any, projectId: number, criteria: any[]) {
-  // Obtener datos del proyecto
-  const project = await db.prepare(`
-    SELECT p.*, COUNT(DISTINCT pc.user_id) as collaborator_count,
-           COUNT(DISTINCT pr.id) as product_count
-    FROM projects p
-    LEFT JOIN project_collaborators pc ON p.id = pc.project_id
-    LEFT JOIN products pr ON p.id = pr.project_id
-    WHERE p.id = ?
-    GROUP BY p.id
-  `).bind(projectId).first();
-  
-  if (!project) throw new Error('Proyecto no encontrado');
-  
-  // 1. Score de Completitud (0-100)
-  let completeness = 0;
-  if (project.title && project.title.length > 10) completeness += 20;
-  if (project.abstract && project.abstract.length > 50) completeness += 20;
-  if (project.methodology && project.methodology.length > 100) completeness += 15;
-  if (project.keywords && project.keywords.length > 0) completeness += 10;
-  if (project.introduction && project.introduction.length > 100) completeness += 15;
-  if (project.start_date) completeness += 10;
-  if (project.budget && project.budget > 0) completeness += 10;
-  
-  // 2. Score de Colaboración (0-100)
-  const collabCount = project.collaborator_count || 0;
-  let collaboration = Math.min(collabCount * 20, 80); // Máximo 80 por colaboradores
-  if (collabCount >= 5) collaboration += 20; // Bonus por red amplia
-  
-  // 3. Score de Productividad (0-100)
-  const productCount = project.product_count || 0;
-  let productivity = Math.min(productCount * 15, 85); // Máximo 85 por productos
-  if (productCount >= 10) productivity += 15; // Bonus por alta productividad
-  
-  // 4. Score de Impacto (0-100) - Simulado por ahora
-  const impact = Math.min(50 + (productCount * 10), 100);
-  
-  // 5. Score de Innovación (0-100) - Basado en diversidad de productos
-  const innovation = Math.min(30 + (productCount * 8), 100);
-  
-  // 6. Score de Timeline (0-100)
-  const now = new Date();
-  const updated = new Date(project.updated_at);
-  const daysSinceUpdate = Math.floor((now.getTime() - updated.getTime()) / (1000 * 60 * 60 * 24));
-  let timeline = Math.max(100 - (daysSinceUpdate * 2), 0); // Penalizar inactividad
-  
-  // Calcular score total ponderado
-  const criteriaWeights = criteria.reduce((acc: any, c: any) => {
-    acc[c.criterion_name] = c.weight;
-    return acc;
-  }, {});
-  
-  const total_score = Math.round(
-    (completeness * (criteriaWeights.completeness || 0.25)) +
-    (collaboration * (criteriaWeights.collaboration || 0.20)) +
-    (productivity * (criteriaWeights.productivity || 0.25)) +
-    (impact * (criteriaWeights.impact || 0.15)) +
-    (innovation * (criteriaWeights.innovation || 0.10)) +
-    (timeline * (criteriaWeights.timeline || 0.05))
-  );
-  
+// Scores con los nombres de columna de project_scores (formato de respuesta de estas rutas)
+function toScoreColumns(result: ProjectScoreResult) {
   return {
-    completeness_score: Math.round(completeness),
-    collaboration_score: Math.round(collaboration),
-    productivity_score: Math.round(productivity),
-    impact_score: Math.round(impact),
-    innovation_score: Math.round(innovation),
-    timeline_score: Math.round(timeline),
-    total_score: Math.min(total_score, 100)
+    completeness_score: result.scores.completeness,
+    collaboration_score: result.scores.collaboration,
+    productivity_score: result.scores.productivity,
+    impact_score: result.scores.impact,
+    innovation_score: result.scores.innovation,
+    timeline_score: result.scores.timeline,
+    total_score: result.scores.total
   };
 }
 
-function generateRecommendations(scores: any, project: any) {
-  const recommendations = [];
-  
-  if (scores.completeness_score < 60) {
-    recommendations.push({
-      category: 'completeness',
-      priority: 'HIGH',
-      title: 'Mejorar Completitud del Proyecto',
-      description: 'Completa la información faltante: metodología, introducción, presupuesto y fechas.',
-      actions: ['Añadir metodología detallada', 'Completar introducción', 'Definir presupuesto']
-    });
-  }
-  
-  if (scores.collaboration_score < 40) {
-    recommendations.push({
-      category: 'collaboration',
-      priority: 'MEDIUM',
-      title: 'Ampliar Red de Colaboración',
-      description: 'Considera invitar más colaboradores para enriquecer el proyecto.',
-      actions: ['Invitar colaboradores externos', 'Contactar otras instituciones', 'Formar alianzas estratégicas']
-    });
-  }
-  
-  if (scores.productivity_score < 50) {
-    recommendations.push({
-      category: 'productivity',
-      priority: 'HIGH',
-      title: 'Incrementar Productividad',
-      description: 'El proyecto necesita generar más productos CTeI.',
-      actions: ['Crear más productos', 'Establecer metas de productividad', 'Optimizar flujo de trabajo']
-    });
-  }
-  
-  if (scores.timeline_score < 70) {
-    recommendations.push({
-      category: 'timeline',
-      priority: 'MEDIUM',
-      title: 'Activar Proyecto',
-      description: 'El proyecto muestra poca actividad reciente.',
-      actions: ['Actualizar información', 'Registrar avances', 'Definir próximos hitos']
-    });
-  }
-  
-  return recommendations;
-}
-
-function determineEvaluationCategory(totalScore: number): string {
-  if (totalScore >= 85) return 'EXCELENTE';
-  if (totalScore >= 70) return 'BUENO';
-  if (totalScore >= 50) return 'REGULAR';
-  return 'NECESITA_MEJORA';
-}
-
-async function generateProjectAlerts(db: any, projectId: number, scores: any, project: any) {
+async function generateProjectAlerts(db: any, projectId: number, scores: any) {
   const alerts = [];
   
   // Alerta por score bajo
@@ -3408,21 +3786,23 @@ privateRoutes.post('/projects/:projectId/files', requireRole('INVESTIGATOR', 'AD
     const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
     
-    // Verificar acceso al proyecto
-    const project = await c.env.DB.prepare(`
-      SELECT p.id, p.owner_id, pc.user_id as collaborator_id
-      FROM projects p
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-      WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ?)
-    `).bind(user.userId, projectId, user.userId, user.userId).first();
+    // Verificar acceso al proyecto (solo propietario o colaboradores)
+    const access = await getProjectAccess(c, projectId);
 
-    if (!project) {
+    if (!access.isOwner && !access.isCollaborator) {
       return c.json<APIResponse>({
         success: false,
         error: 'Proyecto no encontrado o sin permisos para subir archivos'
       }, 404);
     }
 
+    if (exceedsUploadLimit(c, 50 * 1024 * 1024)) {
+      return c.json<APIResponse>({
+        success: false,
+        error: 'El archivo es demasiado grande (máximo 50MB)'
+      }, 413);
+    }
+
     const formData = await c.req.formData();
     const file = formData.get('file') as File;
     const fileType = formData.get('fileType') as string || 'document';
@@ -3479,42 +3859,44 @@ privateRoutes.post('/projects/:projectId/files', requireRole('INVESTIGATOR', 'AD
     const randomId = Math.random().toString(36).substring(2, 15);
     const extension = file.name.split('.').pop();
     const fileName = `${timestamp}_${randomId}.${extension}`;
-    const filePath = `projects/${fileName}`;
-
-    // Subir a R2
-    await c.env.R2.put(filePath, await file.arrayBuffer(), {
-      customMetadata: {
-        originalName: file.name,
-        uploadedBy: user.userId.toString(),
-        projectId: projectId.toString(),
-        fileType: fileType,
-        uploadedAt: new Date().toISOString(),
-      },
-    });
 
-    // Registrar en base de datos
-    const insertResult = await c.env.DB.prepare(`
+    // Registrar en base de datos (file_path es la clave real del blob)
+    const insertFile = (hash: string) => c.env.DB.prepare(`
       INSERT INTO files (
         filename, original_name, file_path, file_url, file_type, 
-        file_size, mime_type, entity_type, entity_id, uploaded_by
-      ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        file_size, mime_type, entity_type, entity_id, uploaded_by, blob_hash
+      )
+      SELECT ?, ?, object_key, ?, ?, ?, ?, ?, ?, ?, hash
+      FROM file_blobs WHERE hash = ?
+      RETURNING id
     `).bind(
       fileName,
       file.name,
-      filePath,
       `/api/private/files/download/${fileName}`,
       mappedFileType,
       file.size,
       file.type,
       'project',
       projectId.toString(),
-      user.userId
-    ).run();
+      user.userId,
+      hash
+    );
+
+    // Subir a R2 (stream directo y deduplicado por contenido) y registrar el archivo
+    const blob = await storeFileBlob<{ id: number }>(c.env.DB, c.env.R2, `projects/${fileName}`, file, insertFile, {
+      customMetadata: {
+        originalName: file.name,
+        uploadedBy: user.userId.toString(),
+        projectId: projectId.toString(),
+        fileType: fileType,
+        uploadedAt: new Date().toISOString(),
+      },
+    });
 
     return c.json<APIResponse<any>>({
       success: true,
       data: {
-        fileId: insertResult.meta.last_row_id,
+        fileId: blob.row.id,
         fileName: fileName,
         originalName: file.name,
         fileUrl: `/api/private/files/download/${fileName}`,
@@ -3535,28 +3917,10 @@ privateRoutes.post('/projects/:projectId/files', requireRole('INVESTIGATOR', 'AD
 // Obtener archivos de un proyecto
 privateRoutes.get('/projects/:projectId/files', async (c) => {
   try {
-    const user = c.get('user')!;
     const projectId = parseInt(c.req.param('projectId'));
     
-    // Verificar acceso al proyecto (ADMIN tiene acceso completo)
-    let project;
-    if (user.role === 'ADMIN') {
-      // ADMIN puede acceder a cualquier proyecto
-      project = await c.env.DB.prepare(`
-        SELECT p.id, p.owner_id, null as collaborator_id
-        FROM projects p
-        WHERE p.id = ?
-      `).bind(projectId).first();
-    } else {
-      project = await c.env.DB.prepare(`
-        SELECT p.id, p.owner_id, pc.user_id as collaborator_id
-        FROM projects p
-        LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-        WHERE p.id = ? AND (p.owner_id = ? OR pc.user_id = ? OR p.is_public = 1)
-      `).bind(user.userId, projectId, user.userId, user.userId).first();
-    }
-
-    if (!project) {
+    // Verificar acceso al proyecto (ADMIN tiene acceso completo; se admiten proyectos públicos)
+    if (!(await canViewProject(c, projectId))) {
       return c.json<APIResponse>({
         success: false,
         error: 'Proyecto no encontrado o sin permisos'
@@ -3570,9 +3934,9 @@ privateRoutes.get('/projects/:projectId/files', async (c) => {
         u.full_name as uploaded_by_name, u.email as uploaded_by_email
       FROM files f
       LEFT JOIN users u ON f.uploaded_by = u.id
-      WHERE f.entity_type = 'project' AND f.entity_id = ?
+      WHERE f.project_id = ? AND f.entity_type = 'project'
       ORDER BY f.uploaded_at DESC
-    `).bind(projectId.toString()).all();
+    `).bind(projectId).all();
 
     return c.json<APIResponse<any>>({
       success: true,
@@ -3588,53 +3952,332 @@ privateRoutes.get('/projects/:projectId/files', async (c) => {
   }
 });
 
+interface AccessibleFile {
+  file_path: string;
+  original_name: string;
+  mime_type: string;
+  uploaded_by: number;
+  entity_type: string;
+  project_id: number | null;
+}
+
+// Busca un archivo por nombre y comprueba si el usuario puede leerlo: ADMIN, quien lo subió
+// o miembro del proyecto (solo archivos de proyecto)
+async function findAccessibleFile(c: any, filename: string): Promise<{ file: AccessibleFile | null; hasAccess: boolean }> {
+  const user = c.get('user')!;
+  const file = await c.env.DB.prepare(`
+    SELECT file_path, original_name, mime_type, uploaded_by, entity_type, project_id
+    FROM files
+    WHERE filename = ?
+  `).bind(filename).first<AccessibleFile>();
+
+  if (!file) {
+    return { file: null, hasAccess: false };
+  }
+
+  if (user.role === 'ADMIN' || file.uploaded_by === user.userId) {
+    return { file, hasAccess: true };
+  }
+
+  const hasAccess = file.entity_type === 'project' && file.project_id !== null &&
+                    (await getProjectAccess(c, file.project_id)).canView;
+  return { file, hasAccess };
+}
+
 // Descargar archivo
 privateRoutes.get('/files/download/:filename', async (c) => {
   try {
     const { filename } = c.req.param();
     
-    // Verificar que el archivo existe en la base de datos
-    const fileRecord = await c.env.DB.prepare(`
-      SELECT f.*, p.owner_id, pc.user_id as collaborator_id
-      FROM files f
-      LEFT JOIN projects p ON f.entity_type = 'project' AND CAST(f.entity_id AS INTEGER) = p.id
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id
-      WHERE f.filename = ?
-    `).bind(filename).first();
+    // Verificar que el archivo existe y los permisos del usuario
+    const { file: fileRecord, hasAccess } = await findAccessibleFile(c, filename);
 
     if (!fileRecord) {
       return c.text('Archivo no encontrado', 404);
     }
 
-    // Verificar permisos
-    const user = c.get('user')!;
-    const hasAccess = user.role === 'ADMIN' || 
-                      fileRecord.uploaded_by === user.userId ||
-                      fileRecord.owner_id === user.userId ||
-                      fileRecord.collaborator_id === user.userId;
+    if (!hasAccess) {
+      return c.text('Sin permisos para acceder al archivo', 403);
+    }
+
+    // Obtener archivo de R2 (admite Range y revalidación con ETag / Last-Modified)
+    return await serveR2Object(c, c.env.R2, fileRecord.file_path, {
+      filename: fileRecord.original_name,
+      contentType: fileRecord.mime_type,
+      cacheControl: 'private, max-age=3600',
+    });
+
+  } catch (error) {
+    console.error('Error descargando archivo:', error);
+    return c.text('Error interno del servidor', 500);
+  }
+});
+
+// Miniatura de un archivo de imagen (se genera en la primera petición)
+privateRoutes.get('/files/thumbnail/:filename', async (c) => {
+  try {
+    const { filename } = c.req.param();
+    
+    // Mismas reglas de acceso que la descarga del archivo
+    const { file: fileRecord, hasAccess } = await findAccessibleFile(c, filename);
+
+    if (!fileRecord) {
+      return c.text('Archivo no encontrado', 404);
+    }
 
     if (!hasAccess) {
       return c.text('Sin permisos para acceder al archivo', 403);
     }
 
-    // Obtener archivo de R2
-    const object = await c.env.R2.get(fileRecord.file_path);
+    try {
+      const thumbnail = await serveThumbnail(
+        c, fileRecord.file_path, fileRecord.mime_type, parseThumbnailSize(c.req.query('size'))
+      );
+      if (thumbnail) return thumbnail;
+    } catch (error) {
+      // Imagen corrupta o fallo de Images: se trata como miniatura no disponible
+      console.warn('No se pudo generar la miniatura:', error);
+    }
     
+    return c.text('Miniatura no disponible', 404);
+
+  } catch (error) {
+    console.error('Error sirviendo miniatura:', error);
+    return c.text('Error interno del servidor', 500);
+  }
+});
+
+const ARCHIVE_HEAD_CONCURRENCY = 20;
+// Cada archivo cuesta dos subpeticiones a R2 (head + get) y Workers admite 1000 por invocación;
+// superarlo a mitad del stream entregaría un ZIP truncado con la respuesta ya enviada
+const ARCHIVE_MAX_FILES = 450;
+
+const ARCHIVE_FILE_COLUMNS = `
+  f.filename, f.original_name, f.file_path, f.file_size, f.mime_type, f.uploaded_at,
+  f.blob_hash, f.entity_type, f.product_id, pr.product_code
+`;
+
+interface ArchiveFileRow {
+  filename: string;
+  original_name: string;
+  file_path: string;
+  file_size: number;
+  mime_type: string | null;
+  uploaded_at: string;
+  blob_hash: string | null;
+  entity_type: string;
+  product_id: number | null;
+  product_code: string | null;
+}
+
+// Nombre seguro dentro del ZIP: sin separadores ni caracteres de control y sin repetir
+function archiveEntryName(folder: string, originalName: string, used: Set<string>): string {
+  const safeName = (originalName || 'archivo').replace(/[\\/\x00-\x1f]/g, '_').trim() || 'archivo';
+  const dot = safeName.lastIndexOf('.');
+  const base = dot > 0 ? safeName.slice(0, dot) : safeName;
+  const extension = dot > 0 ? safeName.slice(dot) : '';
+
+  let name = `${folder}/${safeName}`;
+  for (let copy = 2; used.has(name.toLowerCase()); copy++) {
+    name = `${folder}/${base} (${copy})${extension}`;
+  }
+  used.add(name.toLowerCase());
+  return name;
+}
+
+// Responde un ZIP con los archivos indicados leídos directamente de R2 y un manifest.json.
+// Los tamaños se toman de R2 (head) para poder anunciar Content-Length; los objetos que ya
+// no existen se omiten y se listan en el manifiesto.
+async function streamFilesArchive(
+  c: any,
+  archiveName: string,
+  scope: Record<string, unknown>,
+  files: ArchiveFileRow[]
+): Promise<Response> {
+  if (files.length > ARCHIVE_MAX_FILES) {
+    return c.json({
+      success: false,
+      error: `El ZIP no puede incluir más de ${ARCHIVE_MAX_FILES} archivos; exporta los productos por separado`
+    }, 413);
+  }
+
+  const bucket: R2Bucket = c.env.R2;
+
+  const objects: (R2Object | null)[] = [];
+  for (let i = 0; i < files.length; i += ARCHIVE_HEAD_CONCURRENCY) {
+    const chunk = files.slice(i, i + ARCHIVE_HEAD_CONCURRENCY);
+    objects.push(...await Promise.all(chunk.map(file => bucket.head(file.file_path))));
+  }
+
+  const usedNames = new Set<string>(['manifest.json']);
+  const entries: ZipEntry[] = [];
+  const manifestFiles: Record<string, unknown>[] = [];
+  const missing: string[] = [];
+
+  files.forEach((file, index) => {
+    const object = objects[index];
     if (!object) {
-      return c.text('Archivo no encontrado en el almacenamiento', 404);
+      missing.push(file.original_name);
+      return;
     }
 
-    return new Response(object.body, {
-      headers: {
-        'Content-Type': fileRecord.mime_type,
-        'Content-Disposition': `inline; filename="${fileRecord.original_name}"`,
-        'Content-Length': fileRecord.file_size.toString(),
-      },
+    const folder = file.entity_type === 'product'
+      ? `productos/${file.product_id}${file.product_code ? `-${file.product_code}` : ''}`
+      : 'proyecto';
+    const name = archiveEntryName(folder, file.original_name, usedNames);
+
+    entries.push({
+      name,
+      size: object.size,
+      modified: object.uploaded,
+      open: async () => (await bucket.get(file.file_path))?.body ?? null
     });
+    manifestFiles.push({
+      path: name,
+      original_name: file.original_name,
+      size: object.size,
+      mime_type: file.mime_type,
+      uploaded_at: file.uploaded_at,
+      sha256: file.blob_hash,
+      entity_type: file.entity_type,
+      product_id: file.product_id
+    });
+  });
+
+  const manifest = new TextEncoder().encode(JSON.stringify({
+    generated_at: new Date().toISOString(),
+    ...scope,
+    total_files: manifestFiles.length,
+    files: manifestFiles,
+    missing_files: missing
+  }, null, 2));
+
+  entries.unshift({
+    name: 'manifest.json',
+    size: manifest.length,
+    modified: new Date(),
+    open: async () => new Blob([manifest]).stream()
+  });
+
+  const archiveSize = zipArchiveSize(entries);
+  if (archiveSize > ZIP_MAX_SIZE) {
+    return c.json({
+      success: false,
+      error: 'El archivo ZIP superaría 4 GB; exporta los productos por separado'
+    }, 413);
+  }
+
+  return new Response(createZipStream(entries), {
+    headers: {
+      'Content-Type': 'application/zip',
+      'Content-Length': archiveSize.toString(),
+      'Content-Disposition': `attachment; filename="${archiveName}"`,
+      'Cache-Control': 'private, no-store'
+    }
+  });
+}
+
+// Exportar en un ZIP los archivos de un proyecto (?include_products=1 añade los de sus productos)
+privateRoutes.get('/projects/:projectId/files/export', async (c) => {
+  try {
+    const projectId = parseInt(c.req.param('projectId'));
+    const includeProducts = c.req.query('include_products') === '1' || c.req.query('include_products') === 'true';
+
+    // Mismas reglas que la descarga: admin, propietario o colaborador
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canView) {
+      return c.json<APIResponse>({
+        success: false,
+        error: 'Proyecto no encontrado o sin permisos'
+      }, 404);
+    }
+
+    const project = await c.env.DB.prepare(`
+      SELECT id, title, project_code FROM projects WHERE id = ?
+    `).bind(projectId).first<{ id: number; title: string; project_code: string | null }>();
+
+    if (!project) {
+      return c.json<APIResponse>({
+        success: false,
+        error: 'Proyecto no encontrado o sin permisos'
+      }, 404);
+    }
+
+    const files = await c.env.DB.prepare(`
+      SELECT ${ARCHIVE_FILE_COLUMNS}
+      FROM files f
+      LEFT JOIN products pr ON pr.id = f.product_id
+      WHERE f.project_id = ? ${includeProducts ? '' : "AND f.entity_type = 'project'"}
+      ORDER BY f.entity_type, f.product_id, f.uploaded_at
+    `).bind(projectId).all<ArchiveFileRow>();
+
+    return await streamFilesArchive(c, `proyecto-${projectId}-archivos.zip`, {
+      project: { id: project.id, title: project.title, project_code: project.project_code },
+      include_products: includeProducts
+    }, files.results);
 
   } catch (error) {
-    console.error('Error descargando archivo:', error);
-    return c.text('Error interno del servidor', 500);
+    console.error('Error exportando archivos del proyecto:', error);
+    return c.json<APIResponse>({
+      success: false,
+      error: 'Error interno del servidor'
+    }, 500);
+  }
+});
+
+// Exportar en un ZIP los archivos de un producto
+privateRoutes.get('/projects/:projectId/products/:productId/files/export', async (c) => {
+  try {
+    const projectId = parseInt(c.req.param('projectId'));
+    const productId = parseInt(c.req.param('productId'));
+
+    const access = await getProjectAccess(c, projectId);
+    if (!access.canView) {
+      return c.json<APIResponse>({
+        success: false,
+        error: 'No tienes acceso a este producto'
+      }, 403);
+    }
+
+    const product = await c.env.DB.prepare(`
+      SELECT pr.id, pr.product_code, p.id as project_id, p.title as project_title, p.project_code
+      FROM products pr
+      JOIN projects p ON p.id = pr.project_id
+      WHERE pr.id = ? AND pr.project_id = ?
+    `).bind(productId, projectId).first<{
+      id: number;
+      product_code: string;
+      project_id: number;
+      project_title: string;
+      project_code: string | null;
+    }>();
+
+    if (!product) {
+      return c.json<APIResponse>({
+        success: false,
+        error: 'Producto no encontrado'
+      }, 404);
+    }
+
+    const files = await c.env.DB.prepare(`
+      SELECT ${ARCHIVE_FILE_COLUMNS}
+      FROM files f
+      LEFT JOIN products pr ON pr.id = f.product_id
+      WHERE f.product_id = ?
+      ORDER BY f.uploaded_at
+    `).bind(productId).all<ArchiveFileRow>();
+
+    return await streamFilesArchive(c, `producto-${productId}-archivos.zip`, {
+      project: { id: product.project_id, title: product.project_title, project_code: product.project_code },
+      product: { id: product.id, product_code: product.product_code }
+    }, files.results);
+
+  } catch (error) {
+    console.error('Error exportando archivos del producto:', error);
+    return c.json<APIResponse>({
+      success: false,
+      error: 'Error interno del servidor'
+    }, 500);
   }
 });
 
@@ -3647,12 +4290,10 @@ privateRoutes.delete('/projects/:projectId/files/:fileId', requireRole('INVESTIG
     
     // Verificar que el archivo pertenece al proyecto y el usuario tiene permisos
     const file = await c.env.DB.prepare(`
-      SELECT f.*, p.owner_id, pc.user_id as collaborator_id
+      SELECT f.*
       FROM files f
-      LEFT JOIN projects p ON f.entity_type = 'project' AND CAST(f.entity_id AS INTEGER) = p.id
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-      WHERE f.id = ? AND f.entity_id = ? AND f.entity_type = 'project'
-    `).bind(user.userId, fileId, projectId.toString()).first();
+      WHERE f.id = ? AND f.project_id = ? AND f.entity_type = 'project'
+    `).bind(fileId, projectId).first();
 
     if (!file) {
       return c.json<APIResponse>({
@@ -3664,7 +4305,7 @@ privateRoutes.delete('/projects/:projectId/files/:fileId', requireRole('INVESTIG
     // Verificar permisos de eliminación
     const canDelete = user.role === 'ADMIN' || 
                       file.uploaded_by === user.userId ||
-                      file.owner_id === user.userId;
+                      (await getProjectAccess(c, projectId)).isOwner;
 
     if (!canDelete) {
       return c.json<APIResponse>({
@@ -3673,11 +4314,13 @@ privateRoutes.delete('/projects/:projectId/files/:fileId', requireRole('INVESTIG
       }, 403);
     }
 
-    // Eliminar de R2
-    await c.env.R2.delete(file.file_path);
-    
-    // Eliminar de base de datos
+    // Eliminar de base de datos y liberar el almacenamiento (el blob solo se borra sin referencias)
     await c.env.DB.prepare('DELETE FROM files WHERE id = ?').bind(fileId).run();
+    try {
+      await releaseStoredFiles(c.env.DB, c.env.R2, [file as unknown as StoredFileRef]);
+    } catch (error) {
+      console.warn('Error eliminando de R2:', error);
+    }
 
     return c.json<APIResponse>({
       success: true,
@@ -3695,22 +4338,25 @@ privateRoutes.delete('/projects/:projectId/files/:fileId', requireRole('INVESTIG
 
 // ===== SISTEMA DE SCORING PARA PRODUCTOS CIENTÍFICOS =====
 
+// Creador del producto o propietario/colaborador de su proyecto
+async function isProductMember(c: any, product: { creator_id: number; project_id: number | null }): Promise<boolean> {
+  if (product.creator_id === c.get('user')!.userId) return true;
+  if (product.project_id === null) return false;
+  const access = await getProjectAccess(c, product.project_id);
+  return access.isOwner || access.isCollaborator;
+}
+
 // Calcular score de un producto específico
 privateRoutes.post('/products/:productId/calculate-score', async (c) => {
   try {
     const { productId } = c.req.param();
-    const user = c.get('user')!;
     
-    // Verificar acceso al producto
-    const product = await c.env.DB.prepare(`
-      SELECT pr.*, p.owner_id 
-      FROM products pr
-      LEFT JOIN projects p ON pr.project_id = p.id
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-      WHERE pr.id = ? AND (p.owner_id = ? OR pc.user_id = ? OR pr.creator_id = ?)
-    `).bind(user.userId, productId, user.userId, user.userId, user.userId).first();
+    // Verificar acceso al producto (creador o miembro del proyecto)
+    const product = await c.env.DB.prepare(
+      'SELECT * FROM products WHERE id = ?'
+    ).bind(productId).first();
     
-    if (!product) {
+    if (!product || !(await isProductMember(c, product as { creator_id: number; project_id: number | null }))) {
       return c.json({ success: false, error: 'Producto no encontrado o sin acceso' }, 404);
     }
     
@@ -3788,17 +4434,13 @@ privateRoutes.post('/products/:productId/calculate-score', async (c) => {
 privateRoutes.get('/products/:productId/score', async (c) => {
   try {
     const { productId } = c.req.param();
-    const user = c.get('user')!;
     
     // Verificar acceso
-    const hasAccess = await c.env.DB.prepare(`
-      SELECT 1 FROM products pr
-      LEFT JOIN projects p ON pr.project_id = p.id
-      LEFT JOIN project_collaborators pc ON p.id = pc.project_id AND pc.user_id = ?
-      WHERE pr.id = ? AND (p.owner_id = ? OR pc.user_id = ? OR pr.creator_id = ?)
-    `).bind(user.userId, productId, user.userId, user.userId, user.userId).first();
+    const product = await c.env.DB.prepare(
+      'SELECT creator_id, project_id FROM products WHERE id = ?'
+    ).bind(productId).first<{ creator_id: number; project_id: number | null }>();
     
-    if (!hasAccess) {
+    if (!product || !(await isProductMember(c, product))) {
       return c.json({ success: false, error: 'Sin acceso al producto' }, 403);
     }
     
@@ -4162,11 +4804,7 @@ privateRoutes.get('/files', async (c) => {
           WHEN f.entity_type = 'product' THEN pr.product_code
           ELSE 'Sin entidad'
         END as entity_name,
-        CASE
-          WHEN f.entity_type = 'project' THEN p.id
-          WHEN f.entity_type = 'product' THEN pr.project_id
-          ELSE NULL
-        END as project_id,
+        f.project_id,
         CASE
           WHEN f.entity_type = 'project' THEN p.title
           WHEN f.entity_type = 'product' THEN (
@@ -4175,8 +4813,8 @@ privateRoutes.get('/files', async (c) => {
           ELSE 'Sin proyecto'
         END as project_name
       FROM files f
-      LEFT JOIN projects p ON f.entity_type = 'project' AND f.entity_id = p.id
-      LEFT JOIN products pr ON f.entity_type = 'product' AND f.entity_id = pr.id
+      LEFT JOIN projects p ON f.entity_type = 'project' AND p.id = f.project_id
+      LEFT JOIN products pr ON f.entity_type = 'product' AND pr.id = f.product_id
       LEFT JOIN project_collaborators pc ON (
         (f.entity_type = 'project' AND p.id = pc.project_id) OR
         (f.entity_type = 'product' AND pr.project_id = pc.project_id)
@@ -4257,11 +4895,6 @@ privateRoutes.get('/files/:fileId/details', async (c) => {
           WHEN f.entity_type = 'product' THEN pr.product_code
           ELSE 'Sin entidad'
         END as entity_name,
-        CASE
-          WHEN f.entity_type = 'project' THEN p.id
-          WHEN f.entity_type = 'product' THEN pr.project_id
-          ELSE NULL
-        END as project_id,
         CASE
           WHEN f.entity_type = 'project' THEN p.title
           WHEN f.entity_type = 'product' THEN (
@@ -4271,8 +4904,8 @@ privateRoutes.get('/files/:fileId/details', async (c) => {
         END as project_name,
         u.full_name as uploaded_by_name
       FROM files f
-      LEFT JOIN projects p ON f.entity_type = 'project' AND f.entity_id = p.id
-      LEFT JOIN products pr ON f.entity_type = 'product' AND f.entity_id = pr.id
+      LEFT JOIN projects p ON f.entity_type = 'project' AND p.id = f.project_id
+      LEFT JOIN products pr ON f.entity_type = 'product' AND pr.id = f.product_id
       LEFT JOIN users u ON f.uploaded_by = u.id
       LEFT JOIN project_collaborators pc ON (
         (f.entity_type = 'project' AND p.id = pc.project_id) OR
@@ -1,53 +1,101 @@
 // Rutas públicas (sin autenticación)
 import { Hono } from 'hono';
 import { Bindings, APIResponse, Project, Product } from '../types/index';
+import { buildFtsQuery, PROJECTS_FTS_RANK, PRODUCTS_FTS_RANK } from '../utils/search';
+import { withEdgeCache } from '../utils/cache';
+import { isCursorMode, decodeCursor, clampCursorLimit, keysetCondition, buildCursorPage, countWithCache } from '../utils/pagination';
 
 const publicRoutes = new Hono<{ Bindings: Bindings }>();
 
 // Obtener todos los proyectos públicos
-publicRoutes.get('/projects', async (c) => {
+publicRoutes.get('/projects', withEdgeCache({ ttl: 60, staleWhileRevalidate: 300, tags: () => ['projects'] }, async (c) => {
   try {
     const page = parseInt(c.req.query('page') || '1');
     const limit = parseInt(c.req.query('limit') || '10');
     const search = c.req.query('search') || '';
     const offset = (page - 1) * limit;
 
-    let query = `
+    const ftsQuery = buildFtsQuery(search);
+
+    // Con término de búsqueda se consulta el índice FTS5 y se ordena por relevancia
+    let fromClause = `FROM projects p JOIN users u ON p.owner_id = u.id`;
+    let whereClause = `WHERE p.is_public = 1`;
+    let orderClause = `ORDER BY p.created_at DESC`;
+    const filterParams: any[] = [];
+
+    if (ftsQuery) {
+      fromClause = `FROM projects_fts JOIN projects p ON p.id = projects_fts.rowid JOIN users u ON p.owner_id = u.id`;
+      whereClause += ` AND projects_fts MATCH ?`;
+      orderClause = `ORDER BY ${PROJECTS_FTS_RANK}, p.created_at DESC`;
+      filterParams.push(ftsQuery);
+    }
+
+    const selectClause = `
       SELECT 
         p.id, p.title, p.abstract, p.keywords, p.introduction, 
         p.methodology, p.owner_id, p.is_public, p.created_at, p.updated_at,
         p.status, p.start_date, p.end_date, p.institution, p.funding_source, 
         p.budget, p.project_code,
         u.full_name as owner_name, u.email as owner_email
-      FROM projects p 
-      JOIN users u ON p.owner_id = u.id 
-      WHERE p.is_public = 1
+      ${fromClause}
     `;
-    
-    const params: any[] = [];
-    
-    if (search) {
-      query += ` AND (p.title LIKE ? OR p.abstract LIKE ? OR p.keywords LIKE ?)`;
-      const searchTerm = `%${search}%`;
-      params.push(searchTerm, searchTerm, searchTerm);
+
+    const countFrom = ftsQuery
+      ? `FROM projects_fts JOIN projects p ON p.id = projects_fts.rowid`
+      : `FROM projects p`;
+    const countQuery = `SELECT COUNT(*) as total ${countFrom} ${whereClause}`;
+
+    // Modo cursor (opt-in): keyset sobre (created_at, id), sin OFFSET y con conteo opcional
+    const cursor = c.req.query('cursor');
+    if (isCursorMode(cursor)) {
+      const cursorLimit = clampCursorLimit(limit);
+      const position = cursor ? decodeCursor(cursor) : null;
+      if (cursor && !position) {
+        return c.json<APIResponse>({ success: false, error: 'Cursor inválido' }, 400);
+      }
+
+      let cursorWhere = whereClause;
+      const cursorParams = [...filterParams];
+      if (position) {
+        cursorWhere += ` AND ${keysetCondition('p.created_at', 'p.id')}`;
+        cursorParams.push(position.value, position.id);
+      }
+
+      const rows = await c.env.DB.prepare(`
+        ${selectClause}
+        ${cursorWhere}
+        ORDER BY p.created_at DESC, p.id DESC LIMIT ?
+      `).bind(...cursorParams, cursorLimit + 1).all();
+
+      const cursorPage = buildCursorPage(rows.results as any[], cursorLimit, 'created_at');
+      const total = c.req.query('with_total') === 'true'
+        ? await countWithCache(c.env.DB, countQuery, filterParams)
+        : null;
+
+      return c.json<APIResponse<{ projects: any[]; pagination: any }>>({
+        success: true,
+        data: {
+          projects: cursorPage.items,
+          pagination: {
+            limit: cursorLimit,
+            next_cursor: cursorPage.next_cursor,
+            has_more: cursorPage.has_more,
+            total
+          }
+        }
+      });
     }
-    
-    query += ` ORDER BY p.created_at DESC LIMIT ? OFFSET ?`;
-    params.push(limit, offset);
 
-    const projects = await c.env.DB.prepare(query).bind(...params).all();
+    const query = `
+      ${selectClause}
+      ${whereClause}
+      ${orderClause} LIMIT ? OFFSET ?
+    `;
+
+    const projects = await c.env.DB.prepare(query).bind(...filterParams, limit, offset).all();
 
     // Contar total para paginación
-    let countQuery = `SELECT COUNT(*) as total FROM projects WHERE is_public = 1`;
-    const countParams: any[] = [];
-    
-    if (search) {
-      countQuery += ` AND (title LIKE ? OR abstract LIKE ? OR keywords LIKE ?)`;
-      const searchTerm = `%${search}%`;
-      countParams.push(searchTerm, searchTerm, searchTerm);
-    }
-    
-    const totalResult = await c.env.DB.prepare(countQuery).bind(...countParams).first<{ total: number }>();
+    const totalResult = await c.env.DB.prepare(countQuery).bind(...filterParams).first<{ total: number }>();
     const total = totalResult?.total || 0;
 
     return c.json<APIResponse<{ projects: any[]; pagination: any }>>({
@@ -70,10 +118,10 @@ publicRoutes.get('/projects', async (c) => {
       error: 'Error interno del servidor' 
     }, 500);
   }
-});
+}));
 
 // Obtener un proyecto público específico
-publicRoutes.get('/projects/:id', async (c) => {
+publicRoutes.get('/projects/:id', withEdgeCache({ ttl: 120, staleWhileRevalidate: 600, tags: (c) => [`project:${parseInt(c.req.param('id'))}`] }, async (c) => {
   try {
     const projectId = parseInt(c.req.param('id'));
 
@@ -137,10 +185,10 @@ publicRoutes.get('/projects/:id', async (c) => {
       error: 'Error interno del servidor' 
     }, 500);
   }
-});
+}));
 
 // Obtener todos los productos públicos
-publicRoutes.get('/products', async (c) => {
+publicRoutes.get('/products', withEdgeCache({ ttl: 60, staleWhileRevalidate: 300, tags: () => ['products'] }, async (c) => {
   try {
     const page = parseInt(c.req.query('page') || '1');
     const limit = parseInt(c.req.query('limit') || '10');
@@ -148,7 +196,26 @@ publicRoutes.get('/products', async (c) => {
     const search = c.req.query('search') || '';
     const offset = (page - 1) * limit;
 
-    let query = `
+    const ftsQuery = buildFtsQuery(search);
+
+    let fromClause = `FROM products pr JOIN projects p ON pr.project_id = p.id`;
+    let whereClause = `WHERE pr.is_public = 1`;
+    let orderClause = `ORDER BY pr.created_at DESC`;
+    const filterParams: any[] = [];
+
+    if (ftsQuery) {
+      fromClause = `FROM products_fts JOIN products pr ON pr.id = products_fts.rowid JOIN projects p ON pr.project_id = p.id`;
+      whereClause += ` AND products_fts MATCH ?`;
+      orderClause = `ORDER BY ${PRODUCTS_FTS_RANK}, pr.created_at DESC`;
+      filterParams.push(ftsQuery);
+    }
+    
+    if (type) {
+      whereClause += ` AND pr.product_type = ?`;
+      filterParams.push(type);
+    }
+
+    const selectClause = `
       SELECT 
         pr.id, pr.project_id, pr.product_code, pr.product_type, 
         pr.description, pr.is_public, pr.created_at, pr.updated_at,
@@ -156,46 +223,63 @@ publicRoutes.get('/products', async (c) => {
         pr.citation_count, pr.file_url,
         p.title as project_title, p.abstract as project_abstract,
         pc.name as category_name, pc.category_group, pc.impact_weight
-      FROM products pr 
-      JOIN projects p ON pr.project_id = p.id 
+      ${fromClause}
       LEFT JOIN product_categories pc ON pr.product_type = pc.code
-      WHERE pr.is_public = 1
     `;
-    
-    const params: any[] = [];
-    
-    if (type) {
-      query += ` AND pr.product_type = ?`;
-      params.push(type);
-    }
-    
-    if (search) {
-      query += ` AND (pr.product_code LIKE ? OR pr.description LIKE ?)`;
-      const searchTerm = `%${search}%`;
-      params.push(searchTerm, searchTerm);
+
+    const countQuery = `SELECT COUNT(*) as total ${fromClause} ${whereClause}`;
+
+    // Modo cursor (opt-in): keyset sobre (created_at, id), sin OFFSET y con conteo opcional
+    const cursor = c.req.query('cursor');
+    if (isCursorMode(cursor)) {
+      const cursorLimit = clampCursorLimit(limit);
+      const position = cursor ? decodeCursor(cursor) : null;
+      if (cursor && !position) {
+        return c.json<APIResponse>({ success: false, error: 'Cursor inválido' }, 400);
+      }
+
+      let cursorWhere = whereClause;
+      const cursorParams = [...filterParams];
+      if (position) {
+        cursorWhere += ` AND ${keysetCondition('pr.created_at', 'pr.id')}`;
+        cursorParams.push(position.value, position.id);
+      }
+
+      const rows = await c.env.DB.prepare(`
+        ${selectClause}
+        ${cursorWhere}
+        ORDER BY pr.created_at DESC, pr.id DESC LIMIT ?
+      `).bind(...cursorParams, cursorLimit + 1).all();
+
+      const cursorPage = buildCursorPage(rows.results as any[], cursorLimit, 'created_at');
+      const total = c.req.query('with_total') === 'true'
+        ? await countWithCache(c.env.DB, countQuery, filterParams)
+        : null;
+
+      return c.json<APIResponse<{ products: any[]; pagination: any }>>({
+        success: true,
+        data: {
+          products: cursorPage.items,
+          pagination: {
+            limit: cursorLimit,
+            next_cursor: cursorPage.next_cursor,
+            has_more: cursorPage.has_more,
+            total
+          }
+        }
+      });
     }
-    
-    query += ` ORDER BY pr.created_at DESC LIMIT ? OFFSET ?`;
-    params.push(limit, offset);
 
-    const products = await c.env.DB.prepare(query).bind(...params).all();
+    const query = `
+      ${selectClause}
+      ${whereClause}
+      ${orderClause} LIMIT ? OFFSET ?
+    `;
+
+    const products = await c.env.DB.prepare(query).bind(...filterParams, limit, offset).all();
 
     // Contar total para paginación
-    let countQuery = `SELECT COUNT(*) as total FROM products pr JOIN projects p ON pr.project_id = p.id WHERE pr.is_public = 1`;
-    const countParams: any[] = [];
-    
-    if (type) {
-      countQuery += ` AND pr.product_type = ?`;
-      countParams.push(type);
-    }
-    
-    if (search) {
-      countQuery += ` AND (pr.product_code LIKE ? OR pr.description LIKE ?)`;
-      const searchTerm = `%${search}%`;
-      countParams.push(searchTerm, searchTerm);
-    }
-    
-    const totalResult = await c.env.DB.prepare(countQuery).bind(...countParams).first<{ total: number }>();
+    const totalResult = await c.env.DB.prepare(countQuery).bind(...filterParams).first<{ total: number }>();
     const total = totalResult?.total || 0;
 
     return c.json<APIResponse<{ products: any[]; pagination: any }>>({
@@ -218,10 +302,10 @@ publicRoutes.get('/products', async (c) => {
       error: 'Error interno del servidor' 
     }, 500);
   }
-});
+}));
 
 // Obtener un producto público específico con detalles completos
-publicRoutes.get('/products/:id', async (c) => {
+publicRoutes.get('/products/:id', withEdgeCache({ ttl: 120, staleWhileRevalidate: 600, tags: (c) => [`product:${parseInt(c.req.param('id'))}`, 'projects'] }, async (c) => {
   try {
     const productId = parseInt(c.req.param('id'));
 
@@ -291,10 +375,10 @@ publicRoutes.get('/products/:id', async (c) => {
       error: 'Error interno del servidor' 
     }, 500);
   }
-});
+}));
 
 // Obtener categorías de productos
-publicRoutes.get('/product-categories', async (c) => {
+publicRoutes.get('/product-categories', withEdgeCache({ ttl: 3600, staleWhileRevalidate: 86400, tags: () => ['product-categories'] }, async (c) => {
   try {
     const categories = await c.env.DB.prepare(`
       SELECT code, name, description, category_group, impact_weight
@@ -314,10 +398,10 @@ publicRoutes.get('/product-categories', async (c) => {
       error: 'Error interno del servidor' 
     }, 500);
   }
-});
+}));
 
 // Obtener instituciones
-publicRoutes.get('/institutions', async (c) => {
+publicRoutes.get('/institutions', withEdgeCache({ ttl: 3600, staleWhileRevalidate: 86400, tags: () => ['institutions'] }, async (c) => {
   try {
     const institutions = await c.env.DB.prepare(`
       SELECT id, name, short_name, type, country, city, website
@@ -337,64 +421,43 @@ publicRoutes.get('/institutions', async (c) => {
       error: 'Error interno del servidor' 
     }, 500);
   }
-});
+}));
 
 // Obtener estadísticas públicas
-publicRoutes.get('/stats', async (c) => {
+publicRoutes.get('/stats', withEdgeCache({ ttl: 60, staleWhileRevalidate: 600, tags: () => ['stats'] }, async (c) => {
   try {
-    // Contar proyectos públicos
-    const projectsCount = await c.env.DB.prepare(
-      'SELECT COUNT(*) as count FROM projects WHERE is_public = 1'
-    ).first<{ count: number }>();
-
-    // Contar productos públicos
-    const productsCount = await c.env.DB.prepare(
-      'SELECT COUNT(*) as count FROM products WHERE is_public = 1'
-    ).first<{ count: number }>();
-
-    // Productos por categoría con nombres descriptivos
-    const productsByCategory = await c.env.DB.prepare(`
+    // Contadores mantenidos por triggers (tabla public_stats): una sola lectura
+    const stats = await c.env.DB.prepare(`
       SELECT 
-        pr.product_type, 
-        pc.name as category_name, 
-        pc.category_group,
-        COUNT(*) as count 
-      FROM products pr
-      LEFT JOIN product_categories pc ON pr.product_type = pc.code
-      WHERE pr.is_public = 1 
-      GROUP BY pr.product_type, pc.name, pc.category_group
-      ORDER BY count DESC
-    `).all();
+        s.dimension, s.key, s.count,
+        pc.name as category_name, pc.category_group
+      FROM public_stats s
+      LEFT JOIN product_categories pc ON s.dimension = 'products_by_type' AND pc.code = s.key
+      WHERE s.count > 0
+      ORDER BY s.count DESC
+    `).all<{ dimension: string; key: string; count: number; category_name: string | null; category_group: string | null }>();
 
-    // Proyectos por estado
-    const projectsByStatus = await c.env.DB.prepare(`
-      SELECT status, COUNT(*) as count 
-      FROM projects 
-      WHERE is_public = 1 
-      GROUP BY status
-    `).all();
-
-    // Investigadores activos (con proyectos públicos)
-    const activeInvestigators = await c.env.DB.prepare(`
-      SELECT COUNT(DISTINCT owner_id) as count 
-      FROM projects 
-      WHERE is_public = 1
-    `).first<{ count: number }>();
+    const rows = stats.results;
+    const totalOf = (dimension: string) => rows.find(row => row.dimension === dimension)?.count || 0;
 
     return c.json<APIResponse<any>>({
       success: true,
       data: {
-        totalProjects: projectsCount?.count || 0,
-        totalProducts: productsCount?.count || 0,
-        activeInvestigators: activeInvestigators?.count || 0,
-        productsByCategory: productsByCategory.results.map((item: any) => ({
-          code: item.product_type,
-          name: item.category_name || item.product_type,
-          group: item.category_group,
-          count: item.count
-        })),
+        totalProjects: totalOf('projects'),
+        totalProducts: totalOf('products'),
+        activeInvestigators: rows.filter(row => row.dimension === 'owners').length,
+        productsByCategory: rows
+          .filter(row => row.dimension === 'products_by_type')
+          .map(item => ({
+            code: item.key,
+            name: item.category_name || item.key,
+            group: item.category_group,
+            count: item.count
+          })),
         projectsByStatus: Object.fromEntries(
-          projectsByStatus.results.map((item: any) => [item.status, item.count])
+          rows
+            .filter(row => row.dimension === 'projects_by_status')
+            .map(item => [item.key || null, item.count])
         )
       }
     });
@@ -406,7 +469,7 @@ publicRoutes.get('/stats', async (c) => {
       error: 'Error interno del servidor' 
     }, 500);
   }
-});
+}));
 
 // Obtener configuración pública del sitio (logo, etc.)
 publicRoutes.get('/site-config', async (c) => {
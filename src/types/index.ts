@@ -231,6 +231,9 @@ export interface Bindings {
   DB: D1Database;
   KV: KVNamespace;
   R2: R2Bucket;
+  IMAGES?: ImagesBinding; // Cloudflare Images (opcional): generación de miniaturas
+  SERVER_TIMING_SAMPLE_RATE?: string; // Fracción de peticiones con cabecera Server-Timing en producción (0-1)
+  SLOW_QUERY_THRESHOLD_MS?: string; // Duración a partir de la cual una consulta se registra como lenta
 }
 
 export interface APIResponse<T = any> {
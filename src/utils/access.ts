@@ -0,0 +1,163 @@
+// Resolución de permisos sobre proyectos para las rutas privadas
+// Todas las membresías del usuario (proyectos propios y colaboraciones) se cargan con una
+// sola consulta y se memorizan durante la petición. Las lecturas (GET/HEAD) pueden además
+// reutilizarlas desde una caché corta del isolate; las escrituras siempre consultan D1.
+import { Context } from 'hono';
+import { Bindings, JWTPayload } from '../types/index';
+
+type AccessContext = Context<{ Bindings: Bindings; Variables: { user?: JWTPayload } }>;
+
+export interface ProjectMembership {
+  projectId: number;
+  isOwner: boolean;
+  canEditProject: boolean;
+  canAddProducts: boolean;
+  canManageTeam: boolean;
+}
+
+export interface ProjectAccess {
+  isAdmin: boolean;
+  isOwner: boolean;
+  isCollaborator: boolean;
+  canView: boolean; // admin, propietario o colaborador (sin contar proyectos públicos)
+  canEditProject: boolean;
+  canAddProducts: boolean;
+  canManageTeam: boolean;
+}
+
+type Memberships = Map<number, ProjectMembership>;
+
+const ACL_CACHE_TTL_MS = 30 * 1000;
+const ACL_CACHE_MAX_ENTRIES = 1000;
+
+// Membresías por petición (se liberan junto con el Request)
+const requestMemberships = new WeakMap<Request, Promise<Memberships>>();
+
+// Caché del isolate por usuario. La versión se incrementa al cambiar colaboradores o
+// proyectos, de modo que una carga que estaba en curso no guarde datos ya invalidados.
+const aclCache = new Map<number, { memberships: Memberships; version: number; expiresAt: number }>();
+const aclVersions = new Map<number, number>();
+
+async function loadMemberships(db: D1Database, userId: number): Promise<Memberships> {
+  const rows = await db.prepare(`
+    SELECT id as project_id, 1 as is_owner, 1 as can_edit_project, 1 as can_add_products, 1 as can_manage_team
+    FROM projects
+    WHERE owner_id = ?
+    UNION ALL
+    SELECT project_id, 0 as is_owner, can_edit_project, can_add_products, can_manage_team
+    FROM project_collaborators
+    WHERE user_id = ?
+  `).bind(userId, userId).all<{
+    project_id: number;
+    is_owner: number;
+    can_edit_project: number | null;
+    can_add_products: number | null;
+    can_manage_team: number | null;
+  }>();
+
+  const memberships: Memberships = new Map();
+  for (const row of rows.results) {
+    const existing = memberships.get(row.project_id);
+    // Si el propietario también figura como colaborador prevalece la propiedad
+    if (existing?.isOwner) continue;
+    memberships.set(row.project_id, {
+      projectId: row.project_id,
+      isOwner: row.is_owner === 1,
+      canEditProject: row.can_edit_project === 1,
+      canAddProducts: row.can_add_products === 1,
+      canManageTeam: row.can_manage_team === 1
+    });
+  }
+  return memberships;
+}
+
+async function resolveMemberships(c: AccessContext, userId: number): Promise<Memberships> {
+  const method = c.req.method;
+  const cacheable = method === 'GET' || method === 'HEAD';
+  const now = Date.now();
+
+  if (cacheable) {
+    const cached = aclCache.get(userId);
+    if (cached && cached.expiresAt > now && cached.version === (aclVersions.get(userId) ?? 0)) {
+      return cached.memberships;
+    }
+  }
+
+  const version = aclVersions.get(userId) ?? 0;
+  const memberships = await loadMemberships(c.env.DB, userId);
+
+  if (version === (aclVersions.get(userId) ?? 0)) {
+    if (aclCache.size >= ACL_CACHE_MAX_ENTRIES) {
+      const oldestKey = aclCache.keys().next().value;
+      if (oldestKey !== undefined) aclCache.delete(oldestKey);
+    }
+    aclCache.delete(userId);
+    aclCache.set(userId, { memberships, version, expiresAt: now + ACL_CACHE_TTL_MS });
+  }
+
+  return memberships;
+}
+
+// Membresías del usuario autenticado, consultadas a lo sumo una vez por petición
+export function getProjectMemberships(c: AccessContext): Promise<Memberships> {
+  const user = c.get('user')!;
+  let pending = requestMemberships.get(c.req.raw);
+  if (!pending) {
+    pending = resolveMemberships(c, user.userId);
+    requestMemberships.set(c.req.raw, pending);
+    pending.catch(() => requestMemberships.delete(c.req.raw));
+  }
+  return pending;
+}
+
+// Permisos del usuario autenticado sobre un proyecto
+export async function getProjectAccess(c: AccessContext, projectId: number): Promise<ProjectAccess> {
+  const user = c.get('user')!;
+
+  if (user.role === 'ADMIN') {
+    return {
+      isAdmin: true,
+      isOwner: false,
+      isCollaborator: false,
+      canView: true,
+      canEditProject: true,
+      canAddProducts: true,
+      canManageTeam: true
+    };
+  }
+
+  const membership = (await getProjectMemberships(c)).get(projectId);
+  const isOwner = membership?.isOwner ?? false;
+
+  return {
+    isAdmin: false,
+    isOwner,
+    isCollaborator: !!membership && !isOwner,
+    canView: !!membership,
+    canEditProject: membership?.canEditProject ?? false,
+    canAddProducts: membership?.canAddProducts ?? false,
+    canManageTeam: membership?.canManageTeam ?? false
+  };
+}
+
+// Acceso de lectura que además admite proyectos públicos (solo consulta D1 si no es miembro).
+// ADMIN puede ver cualquier proyecto, pero se comprueba que exista para responder 404.
+export async function canViewProject(c: AccessContext, projectId: number): Promise<boolean> {
+  const access = await getProjectAccess(c, projectId);
+  if (access.canView && !access.isAdmin) return true;
+
+  const project = await c.env.DB.prepare(
+    'SELECT is_public FROM projects WHERE id = ?'
+  ).bind(projectId).first<{ is_public: number }>();
+  if (!project) return false;
+  return access.isAdmin || project.is_public === 1;
+}
+
+// Invalida las membresías cacheadas de los usuarios indicados (en este isolate y en la petición actual)
+export function invalidateProjectAccess(c: AccessContext, ...userIds: number[]): void {
+  for (const userId of userIds) {
+    aclVersions.set(userId, (aclVersions.get(userId) ?? 0) + 1);
+    aclCache.delete(userId);
+  }
+  requestMemberships.delete(c.req.raw);
+}
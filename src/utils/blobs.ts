@@ -0,0 +1,124 @@
+// Almacenamiento de archivos deduplicado por contenido (SHA-256)
+// Cada subida se transmite a R2 calculando su hash; si el contenido ya existía se descarta el
+// objeto recién subido y la nueva fila de files apunta al blob compartido. Los borrados
+// liberan referencias y solo eliminan de R2 los blobs que quedan sin ninguna.
+import { putFileStreamHashed } from './upload';
+import { thumbnailKeys } from './thumbnails';
+
+export interface StoredBlob {
+  objectKey: string; // Clave real en R2 (la del primer archivo con ese contenido)
+  hash: string;
+  deduplicated: boolean;
+}
+
+// Fila mínima de files necesaria para liberar su almacenamiento
+export interface StoredFileRef {
+  file_path: string | null;
+  blob_hash: string | null;
+}
+
+// Sentencia que reserva una referencia al blob con ese hash (creándolo si es nuevo) y devuelve
+// la clave real del objeto en R2. Si difiere de key, el objeto recién subido sobra.
+export function reserveBlobStatement(
+  db: D1Database,
+  hash: string,
+  key: string,
+  file: File
+): D1PreparedStatement {
+  return db.prepare(`
+    INSERT INTO file_blobs (hash, object_key, file_size, mime_type, ref_count)
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT(hash) DO UPDATE SET ref_count = ref_count + 1
+    RETURNING object_key
+  `).bind(hash, key, file.size, file.type || null);
+}
+
+// Sube el archivo y registra su fila de files junto con la referencia a su blob en un mismo
+// lote, de modo que si el INSERT falla no queda ninguna referencia reservada. insertFile recibe
+// el hash y devuelve un INSERT INTO files ... SELECT ... FROM file_blobs WHERE hash = ? que toma
+// file_path de object_key y blob_hash de hash, con RETURNING para obtener la fila creada.
+export async function storeFileBlob<T = Record<string, unknown>>(
+  db: D1Database,
+  bucket: R2Bucket,
+  key: string,
+  file: File,
+  insertFile: (hash: string) => D1PreparedStatement,
+  options?: R2PutOptions
+): Promise<StoredBlob & { row: T }> {
+  const { sha256 } = await putFileStreamHashed(bucket, key, file, options);
+
+  let results: D1Result[];
+  try {
+    results = await db.batch([reserveBlobStatement(db, sha256, key, file), insertFile(sha256)]);
+  } catch (error) {
+    // El lote se revirtió: nada referencia el objeto recién subido
+    await bucket.delete(key);
+    throw error;
+  }
+
+  const blob = results[0].results[0] as { object_key: string } | undefined;
+  const row = results[1].results[0] as T;
+  const objectKey = blob?.object_key ?? key;
+  if (objectKey !== key) {
+    // Contenido repetido: se conserva el objeto existente
+    await bucket.delete(key);
+    return { objectKey, hash: sha256, deduplicated: true, row };
+  }
+
+  return { objectKey, hash: sha256, deduplicated: false, row };
+}
+
+// Libera el almacenamiento de filas de files ya eliminadas (el trigger files_blob_release
+// decrementó sus blobs). Los archivos anteriores a la deduplicación se borran directamente.
+export async function releaseStoredFiles(
+  db: D1Database,
+  bucket: R2Bucket | undefined,
+  files: StoredFileRef[]
+): Promise<void> {
+  if (!bucket || files.length === 0) return;
+
+  const hashes = [...new Set(files.map(file => file.blob_hash).filter((hash): hash is string => !!hash))];
+  const keys = files
+    .filter(file => !file.blob_hash && file.file_path)
+    .map(file => file.file_path as string);
+
+  if (hashes.length > 0) {
+    const unreferenced = await db.prepare(`
+      DELETE FROM file_blobs
+      WHERE hash IN (SELECT value FROM json_each(?)) AND ref_count <= 0
+      RETURNING object_key
+    `).bind(JSON.stringify(hashes)).all<{ object_key: string }>();
+    keys.push(...unreferenced.results.map(blob => blob.object_key));
+  }
+
+  // Las miniaturas derivadas se eliminan junto con el original
+  keys.push(...keys.flatMap(thumbnailKeys));
+
+  // R2 admite hasta 1000 claves por llamada
+  for (let i = 0; i < keys.length; i += 1000) {
+    await bucket.delete(keys.slice(i, i + 1000));
+  }
+}
+
+// Sentencia que elimina los archivos de un proyecto (files.project_id incluye los de sus
+// productos) o de un producto concreto, devolviendo lo necesario para releaseStoredFiles. Se ejecuta en el mismo
+// lote que el borrado del proyecto o producto.
+export function deleteEntityFilesStatement(
+  db: D1Database,
+  projectId: number,
+  productId?: number
+): D1PreparedStatement {
+  if (productId !== undefined) {
+    return db.prepare(`
+      DELETE FROM files
+      WHERE product_id IN (SELECT id FROM products WHERE id = ? AND project_id = ?)
+      RETURNING file_path, blob_hash
+    `).bind(productId, projectId);
+  }
+
+  return db.prepare(`
+    DELETE FROM files
+    WHERE project_id = ?
+    RETURNING file_path, blob_hash
+  `).bind(projectId);
+}
@@ -0,0 +1,186 @@
+// Caché perimetral (Workers Cache API) para las rutas públicas
+// Cada respuesta cacheada depende de un conjunto de etiquetas (ej. 'projects', 'project:12').
+// La versión actual de cada etiqueta vive en la tabla cache_tags y forma parte de la llave
+// de caché: invalidar una etiqueta es incrementar su versión, lo que deja inalcanzables
+// exactamente las entradas que dependían de ella.
+import { Context } from 'hono';
+import { Bindings } from '../types/index';
+
+type CacheContext = Context<{ Bindings: Bindings }>;
+type CachedHandler = (c: CacheContext) => Promise<Response>;
+
+export interface EdgeCacheOptions {
+  ttl: number; // segundos en que la respuesta se considera fresca
+  staleWhileRevalidate: number; // segundos adicionales en que se sirve obsoleta mientras se revalida
+  tags: (c: CacheContext) => string[];
+}
+
+const STORED_AT_HEADER = 'X-Edge-Cache-Stored-At';
+const TAG_VERSION_TTL_MS = 5 * 1000;
+const TAG_VERSION_MAX_ENTRIES = 5000;
+
+// Versiones de etiquetas leídas recientemente (vive mientras viva el isolate)
+const tagVersionMemo = new Map<string, { version: number; expiresAt: number }>();
+
+function getDefaultCache(): Cache | null {
+  if (typeof caches === 'undefined') return null;
+  return (caches as any).default ?? null;
+}
+
+function runInBackground(c: CacheContext, task: Promise<unknown>) {
+  const guarded = task.catch(error => console.error('Error actualizando caché perimetral:', error));
+  try {
+    c.executionCtx.waitUntil(guarded);
+  } catch {
+    // Sin ExecutionContext (desarrollo local): la tarea continúa sin waitUntil
+  }
+}
+
+async function getTagVersions(db: D1Database, tags: string[]): Promise<Record<string, number>> {
+  const now = Date.now();
+  const versions: Record<string, number> = {};
+  const missing: string[] = [];
+
+  for (const tag of tags) {
+    const memo = tagVersionMemo.get(tag);
+    if (memo && memo.expiresAt > now) {
+      versions[tag] = memo.version;
+    } else {
+      missing.push(tag);
+    }
+  }
+
+  if (missing.length > 0) {
+    const placeholders = missing.map(() => '?').join(', ');
+    const rows = await db.prepare(
+      `SELECT tag, version FROM cache_tags WHERE tag IN (${placeholders})`
+    ).bind(...missing).all<{ tag: string; version: number }>();
+    const found = new Map(rows.results.map(row => [row.tag, row.version]));
+
+    if (tagVersionMemo.size > TAG_VERSION_MAX_ENTRIES) {
+      tagVersionMemo.clear();
+    }
+
+    for (const tag of missing) {
+      const version = found.get(tag) ?? 0;
+      versions[tag] = version;
+      tagVersionMemo.set(tag, { version, expiresAt: now + TAG_VERSION_TTL_MS });
+    }
+  }
+
+  return versions;
+}
+
+function buildCacheKey(c: CacheContext, versions: Record<string, number>): Request {
+  const url = new URL(c.req.url);
+  url.searchParams.sort();
+  url.searchParams.set('__v', Object.keys(versions).sort().map(tag => `${tag}:${versions[tag]}`).join(','));
+  return new Request(url.toString(), { method: 'GET' });
+}
+
+function withCacheStatus(response: Response, status: 'HIT' | 'STALE' | 'MISS' | 'BYPASS'): Response {
+  const result = new Response(response.body, response);
+  result.headers.set('X-Cache', status);
+  result.headers.delete(STORED_AT_HEADER);
+  result.headers.delete('Cache-Control');
+  return result;
+}
+
+async function storeResponse(cache: Cache, key: Request, response: Response, options: EdgeCacheOptions) {
+  const headers = new Headers(response.headers);
+  headers.set(STORED_AT_HEADER, String(Date.now()));
+  headers.set('Cache-Control', `public, max-age=${options.ttl + options.staleWhileRevalidate}`);
+  await cache.put(key, new Response(response.body, { status: response.status, headers }));
+}
+
+// Envuelve un handler GET público: sirve desde caché, revalida en segundo plano las
+// respuestas vencidas (stale-while-revalidate) y guarda solo respuestas 200
+export function withEdgeCache(options: EdgeCacheOptions, handler: CachedHandler): CachedHandler {
+  return async (c) => {
+    const cache = getDefaultCache();
+    if (!cache) {
+      return handler(c);
+    }
+
+    let key: Request;
+    try {
+      const versions = await getTagVersions(c.env.DB, options.tags(c));
+      key = buildCacheKey(c, versions);
+
+      const cached = await cache.match(key);
+      if (cached) {
+        const ageSeconds = (Date.now() - Number(cached.headers.get(STORED_AT_HEADER) || 0)) / 1000;
+
+        if (ageSeconds < options.ttl) {
+          return withCacheStatus(cached, 'HIT');
+        }
+
+        if (ageSeconds < options.ttl + options.staleWhileRevalidate) {
+          runInBackground(c, (async () => {
+            const fresh = await handler(c);
+            if (fresh.status === 200) {
+              await storeResponse(cache, key, fresh, options);
+            }
+          })());
+          return withCacheStatus(cached, 'STALE');
+        }
+      }
+    } catch (error) {
+      // Si la tabla de etiquetas o la caché fallan se responde directo desde D1
+      console.error('Error leyendo caché perimetral:', error);
+      return withCacheStatus(await handler(c), 'BYPASS');
+    }
+
+    const response = await handler(c);
+    if (response.status === 200) {
+      runInBackground(c, storeResponse(cache, key, response.clone(), options));
+    }
+    return withCacheStatus(response, 'MISS');
+  };
+}
+
+// Invalida las etiquetas indicadas incrementando su versión
+export async function purgeCacheTags(db: D1Database, tags: string[]): Promise<void> {
+  if (tags.length === 0) return;
+
+  try {
+    await db.batch(tags.map(tag => db.prepare(`
+      INSERT INTO cache_tags (tag, version, updated_at) VALUES (?, 1, datetime('now'))
+      ON CONFLICT(tag) DO UPDATE SET version = version + 1, updated_at = datetime('now')
+    `).bind(tag)));
+  } catch (error) {
+    console.error('Error invalidando caché perimetral:', error);
+  } finally {
+    tags.forEach(tag => tagVersionMemo.delete(tag));
+  }
+}
+
+// Etiquetas afectadas por cambios en un proyecto (el listado de productos muestra su título)
+export function projectCacheTags(projectId: number): string[] {
+  return ['projects', `project:${projectId}`, 'products', 'stats'];
+}
+
+// Etiquetas afectadas por cambios en un producto (el detalle del proyecto lista sus productos)
+export function productCacheTags(productId: number, projectId?: number | null): string[] {
+  const tags = ['products', `product:${productId}`, 'stats'];
+  if (projectId) {
+    tags.push(`project:${projectId}`);
+  }
+  return tags;
+}
+
+export async function purgeProjectCache(db: D1Database, projectId: number): Promise<void> {
+  await purgeCacheTags(db, projectCacheTags(projectId));
+}
+
+// Si no se conoce el proyecto del producto se consulta antes de invalidar
+export async function purgeProductCache(db: D1Database, productId: number, projectId?: number | null): Promise<void> {
+  let ownerProjectId = projectId;
+  if (!ownerProjectId) {
+    const product = await db.prepare(
+      'SELECT project_id FROM products WHERE id = ?'
+    ).bind(productId).first<{ project_id: number }>();
+    ownerProjectId = product?.project_id;
+  }
+  await purgeCacheTags(db, productCacheTags(productId, ownerProjectId));
+}
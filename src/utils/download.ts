@@ -0,0 +1,96 @@
+// Utilidades de descarga de archivos desde R2
+// Soporta peticiones parciales (Range) y condicionales (If-None-Match / If-Modified-Since) a
+// partir de los metadatos de R2, de modo que los visores de PDF y video carguen por tramos y
+// el navegador revalide con 304 en lugar de volver a descargar el archivo completo.
+import { Context } from 'hono';
+
+export interface ServeR2ObjectOptions {
+  filename: string;
+  contentType?: string;
+  cacheControl: string;
+}
+
+// Solo se admite un rango simple (bytes=a-b, bytes=a- o bytes=-n); cualquier otra forma se
+// ignora y se responde el archivo completo, como permite RFC 9110
+function parseRangeHeader(header: string | undefined): R2Range | undefined {
+  const match = header?.trim().match(/^bytes=(\d*)-(\d*)$/);
+  if (!match || (!match[1] && !match[2])) return undefined;
+
+  if (!match[1]) {
+    const suffix = Number(match[2]);
+    return suffix > 0 ? { suffix } : undefined;
+  }
+
+  const offset = Number(match[1]);
+  if (!match[2]) {
+    return { offset };
+  }
+
+  const end = Number(match[2]);
+  return end >= offset ? { offset, length: end - offset + 1 } : undefined;
+}
+
+function resolveRange(range: R2Range, size: number): { offset: number; length: number } {
+  if ('suffix' in range && range.suffix !== undefined) {
+    const length = Math.min(range.suffix, size);
+    return { offset: size - length, length };
+  }
+  const offset = range.offset ?? 0;
+  const length = Math.min(range.length ?? size - offset, size - offset);
+  return { offset, length };
+}
+
+export async function serveR2Object(
+  c: Context,
+  bucket: R2Bucket,
+  key: string,
+  options: ServeR2ObjectOptions
+): Promise<Response> {
+  const requestHeaders = c.req.raw.headers;
+
+  // Con If-Range no se valida el rango: se entrega el archivo completo
+  const range = requestHeaders.has('If-Range') ? undefined : parseRangeHeader(requestHeaders.get('Range') ?? undefined);
+
+  let object: R2Object | R2ObjectBody | null;
+  try {
+    object = await bucket.get(key, { onlyIf: requestHeaders, range });
+  } catch (error) {
+    // R2 rechaza rangos fuera del tamaño del objeto
+    if (!range) throw error;
+    const head = await bucket.head(key);
+    if (!head) return c.text('Archivo no encontrado en el almacenamiento', 404);
+    return new Response(null, {
+      status: 416,
+      headers: { 'Content-Range': `bytes */${head.size}` }
+    });
+  }
+
+  if (!object) {
+    return c.text('Archivo no encontrado en el almacenamiento', 404);
+  }
+
+  const headers = new Headers({
+    'Content-Type': options.contentType || object.httpMetadata?.contentType || 'application/octet-stream',
+    'Content-Disposition': `inline; filename="${options.filename}"`,
+    'Cache-Control': options.cacheControl,
+    'ETag': object.httpEtag,
+    'Last-Modified': object.uploaded.toUTCString(),
+    'Accept-Ranges': 'bytes',
+  });
+
+  // Precondición no cumplida: R2 devuelve solo los metadatos
+  if (!('body' in object)) {
+    const isRevalidation = requestHeaders.has('If-None-Match') || requestHeaders.has('If-Modified-Since');
+    return new Response(null, { status: isRevalidation ? 304 : 412, headers });
+  }
+
+  if (range) {
+    const { offset, length } = resolveRange(range, object.size);
+    headers.set('Content-Range', `bytes ${offset}-${offset + length - 1}/${object.size}`);
+    headers.set('Content-Length', length.toString());
+    return new Response(object.body, { status: 206, headers });
+  }
+
+  headers.set('Content-Length', object.size.toString());
+  return new Response(object.body, { headers });
+}
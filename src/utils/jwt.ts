@@ -3,72 +3,122 @@ import { JWTPayload } from '../types/index';
 
 const JWT_SECRET = 'ctei-manager-secret-key-2024'; // En producción usar variable de entorno
 
-// Función para codificar en base64url
+const encoder = new TextEncoder();
+const decoder = new TextDecoder();
+
+const BASE64URL_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_';
+const BASE64URL_LOOKUP = new Uint8Array(128).fill(255);
+for (let i = 0; i < BASE64URL_ALPHABET.length; i++) {
+  BASE64URL_LOOKUP[BASE64URL_ALPHABET.charCodeAt(i)] = i;
+}
+
+// Máximo de tokens verificados que se recuerdan por isolate
+const VERIFIED_TOKENS_MAX = 500;
+
+// Claves HMAC importadas, una por secreto (importKey es costoso y la clave no cambia)
+const hmacKeys = new Map<string, Promise<CryptoKey>>();
+
+// LRU token → payload de tokens con firma ya verificada
+const verifiedTokens = new Map<string, JWTPayload>();
+
+// Codificar bytes en base64url (sin padding)
+function base64urlEncodeBytes(bytes: Uint8Array): string {
+  let out = '';
+  let i = 0;
+  for (; i + 2 < bytes.length; i += 3) {
+    const n = (bytes[i] << 16) | (bytes[i + 1] << 8) | bytes[i + 2];
+    out += BASE64URL_ALPHABET[(n >> 18) & 63] + BASE64URL_ALPHABET[(n >> 12) & 63] +
+      BASE64URL_ALPHABET[(n >> 6) & 63] + BASE64URL_ALPHABET[n & 63];
+  }
+  const remaining = bytes.length - i;
+  if (remaining === 1) {
+    const n = bytes[i] << 16;
+    out += BASE64URL_ALPHABET[(n >> 18) & 63] + BASE64URL_ALPHABET[(n >> 12) & 63];
+  } else if (remaining === 2) {
+    const n = (bytes[i] << 16) | (bytes[i + 1] << 8);
+    out += BASE64URL_ALPHABET[(n >> 18) & 63] + BASE64URL_ALPHABET[(n >> 12) & 63] +
+      BASE64URL_ALPHABET[(n >> 6) & 63];
+  }
+  return out;
+}
+
+// Decodificar base64url (con o sin padding) a bytes; null si el texto no es válido
+function base64urlDecodeBytes(str: string): Uint8Array | null {
+  let end = str.length;
+  while (end > 0 && str.charCodeAt(end - 1) === 61) end--; // '='
+  if (end % 4 === 1) return null;
+
+  const out = new Uint8Array(Math.floor((end * 3) / 4));
+  let buffer = 0;
+  let bits = 0;
+  let index = 0;
+
+  for (let i = 0; i < end; i++) {
+    const code = str.charCodeAt(i);
+    const value = code < 128 ? BASE64URL_LOOKUP[code] : 255;
+    if (value === 255) return null;
+    buffer = (buffer << 6) | value;
+    bits += 6;
+    if (bits >= 8) {
+      bits -= 8;
+      out[index++] = (buffer >> bits) & 0xff;
+    }
+  }
+  return out;
+}
+
 function base64urlEncode(data: string): string {
-  return btoa(data)
-    .replace(/\+/g, '-')
-    .replace(/\//g, '_')
-    .replace(/=/g, '');
+  return base64urlEncodeBytes(encoder.encode(data));
 }
 
-// Función para decodificar de base64url
-function base64urlDecode(str: string): string {
-  // Añadir padding si es necesario
-  str = str.replace(/-/g, '+').replace(/_/g, '/');
-  switch (str.length % 4) {
-    case 2: str += '=='; break;
-    case 3: str += '='; break;
+function getHmacKey(secret: string): Promise<CryptoKey> {
+  let key = hmacKeys.get(secret);
+  if (!key) {
+    key = crypto.subtle.importKey(
+      'raw',
+      encoder.encode(secret),
+      { name: 'HMAC', hash: 'SHA-256' },
+      false,
+      ['sign', 'verify']
+    );
+    // Si la importación falla no se deja la promesa rechazada en caché
+    key.catch(() => hmacKeys.delete(secret));
+    hmacKeys.set(secret, key);
   }
-  return atob(str);
+  return key;
 }
 
 // Función para firmar con HMAC-SHA256
 async function sign(data: string, secret: string): Promise<string> {
-  const key = await crypto.subtle.importKey(
-    'raw',
-    new TextEncoder().encode(secret),
-    { name: 'HMAC', hash: 'SHA-256' },
-    false,
-    ['sign']
-  );
-
-  const signature = await crypto.subtle.sign(
-    'HMAC',
-    key,
-    new TextEncoder().encode(data)
-  );
-
-  const signatureBytes = new Uint8Array(signature);
-  const signatureString = String.fromCharCode(...signatureBytes);
-  return base64urlEncode(signatureString);
+  const key = await getHmacKey(secret);
+  const signature = await crypto.subtle.sign('HMAC', key, encoder.encode(data));
+  return base64urlEncodeBytes(new Uint8Array(signature));
 }
 
 // Función para verificar firma HMAC-SHA256
 async function verify(data: string, signature: string, secret: string): Promise<boolean> {
   try {
-    const key = await crypto.subtle.importKey(
-      'raw',
-      new TextEncoder().encode(secret),
-      { name: 'HMAC', hash: 'SHA-256' },
-      false,
-      ['verify']
-    );
-
-    const signatureString = base64urlDecode(signature);
-    const binarySignature = Uint8Array.from(signatureString, c => c.charCodeAt(0));
+    const binarySignature = base64urlDecodeBytes(signature);
+    if (!binarySignature) {
+      return false;
+    }
 
-    return await crypto.subtle.verify(
-      'HMAC',
-      key,
-      binarySignature,
-      new TextEncoder().encode(data)
-    );
+    const key = await getHmacKey(secret);
+    return await crypto.subtle.verify('HMAC', key, binarySignature, encoder.encode(data));
   } catch (error) {
     console.error('JWT verification error:', error);
     return false;
   }
 }
 
+function rememberVerifiedToken(token: string, payload: JWTPayload) {
+  if (verifiedTokens.size >= VERIFIED_TOKENS_MAX) {
+    const oldest = verifiedTokens.keys().next().value;
+    if (oldest !== undefined) verifiedTokens.delete(oldest);
+  }
+  verifiedTokens.set(token, payload);
+}
+
 export async function generateJWT(payload: Omit<JWTPayload, 'exp'>): Promise<string> {
   const header = {
     alg: 'HS256',
@@ -92,6 +142,20 @@ export async function generateJWT(payload: Omit<JWTPayload, 'exp'>): Promise<str
 
 export async function verifyJWT(token: string): Promise<JWTPayload | null> {
   try {
+    const now = Math.floor(Date.now() / 1000);
+
+    // Token ya verificado en este isolate: solo se revisa la expiración
+    const cached = verifiedTokens.get(token);
+    if (cached) {
+      verifiedTokens.delete(token);
+      if (cached.exp < now) {
+        console.error('JWT: Token expired');
+        return null;
+      }
+      verifiedTokens.set(token, cached);
+      return cached;
+    }
+
     const parts = token.split('.');
     if (parts.length !== 3) {
       console.error('JWT: Invalid format - not 3 parts');
@@ -107,16 +171,20 @@ export async function verifyJWT(token: string): Promise<JWTPayload | null> {
       return null;
     }
 
-    const payloadString = base64urlDecode(encodedPayload);
-    const payload: JWTPayload = JSON.parse(payloadString);
+    const payloadBytes = base64urlDecodeBytes(encodedPayload);
+    if (!payloadBytes) {
+      console.error('JWT: Invalid payload encoding');
+      return null;
+    }
+    const payload: JWTPayload = JSON.parse(decoder.decode(payloadBytes));
     
     // Verificar expiración
-    const now = Math.floor(Date.now() / 1000);
     if (payload.exp < now) {
       console.error('JWT: Token expired');
       return null;
     }
 
+    rememberVerifiedToken(token, Object.freeze(payload));
     return payload;
   } catch (error) {
     console.error('JWT: Verification failed', error);
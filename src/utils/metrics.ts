@@ -0,0 +1,298 @@
+// Métricas de latencia por ruta y de consultas a D1
+// Las peticiones se acumulan en memoria del isolate (por ruta) y se vuelcan a la tabla
+// request_metrics (migración 0026) como mucho una vez por METRICS_FLUSH_INTERVAL_MS. Las
+// consultas se miden envolviendo c.env.DB: cada sentencia ejecutada suma su duración y las
+// filas leídas/escritas que informa D1 en meta.
+
+// Límite superior (ms) de cada tramo del histograma; el último tramo es abierto
+export const LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000];
+
+export const METRICS_FLUSH_INTERVAL_MS = 60 * 1000;
+const METRICS_RETENTION_MS = 7 * 24 * 60 * 60 * 1000;
+const METRICS_PRUNE_INTERVAL_MS = 60 * 60 * 1000;
+// Evita que un isolate con muchas rutas distintas acumule sin límite antes de volcar
+const METRICS_MAX_ROUTES = 200;
+
+export interface QueryStats {
+  count: number;
+  durationMs: number;
+  rowsRead: number;
+  rowsWritten: number;
+}
+
+interface RouteWindow {
+  requestCount: number;
+  errorCount: number;
+  totalMs: number;
+  maxMs: number;
+  histogram: number[];
+  queryCount: number;
+  queryMs: number;
+  maxQueries: number;
+  rowsRead: number;
+  rowsWritten: number;
+}
+
+export interface MetricsFlush {
+  windowStart: number;
+  windowEnd: number;
+  routes: Map<string, RouteWindow>;
+  prune: boolean;
+}
+
+let windowStart = Date.now();
+let routes = new Map<string, RouteWindow>();
+let lastPrune = 0;
+
+export function createQueryStats(): QueryStats {
+  return { count: 0, durationMs: 0, rowsRead: 0, rowsWritten: 0 };
+}
+
+function bucketIndex(durationMs: number): number {
+  const index = LATENCY_BUCKETS_MS.findIndex(limit => durationMs <= limit);
+  return index === -1 ? LATENCY_BUCKETS_MS.length : index;
+}
+
+export function recordRequest(route: string, status: number, durationMs: number, queries: QueryStats): void {
+  let window = routes.get(route);
+  if (!window) {
+    window = {
+      requestCount: 0, errorCount: 0, totalMs: 0, maxMs: 0,
+      histogram: new Array(LATENCY_BUCKETS_MS.length + 1).fill(0),
+      queryCount: 0, queryMs: 0, maxQueries: 0, rowsRead: 0, rowsWritten: 0
+    };
+    routes.set(route, window);
+  }
+
+  window.requestCount++;
+  if (status >= 500) window.errorCount++;
+  window.totalMs += durationMs;
+  window.maxMs = Math.max(window.maxMs, durationMs);
+  window.histogram[bucketIndex(durationMs)]++;
+  window.queryCount += queries.count;
+  window.queryMs += queries.durationMs;
+  window.maxQueries = Math.max(window.maxQueries, queries.count);
+  window.rowsRead += queries.rowsRead;
+  window.rowsWritten += queries.rowsWritten;
+}
+
+// Entrega lo acumulado si toca volcarlo y empieza una ventana nueva
+export function takeMetricsFlush(now = Date.now()): MetricsFlush | null {
+  if (routes.size === 0) return null;
+  if (now - windowStart < METRICS_FLUSH_INTERVAL_MS && routes.size < METRICS_MAX_ROUTES) return null;
+
+  const flush: MetricsFlush = {
+    windowStart,
+    windowEnd: now,
+    routes,
+    prune: now - lastPrune >= METRICS_PRUNE_INTERVAL_MS
+  };
+  if (flush.prune) lastPrune = now;
+
+  windowStart = now;
+  routes = new Map();
+  return flush;
+}
+
+export async function writeMetricsFlush(db: D1Database, flush: MetricsFlush): Promise<void> {
+  const statements = [...flush.routes].map(([route, window]) => db.prepare(`
+    INSERT INTO request_metrics (
+      window_start, window_end, route, request_count, error_count, total_ms, max_ms,
+      latency_histogram, query_count, query_ms, max_queries, rows_read, rows_written
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+  `).bind(
+    flush.windowStart, flush.windowEnd, route, window.requestCount, window.errorCount,
+    window.totalMs, window.maxMs, JSON.stringify(window.histogram), window.queryCount,
+    window.queryMs, window.maxQueries, window.rowsRead, window.rowsWritten
+  ));
+
+  if (flush.prune) {
+    statements.push(db.prepare(`
+      DELETE FROM request_metrics WHERE window_end < ?
+    `).bind(flush.windowEnd - METRICS_RETENTION_MS));
+  }
+
+  await db.batch(statements);
+}
+
+// ===== INSTRUMENTACIÓN DE D1 =====
+
+const EXECUTING_METHODS = new Set(['first', 'run', 'all', 'raw']);
+
+// Huella de una consulta: el SQL sin literales ni espacios redundantes, de modo que todas las
+// ejecuciones de una misma sentencia coincidan, y un nombre corto (verbo y tabla principal)
+export function queryFingerprint(sql: string): { name: string; normalized: string } {
+  const normalized = sql
+    .replace(/--[^\n]*/g, ' ')
+    .replace(/'(?:[^']|'')*'/g, '?')
+    .replace(/\?\d+/g, '?')
+    .replace(/\b\d+(?:\.\d+)?\b/g, '?')
+    .replace(/\(\s*\?(?:\s*,\s*\?)*\s*\)/g, '(?, ...)')
+    .replace(/\s+/g, ' ')
+    .trim();
+
+  const verb = (normalized.match(/^\(?\s*(\w+)/)?.[1] || 'query').toLowerCase();
+  const tablePattern = verb === 'insert' ? /\binto\s+([\w.]+)/i
+    : verb === 'update' ? /^update\s+(?:or\s+\w+\s+)?([\w.]+)/i
+    : /\bfrom\s+([\w.]+)/i;
+  const table = normalized.match(tablePattern)?.[1];
+
+  return { name: table ? `${verb}-${table.toLowerCase()}` : verb, normalized };
+}
+
+// Se invoca por cada sentencia ejecutada (en un batch, una vez por sentencia con la duración
+// total del lote repartida a partes iguales) con el SQL y los parámetros enlazados
+export type QueryObserver = (sql: string, durationMs: number, params: unknown[], meta?: Partial<D1Meta>) => void;
+
+// Devuelve una versión de db que acumula en stats cada consulta ejecutada
+export function instrumentD1(db: D1Database, stats: QueryStats, onQuery?: QueryObserver): D1Database {
+  const originals = new WeakMap<object, { statement: D1PreparedStatement; sql: string; params: unknown[] }>();
+
+  const record = (sql: string, durationMs: number, params: unknown[], meta?: Partial<D1Meta>) => {
+    stats.count++;
+    stats.durationMs += durationMs;
+    stats.rowsRead += meta?.rows_read ?? 0;
+    stats.rowsWritten += meta?.rows_written ?? 0;
+    onQuery?.(sql, durationMs, params, meta);
+  };
+
+  const wrapStatement = (statement: D1PreparedStatement, sql: string, params: unknown[] = []): D1PreparedStatement => {
+    const proxy = new Proxy(statement, {
+      get(target, property) {
+        if (property === 'bind') {
+          return (...values: unknown[]) => wrapStatement(target.bind(...values), sql, values);
+        }
+        if (typeof property === 'string' && EXECUTING_METHODS.has(property)) {
+          if (property === 'first') {
+            // first() no devuelve meta: se ejecuta con all() (D1 también lee el resultado completo)
+            // para contar las filas leídas de las búsquedas por fila, típicas de los patrones N+1
+            return async (column?: string) => {
+              const startedAt = performance.now();
+              const result = await target.all();
+              record(sql, performance.now() - startedAt, params, result.meta);
+              const row = (result.results[0] ?? null) as Record<string, unknown> | null;
+              if (column === undefined || row === null) return row;
+              if (!(column in row)) throw new Error(`D1_COLUMN_NOTFOUND: Column not found (${column})`);
+              return row[column];
+            };
+          }
+          return async (...args: unknown[]) => {
+            const startedAt = performance.now();
+            const result = await (target as any)[property](...args);
+            // raw() no devuelve meta: solo cuenta número y duración
+            record(sql, performance.now() - startedAt, params, property === 'raw' ? undefined : result?.meta);
+            return result;
+          };
+        }
+        const value = Reflect.get(target, property, target);
+        return typeof value === 'function' ? value.bind(target) : value;
+      }
+    });
+    originals.set(proxy, { statement, sql, params });
+    return proxy;
+  };
+
+  return new Proxy(db, {
+    get(target, property) {
+      if (property === 'prepare') {
+        return (query: string) => wrapStatement(target.prepare(query), query);
+      }
+      if (property === 'batch') {
+        return async (statements: D1PreparedStatement[]) => {
+          const startedAt = performance.now();
+          const results = await target.batch(statements.map(statement => originals.get(statement)?.statement ?? statement));
+          const durationMs = (performance.now() - startedAt) / Math.max(results.length, 1);
+          results.forEach((result, index) => {
+            const original = originals.get(statements[index]);
+            record(original?.sql ?? '', durationMs, original?.params ?? [], result.meta);
+          });
+          return results;
+        };
+      }
+      const value = Reflect.get(target, property, target);
+      return typeof value === 'function' ? value.bind(target) : value;
+    }
+  });
+}
+
+// ===== INFORME =====
+
+export interface RouteMetricsRow {
+  route: string;
+  request_count: number;
+  error_count: number;
+  total_ms: number;
+  max_ms: number;
+  latency_histogram: string;
+  query_count: number;
+  query_ms: number;
+  max_queries: number;
+  rows_read: number;
+  rows_written: number;
+}
+
+// Percentil estimado a partir del histograma (interpolación lineal dentro del tramo)
+function percentileFromHistogram(histogram: number[], total: number, maxMs: number, percentile: number): number {
+  if (total === 0) return 0;
+  const target = total * percentile;
+  let cumulative = 0;
+
+  for (let i = 0; i < histogram.length; i++) {
+    const count = histogram[i];
+    if (count > 0 && cumulative + count >= target) {
+      const lower = i === 0 ? 0 : LATENCY_BUCKETS_MS[i - 1];
+      const upper = Math.min(i < LATENCY_BUCKETS_MS.length ? LATENCY_BUCKETS_MS[i] : maxMs, maxMs);
+      return Math.round(lower + (Math.max(upper, lower) - lower) * ((target - cumulative) / count));
+    }
+    cumulative += count;
+  }
+  return Math.round(maxMs);
+}
+
+// Combina las ventanas de cada ruta y calcula los indicadores del informe
+export function summarizeRouteMetrics(rows: RouteMetricsRow[]) {
+  const byRoute = new Map<string, RouteMetricsRow & { histogram: number[] }>();
+
+  for (const row of rows) {
+    const histogram: number[] = JSON.parse(row.latency_histogram);
+    const current = byRoute.get(row.route);
+    if (!current) {
+      byRoute.set(row.route, { ...row, histogram });
+      continue;
+    }
+    current.request_count += row.request_count;
+    current.error_count += row.error_count;
+    current.total_ms += row.total_ms;
+    current.max_ms = Math.max(current.max_ms, row.max_ms);
+    current.query_count += row.query_count;
+    current.query_ms += row.query_ms;
+    current.max_queries = Math.max(current.max_queries, row.max_queries);
+    current.rows_read += row.rows_read;
+    current.rows_written += row.rows_written;
+    histogram.forEach((count, index) => {
+      current.histogram[index] = (current.histogram[index] || 0) + count;
+    });
+  }
+
+  return [...byRoute.values()]
+    .map(route => {
+      const requests = route.request_count || 1;
+      return {
+        route: route.route,
+        requests: route.request_count,
+        errors: route.error_count,
+        avg_ms: Math.round(route.total_ms / requests),
+        p50_ms: percentileFromHistogram(route.histogram, route.request_count, route.max_ms, 0.5),
+        p95_ms: percentileFromHistogram(route.histogram, route.request_count, route.max_ms, 0.95),
+        p99_ms: percentileFromHistogram(route.histogram, route.request_count, route.max_ms, 0.99),
+        max_ms: Math.round(route.max_ms),
+        total_ms: Math.round(route.total_ms),
+        queries_per_request: Math.round((route.query_count / requests) * 10) / 10,
+        max_queries_per_request: route.max_queries,
+        avg_query_ms: Math.round(route.query_ms / requests),
+        rows_read_per_request: Math.round(route.rows_read / requests),
+        rows_written: route.rows_written
+      };
+    })
+    .sort((a, b) => b.total_ms - a.total_ms);
+}
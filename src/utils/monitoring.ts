@@ -0,0 +1,291 @@
+// Agregados del panel de monitoreo de administración
+// Los datos se sirven desde instantáneas (tabla monitoring_snapshots, ver migración 0024) que
+// se regeneran como mucho una vez por intervalo: el panel consulta cada 30 segundos y varias
+// pestañas o administradores abiertos no multiplican las consultas de agregación.
+// Una instantánea vencida se sirve igualmente mientras otra petición la regenera en segundo
+// plano; solo si no existe ninguna se calcula antes de responder.
+import { Context } from 'hono';
+import { Bindings } from '../types/index';
+
+type MonitoringContext = Context<{ Bindings: Bindings }>;
+
+export const MONITORING_OVERVIEW_TTL_SECONDS = 30;
+// Una regeneración reclamada que no termina en este plazo puede reclamarse de nuevo
+const REFRESH_CLAIM_TIMEOUT_MS = 30 * 1000;
+
+export interface SnapshotResult<T> {
+  data: T;
+  generated_at: string;
+  age_seconds: number;
+  ttl_seconds: number;
+  stale: boolean;
+}
+
+interface StoredSnapshot<T> {
+  data: T;
+  generatedAt: number;
+}
+
+// Copia en memoria del isolate: dentro del intervalo no hace falta ni leer D1
+const snapshotMemo = new Map<string, StoredSnapshot<unknown>>();
+
+function runInBackground(c: MonitoringContext, task: Promise<unknown>) {
+  const guarded = task.catch(error => console.error('Error regenerando instantánea de monitoreo:', error));
+  try {
+    c.executionCtx.waitUntil(guarded);
+  } catch {
+    // Sin ExecutionContext (desarrollo local): la tarea continúa sin waitUntil
+  }
+}
+
+async function refreshSnapshot<T>(
+  db: D1Database,
+  name: string,
+  build: (db: D1Database) => Promise<T>
+): Promise<StoredSnapshot<T>> {
+  const startedAt = Date.now();
+  const data = await build(db);
+  const generatedAt = Date.now();
+
+  await db.prepare(`
+    INSERT INTO monitoring_snapshots (name, payload, generated_at, generation_ms, refresh_claimed_at)
+    VALUES (?, ?, ?, ?, NULL)
+    ON CONFLICT(name) DO UPDATE SET
+      payload = excluded.payload,
+      generated_at = excluded.generated_at,
+      generation_ms = excluded.generation_ms,
+      refresh_claimed_at = NULL
+  `).bind(name, JSON.stringify(data), generatedAt, generatedAt - startedAt).run();
+
+  const snapshot = { data, generatedAt };
+  snapshotMemo.set(name, snapshot);
+  return snapshot;
+}
+
+function toResult<T>(snapshot: StoredSnapshot<T>, ttlMs: number): SnapshotResult<T> {
+  const age = Date.now() - snapshot.generatedAt;
+  return {
+    data: snapshot.data,
+    generated_at: new Date(snapshot.generatedAt).toISOString(),
+    age_seconds: Math.max(0, Math.round(age / 1000)),
+    ttl_seconds: Math.round(ttlMs / 1000),
+    stale: age > ttlMs
+  };
+}
+
+// Devuelve la instantánea indicada, regenerándola con build() si ha vencido
+export async function getSnapshot<T>(
+  c: MonitoringContext,
+  name: string,
+  ttlSeconds: number,
+  build: (db: D1Database) => Promise<T>,
+  forceRefresh = false
+): Promise<SnapshotResult<T>> {
+  const db = c.env.DB;
+  const ttlMs = ttlSeconds * 1000;
+  const now = Date.now();
+
+  if (forceRefresh) {
+    return toResult(await refreshSnapshot(db, name, build), ttlMs);
+  }
+
+  const memo = snapshotMemo.get(name) as StoredSnapshot<T> | undefined;
+  if (memo && now - memo.generatedAt <= ttlMs) {
+    return toResult(memo, ttlMs);
+  }
+
+  const row = await db.prepare(`
+    SELECT payload, generated_at FROM monitoring_snapshots WHERE name = ?
+  `).bind(name).first<{ payload: string; generated_at: number }>();
+
+  if (!row) {
+    return toResult(await refreshSnapshot(db, name, build), ttlMs);
+  }
+
+  const stored: StoredSnapshot<T> = { data: JSON.parse(row.payload), generatedAt: row.generated_at };
+  snapshotMemo.set(name, stored);
+
+  if (now - stored.generatedAt > ttlMs) {
+    // Solo la petición que consigue el reclamo regenera; el resto sirve la instantánea vencida
+    const claim = await db.prepare(`
+      UPDATE monitoring_snapshots
+      SET refresh_claimed_at = ?
+      WHERE name = ? AND generated_at = ?
+        AND (refresh_claimed_at IS NULL OR refresh_claimed_at < ?)
+      RETURNING name
+    `).bind(now, name, stored.generatedAt, now - REFRESH_CLAIM_TIMEOUT_MS).first();
+
+    if (claim) {
+      runInBackground(c, refreshSnapshot(db, name, build));
+    }
+  }
+
+  return toResult(stored, ttlMs);
+}
+
+// ===== RESUMEN GENERAL =====
+
+export interface MonitoringOverview {
+  system_metrics: Record<string, number>;
+  scoring_stats: Record<string, number>;
+  alert_counts: Record<string, number>;
+  recent_alerts: Record<string, unknown>[];
+  attention_projects: Record<string, unknown>[];
+  action_line_metrics: Record<string, unknown>[];
+  recent_trends: { date: string; projects_created: number }[];
+}
+
+// Estados de system_alerts que aún requieren atención
+const OPEN_ALERT_STATUSES = `('ACTIVE', 'ACKNOWLEDGED', 'IN_PROGRESS')`;
+
+export async function buildMonitoringOverview(db: D1Database): Promise<MonitoringOverview> {
+  const [projects, products, researchers, scoring, alertCounts, recentAlerts, attention, actionLines, trends] = await db.batch([
+    db.prepare(`
+      SELECT
+        COUNT(*) as total_projects,
+        COALESCE(SUM(status = 'ACTIVE'), 0) as active_projects,
+        COALESCE(SUM(status = 'COMPLETED'), 0) as completed_projects,
+        COALESCE(SUM(risk_level IN ('HIGH', 'CRITICAL')), 0) as high_risk_projects,
+        COALESCE(AVG(progress_percentage), 0) as avg_project_progress
+      FROM projects
+    `),
+    db.prepare(`
+      SELECT
+        COUNT(*) as total_products,
+        COALESCE(SUM(pc.category_group = 'EXPERIENCE'), 0) as total_experiences
+      FROM products pr
+      LEFT JOIN product_categories pc ON pc.code = pr.product_code
+    `),
+    db.prepare(`
+      SELECT COUNT(*) as total_researchers FROM users WHERE role = 'INVESTIGATOR'
+    `),
+    db.prepare(`
+      SELECT
+        COUNT(*) as total_scored_projects,
+        COALESCE(AVG(total_score), 0) as avg_total_score,
+        COALESCE(SUM(evaluation_category = 'EXCELENTE'), 0) as excellent_projects,
+        COALESCE(SUM(evaluation_category = 'BUENO'), 0) as good_projects,
+        COALESCE(SUM(evaluation_category = 'REGULAR'), 0) as regular_projects,
+        COALESCE(SUM(evaluation_category = 'NECESITA_MEJORA'), 0) as needs_improvement_projects
+      FROM project_scores
+      WHERE is_current = 1
+    `),
+    db.prepare(`
+      SELECT
+        (SELECT COUNT(*) FROM system_alerts WHERE status IN ${OPEN_ALERT_STATUSES}) as open_alerts,
+        (SELECT COUNT(*) FROM system_alerts WHERE status IN ${OPEN_ALERT_STATUSES} AND severity_level <= 2) as critical_alerts,
+        (SELECT COUNT(*) FROM project_alerts WHERE status = 'ACTIVE') as active_project_alerts
+    `),
+    db.prepare(`
+      SELECT
+        sa.id, sa.title, sa.severity_level, sa.status, sa.detected_at,
+        at.category, at.color_code, at.icon
+      FROM system_alerts sa
+      LEFT JOIN alert_types at ON at.id = sa.alert_type_id
+      WHERE sa.status IN ${OPEN_ALERT_STATUSES}
+      ORDER BY sa.severity_level ASC, sa.detected_at DESC
+      LIMIT 5
+    `),
+    db.prepare(`
+      SELECT
+        p.id, p.title, p.status, u.full_name as owner_name,
+        'Score: ' || CAST(ROUND(ps.total_score) AS INTEGER) || ' (' || ps.evaluation_category || ')' as attention_reason,
+        (SELECT COUNT(*) FROM products pr WHERE pr.project_id = p.id) as product_count,
+        (SELECT COUNT(*) FROM project_collaborators pc WHERE pc.project_id = p.id) as collaborator_count
+      FROM project_scores ps
+      JOIN projects p ON p.id = ps.project_id
+      LEFT JOIN users u ON u.id = p.owner_id
+      WHERE ps.is_current = 1 AND ps.evaluation_category IN ('NECESITA_MEJORA', 'REGULAR')
+      ORDER BY ps.total_score ASC
+      LIMIT 8
+    `),
+    db.prepare(`
+      SELECT
+        al.id, al.name, al.code, al.color as color_code,
+        COUNT(p.id) as project_count,
+        COALESCE(SUM(p.status = 'ACTIVE'), 0) as active_projects,
+        COALESCE(SUM(pp.product_count), 0) as product_count,
+        COALESCE(AVG(p.progress_percentage), 0) as avg_progress
+      FROM action_lines al
+      LEFT JOIN projects p ON p.action_line_id = al.id
+      LEFT JOIN (
+        SELECT project_id, COUNT(*) as product_count FROM products GROUP BY project_id
+      ) pp ON pp.project_id = p.id
+      WHERE al.is_active = 1
+      GROUP BY al.id
+      ORDER BY al.display_order, al.name
+    `),
+    db.prepare(`
+      SELECT DATE(created_at) as date, COUNT(*) as projects_created
+      FROM projects
+      WHERE created_at >= DATE('now', '-14 days')
+      GROUP BY DATE(created_at)
+      ORDER BY date ASC
+    `)
+  ]);
+
+  const first = (result: D1Result) => (result.results[0] ?? {}) as Record<string, number>;
+  const actionLineMetrics = actionLines.results as Record<string, unknown>[];
+
+  return {
+    system_metrics: {
+      ...first(projects),
+      ...first(products),
+      ...first(researchers),
+      total_action_lines: actionLineMetrics.length,
+      avg_project_score: Math.round(first(scoring).avg_total_score || 0)
+    },
+    scoring_stats: first(scoring),
+    alert_counts: first(alertCounts),
+    recent_alerts: recentAlerts.results as Record<string, unknown>[],
+    attention_projects: attention.results as Record<string, unknown>[],
+    action_line_metrics: actionLineMetrics,
+    recent_trends: trends.results as { date: string; projects_created: number }[]
+  };
+}
+
+// ===== DISTRIBUCIONES PARA GRÁFICOS =====
+
+export interface MonitoringDistributions {
+  status_distribution: { status: string | null; count: number }[];
+  action_lines_distribution: Record<string, unknown>[];
+  scoring_distribution: Record<string, unknown>[];
+}
+
+export async function buildMonitoringDistributions(db: D1Database): Promise<MonitoringDistributions> {
+  const [status, actionLines, scoring] = await db.batch([
+    db.prepare(`
+      SELECT status, COUNT(*) as count
+      FROM projects
+      GROUP BY status
+    `),
+    // Proyectos activos por línea de acción
+    db.prepare(`
+      SELECT
+        al.name,
+        al.code,
+        COUNT(p.id) as project_count,
+        COALESCE(AVG(ps.total_score), 0) as avg_score
+      FROM action_lines al
+      LEFT JOIN projects p ON al.id = p.action_line_id AND p.status = 'ACTIVE'
+      LEFT JOIN project_scores ps ON p.id = ps.project_id AND ps.is_current = 1
+      GROUP BY al.id, al.name
+      ORDER BY project_count DESC
+    `),
+    db.prepare(`
+      SELECT
+        evaluation_category,
+        COUNT(*) as count,
+        AVG(total_score) as avg_score
+      FROM project_scores
+      WHERE is_current = 1
+      GROUP BY evaluation_category
+    `)
+  ]);
+
+  return {
+    status_distribution: status.results as { status: string | null; count: number }[],
+    action_lines_distribution: actionLines.results as Record<string, unknown>[],
+    scoring_distribution: scoring.results as Record<string, unknown>[]
+  };
+}
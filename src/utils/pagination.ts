@@ -0,0 +1,98 @@
+// Utilidades de paginación por cursor (keyset)
+// El cursor codifica la posición (valor de ordenamiento, id) del último elemento entregado,
+// de modo que la siguiente página se obtiene con un rango sobre el índice en lugar de OFFSET.
+
+export interface CursorPosition {
+  value: string;
+  id: number;
+}
+
+export interface CursorPage<T> {
+  items: T[];
+  next_cursor: string | null;
+  has_more: boolean;
+}
+
+const MAX_CURSOR_LIMIT = 100;
+const COUNT_CACHE_TTL_MS = 60 * 1000;
+const COUNT_CACHE_MAX_ENTRIES = 200;
+
+// Conteos recientes por consulta+parámetros (vive mientras viva el isolate)
+const countCache = new Map<string, { total: number; expiresAt: number }>();
+
+export function encodeCursor(value: string, id: number): string {
+  return btoa(JSON.stringify([value, id]))
+    .replace(/\+/g, '-')
+    .replace(/\//g, '_')
+    .replace(/=/g, '');
+}
+
+export function decodeCursor(cursor: string): CursorPosition | null {
+  try {
+    let str = cursor.replace(/-/g, '+').replace(/_/g, '/');
+    while (str.length % 4) str += '=';
+    const [value, id] = JSON.parse(atob(str));
+    if (typeof value !== 'string' || !Number.isInteger(id)) {
+      return null;
+    }
+    return { value, id };
+  } catch {
+    return null;
+  }
+}
+
+// El modo cursor se activa con el parámetro ?cursor= (vacío para la primera página)
+export function isCursorMode(cursor: string | undefined): cursor is string {
+  return cursor !== undefined;
+}
+
+export function clampCursorLimit(limit: number): number {
+  if (!Number.isFinite(limit) || limit < 1) return 20;
+  return Math.min(limit, MAX_CURSOR_LIMIT);
+}
+
+// Condición para orden descendente por (columna, id); usa comparación de row values
+// para que SQLite recorra el índice directamente desde la posición del cursor
+export function keysetCondition(sortColumn: string, idColumn: string): string {
+  return `(${sortColumn}, ${idColumn}) < (?, ?)`;
+}
+
+// Recibe limit + 1 filas y arma la página con el cursor siguiente
+export function buildCursorPage<T extends Record<string, any>>(
+  rows: T[],
+  limit: number,
+  sortField: string,
+  idField: string = 'id'
+): CursorPage<T> {
+  const hasMore = rows.length > limit;
+  const items = hasMore ? rows.slice(0, limit) : rows;
+  const last = items[items.length - 1];
+
+  return {
+    items,
+    next_cursor: hasMore && last ? encodeCursor(String(last[sortField]), Number(last[idField])) : null,
+    has_more: hasMore
+  };
+}
+
+// COUNT(*) con caché corta en el isolate para no pagar el conteo en cada página
+export async function countWithCache(db: D1Database, query: string, params: any[]): Promise<number> {
+  const key = `${query}|${JSON.stringify(params)}`;
+  const now = Date.now();
+  const cached = countCache.get(key);
+
+  if (cached && cached.expiresAt > now) {
+    return cached.total;
+  }
+
+  const result = await db.prepare(query).bind(...params).first<{ total: number }>();
+  const total = result?.total || 0;
+
+  if (countCache.size >= COUNT_CACHE_MAX_ENTRIES) {
+    const oldestKey = countCache.keys().next().value;
+    if (oldestKey !== undefined) countCache.delete(oldestKey);
+  }
+  countCache.set(key, { total, expiresAt: now + COUNT_CACHE_TTL_MS });
+
+  return total;
+}
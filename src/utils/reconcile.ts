@@ -0,0 +1,199 @@
+// Conciliación entre los objetos de R2 y las tablas files / file_blobs
+// R2.list() devuelve las claves en orden lexicográfico; cada página se compara con el mismo
+// rango de claves en la base de datos (ordenado igual, comparación binaria), de modo que ambos
+// lados se recorren una sola vez y por tramos:
+//   - objetos huérfanos: existen en R2 pero ninguna fila los referencia (se paga por ellos)
+//   - filas colgantes: files / file_blobs apuntan a un objeto que ya no existe (sirven 404)
+// Cada ejecución procesa un número limitado de páginas y devuelve el cursor para continuar.
+import { releaseStoredFiles, StoredFileRef } from './blobs';
+import { THUMBNAIL_SIZES } from './thumbnails';
+
+export const RECONCILE_PAGE_SIZE = 1000;
+export const RECONCILE_MAX_PAGES = 20;
+// Límite de elementos de cada tipo incluidos en el informe (los totales se cuentan siempre)
+const REPORT_SAMPLE_LIMIT = 200;
+
+export interface ReconcileOptions {
+  cursor?: string;      // Cursor de R2.list() devuelto por la ejecución anterior
+  afterKey?: string;    // Última clave procesada por la ejecución anterior
+  maxPages: number;
+  minAgeMs: number;     // Los objetos más recientes se ignoran (subidas aún sin registrar)
+  deleteOrphans: boolean;
+  currentLogoKey?: string | null; // undefined: se desconoce y no se tocan los logos
+}
+
+export interface ReconcileReport {
+  pages: number;
+  scanned_objects: number;
+  orphan_objects: { count: number; bytes: number; sample: { key: string; size: number; uploaded: string }[] };
+  dangling_files: { count: number; sample: { id: number; file_path: string; original_name: string }[] };
+  dangling_blobs: { count: number; sample: { hash: string; object_key: string; ref_count: number }[] };
+  deleted: { objects: number; files: number; blobs: number };
+  next_cursor: string | null;
+  last_key: string | null;
+  complete: boolean;
+}
+
+const THUMBNAIL_PREFIX = /^derived\/thumbnails\/([a-z]+)\/(.+)\.webp$/;
+
+// Clave del objeto que justifica la existencia de otro: las miniaturas dependen de su original
+function sourceKey(key: string): string {
+  const match = key.match(THUMBNAIL_PREFIX);
+  return match && match[1] in THUMBNAIL_SIZES ? match[2] : key;
+}
+
+export async function reconcileStorage(
+  db: D1Database,
+  bucket: R2Bucket,
+  options: ReconcileOptions
+): Promise<ReconcileReport> {
+  const report: ReconcileReport = {
+    pages: 0,
+    scanned_objects: 0,
+    orphan_objects: { count: 0, bytes: 0, sample: [] },
+    dangling_files: { count: 0, sample: [] },
+    dangling_blobs: { count: 0, sample: [] },
+    deleted: { objects: 0, files: 0, blobs: 0 },
+    next_cursor: null,
+    last_key: null,
+    complete: false
+  };
+
+  let cursor = options.cursor;
+  let lowerKey = options.afterKey ?? '';
+  const cutoff = Date.now() - options.minAgeMs;
+
+  while (report.pages < options.maxPages) {
+    const page = await bucket.list({ cursor, limit: RECONCILE_PAGE_SIZE });
+    report.pages++;
+    report.scanned_objects += page.objects.length;
+
+    const keys = page.objects.map(object => object.key);
+    // En la última página el rango queda abierto por arriba
+    const upperKey = page.truncated && keys.length > 0 ? keys[keys.length - 1] : null;
+
+    // 1. Objetos huérfanos de la página
+    const candidates = page.objects.filter(object =>
+      object.uploaded.getTime() < cutoff &&
+      !(options.currentLogoKey === undefined && sourceKey(object.key).startsWith('logos/'))
+    );
+    const lookups = [...new Set(
+      candidates.map(object => sourceKey(object.key)).filter(key => !key.startsWith('logos/'))
+    )];
+
+    const unreferenced = new Set<string>();
+    if (lookups.length > 0) {
+      const rows = await db.prepare(`
+        SELECT k.value AS object_key
+        FROM json_each(?) k
+        WHERE NOT EXISTS (SELECT 1 FROM files f WHERE f.file_path = k.value)
+          AND NOT EXISTS (SELECT 1 FROM file_blobs b WHERE b.object_key = k.value)
+      `).bind(JSON.stringify(lookups)).all<{ object_key: string }>();
+      rows.results.forEach(row => unreferenced.add(row.object_key));
+    }
+
+    const orphans = candidates.filter(object => {
+      const source = sourceKey(object.key);
+      return source.startsWith('logos/') ? source !== options.currentLogoKey : unreferenced.has(source);
+    });
+
+    for (const object of orphans) {
+      report.orphan_objects.count++;
+      report.orphan_objects.bytes += object.size;
+      if (report.orphan_objects.sample.length < REPORT_SAMPLE_LIMIT) {
+        report.orphan_objects.sample.push({ key: object.key, size: object.size, uploaded: object.uploaded.toISOString() });
+      }
+    }
+
+    // 2. Filas colgantes dentro del rango (lowerKey, upperKey] que no aparecen en la página
+    const rangeCondition = (column: string) => upperKey === null
+      ? `${column} > ?1`
+      : `${column} > ?1 AND ${column} <= ?2`;
+    const rangeParams = upperKey === null ? [lowerKey] : [lowerKey, upperKey];
+    const listedKeys = JSON.stringify(keys);
+
+    const [danglingFiles, danglingBlobs] = await db.batch([
+      db.prepare(`
+        SELECT id, file_path, original_name, blob_hash
+        FROM files
+        WHERE ${rangeCondition('file_path')}
+          AND file_path NOT IN (SELECT value FROM json_each(?${rangeParams.length + 1}))
+        ORDER BY file_path
+      `).bind(...rangeParams, listedKeys),
+      db.prepare(`
+        SELECT hash, object_key, ref_count
+        FROM file_blobs
+        WHERE ${rangeCondition('object_key')}
+          AND object_key NOT IN (SELECT value FROM json_each(?${rangeParams.length + 1}))
+        ORDER BY object_key
+      `).bind(...rangeParams, listedKeys)
+    ]) as [
+      D1Result<{ id: number; file_path: string; original_name: string; blob_hash: string | null }>,
+      D1Result<{ hash: string; object_key: string; ref_count: number }>
+    ];
+
+    for (const file of danglingFiles.results) {
+      report.dangling_files.count++;
+      if (report.dangling_files.sample.length < REPORT_SAMPLE_LIMIT) {
+        report.dangling_files.sample.push({ id: file.id, file_path: file.file_path, original_name: file.original_name });
+      }
+    }
+    for (const blob of danglingBlobs.results) {
+      report.dangling_blobs.count++;
+      if (report.dangling_blobs.sample.length < REPORT_SAMPLE_LIMIT) {
+        report.dangling_blobs.sample.push(blob);
+      }
+    }
+
+    // 3. Limpieza opcional
+    if (options.deleteOrphans) {
+      if (orphans.length > 0) {
+        await bucket.delete(orphans.map(object => object.key));
+        report.deleted.objects += orphans.length;
+      }
+
+      if (danglingFiles.results.length > 0) {
+        // Se confirma que el objeto sigue sin existir antes de borrar la fila
+        const checks = await Promise.all(danglingFiles.results.map(file => bucket.head(file.file_path)));
+        const ids = danglingFiles.results.filter((_, index) => !checks[index]).map(file => file.id);
+        if (ids.length > 0) {
+          const deleted = await db.prepare(`
+            DELETE FROM files WHERE id IN (SELECT value FROM json_each(?))
+            RETURNING file_path, blob_hash
+          `).bind(JSON.stringify(ids)).all<StoredFileRef>();
+          report.deleted.files += deleted.results.length;
+          // El trigger ya liberó las referencias; se eliminan blobs sin uso y miniaturas
+          await releaseStoredFiles(db, bucket, deleted.results);
+        }
+      }
+
+      if (danglingBlobs.results.length > 0) {
+        // Solo los blobs que ya no referencia ningún archivo
+        const removed = await db.prepare(`
+          DELETE FROM file_blobs
+          WHERE hash IN (SELECT value FROM json_each(?))
+            AND NOT EXISTS (SELECT 1 FROM files f WHERE f.blob_hash = file_blobs.hash)
+          RETURNING hash
+        `).bind(JSON.stringify(danglingBlobs.results.map(blob => blob.hash))).all();
+        report.deleted.blobs += removed.results.length;
+      }
+    }
+
+    if (upperKey === null) {
+      report.complete = true;
+      break;
+    }
+
+    lowerKey = upperKey;
+    cursor = page.truncated ? page.cursor : undefined;
+    report.next_cursor = cursor ?? null;
+    report.last_key = lowerKey;
+  }
+
+  if (report.complete) {
+    report.next_cursor = null;
+    report.last_key = null;
+  }
+
+  return report;
+}
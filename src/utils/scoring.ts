@@ -0,0 +1,445 @@
+// Motor de scoring de proyectos por lotes (único para rutas admin y privadas)
+// Los insumos de todos los criterios se obtienen con una sola consulta que combina agregados
+// agrupados por proyecto (colaboradores, productos, categorías), los puntajes se calculan en
+// memoria sin acceso a la base de datos y los resultados se escriben con un único DB.batch().
+
+export interface ProjectScoringFeatures {
+  id: number;
+  title: string;
+  start_date: string | null;
+  end_date: string | null;
+  progress_percentage: number | null;
+  completed_fields: number; // campos de completitud con valor (de COMPLETENESS_FIELDS)
+  collaborator_count: number;
+  external_collaborator_count: number;
+  product_count: number;
+  products_with_doi: number;
+  avg_impact_factor: number;
+  total_citations: number;
+  category_group_count: number;
+  has_innovative_category: number;
+}
+
+export interface ProjectCriterionScores {
+  completenessScore: number;
+  collaborationScore: number;
+  productivityScore: number;
+  impactScore: number;
+  innovationScore: number;
+  timelineScore: number;
+  totalScore: number;
+}
+
+export interface ProjectScoreResult {
+  project_id: number;
+  project_title: string;
+  scores: {
+    completeness: number;
+    collaboration: number;
+    productivity: number;
+    impact: number;
+    innovation: number;
+    timeline: number;
+    total: number;
+  };
+  evaluation_category: string;
+  recommendations: string[];
+  score_id?: number;
+}
+
+// Marca de recálculo pendiente tomada por el modo incremental
+export interface DirtyProjectClaim {
+  project_id: number;
+  version: number;
+}
+
+// Proyectos a evaluar: uno solo, una lista explícita o (por defecto) todos los evaluables.
+// Salvo con projectId, solo se incluyen proyectos en estados evaluables a menos que se
+// indique allStatuses.
+export interface ScoringScope {
+  projectId?: number;
+  projectIds?: number[];
+  allStatuses?: boolean;
+}
+
+// Peso de cada criterio en el score total (tabla scoring_criteria)
+export interface ScoringWeights {
+  completeness: number;
+  collaboration: number;
+  productivity: number;
+  impact: number;
+  innovation: number;
+  timeline: number;
+}
+
+export const DEFAULT_SCORING_WEIGHTS: ScoringWeights = {
+  completeness: 0.25,
+  collaboration: 0.20,
+  productivity: 0.25,
+  impact: 0.15,
+  innovation: 0.10,
+  timeline: 0.05
+};
+
+const COMPLETENESS_FIELDS = ['title', 'abstract', 'methodology', 'start_date', 'end_date', 'institution', 'budget'];
+const INNOVATIVE_CATEGORY_GROUPS = ['SOFTWARE', 'PATENT', 'DATABASE'];
+const SCORED_STATUSES = ['ACTIVE', 'REVIEW', 'COMPLETED'];
+// Filas por sentencia al escribir (se envían como un único parámetro JSON)
+const WRITE_CHUNK_SIZE = 200;
+// Máximo de proyectos marcados que procesa una sola ejecución del modo incremental
+export const DIRTY_SCORING_LIMIT = 5000;
+
+// Pesos vigentes: los criterios inactivos pesan 0 y los ausentes usan el valor por defecto
+export async function loadScoringWeights(db: D1Database): Promise<ScoringWeights> {
+  const result = await db.prepare(
+    'SELECT criterion_name, weight, is_active FROM scoring_criteria'
+  ).all<{ criterion_name: string; weight: number; is_active: number }>();
+
+  const weights: ScoringWeights = { ...DEFAULT_SCORING_WEIGHTS };
+  for (const row of result.results) {
+    if (row.criterion_name in weights) {
+      weights[row.criterion_name as keyof ScoringWeights] = row.is_active ? Number(row.weight) : 0;
+    }
+  }
+  return weights;
+}
+
+// Carga los insumos de scoring para el alcance indicado
+export async function loadScoringFeatures(db: D1Database, scopeOptions: ScoringScope = {}): Promise<ProjectScoringFeatures[]> {
+  const conditions: string[] = [];
+  const scopeParams: any[] = [];
+
+  if (scopeOptions.projectId !== undefined) {
+    conditions.push('id = ?');
+    scopeParams.push(scopeOptions.projectId);
+  } else {
+    if (scopeOptions.projectIds) {
+      if (scopeOptions.projectIds.length === 0) return [];
+      conditions.push('id IN (SELECT value FROM json_each(?))');
+      scopeParams.push(JSON.stringify(scopeOptions.projectIds));
+    }
+    if (!scopeOptions.allStatuses) {
+      conditions.push(`status IN (${SCORED_STATUSES.map(() => '?').join(', ')})`);
+      scopeParams.push(...SCORED_STATUSES);
+    }
+  }
+  const scopedIds = `SELECT id FROM projects${conditions.length > 0 ? ` WHERE ${conditions.join(' AND ')}` : ''}`;
+  const completedFields = COMPLETENESS_FIELDS
+    .map(field => `(p.${field} IS NOT NULL AND TRIM(p.${field}) <> '')`)
+    .join(' + ');
+
+  const result = await db.prepare(`
+    SELECT
+      p.id, p.title, p.start_date, p.end_date, p.progress_percentage,
+      ${completedFields} as completed_fields,
+      IFNULL(col.collaborator_count, 0) as collaborator_count,
+      IFNULL(col.external_collaborator_count, 0) as external_collaborator_count,
+      IFNULL(prod.product_count, 0) as product_count,
+      IFNULL(prod.products_with_doi, 0) as products_with_doi,
+      IFNULL(prod.avg_impact_factor, 0) as avg_impact_factor,
+      IFNULL(prod.total_citations, 0) as total_citations,
+      IFNULL(cat.category_group_count, 0) as category_group_count,
+      IFNULL(cat.has_innovative_category, 0) as has_innovative_category
+    FROM projects p
+    LEFT JOIN (
+      SELECT project_id,
+        COUNT(*) as collaborator_count,
+        SUM(collaboration_role = 'EXTERNAL_COLLABORATOR') as external_collaborator_count
+      FROM project_collaborators
+      WHERE project_id IN (${scopedIds})
+      GROUP BY project_id
+    ) col ON col.project_id = p.id
+    LEFT JOIN (
+      SELECT project_id,
+        COUNT(*) as product_count,
+        COUNT(doi) as products_with_doi,
+        AVG(IFNULL(impact_factor, 0)) as avg_impact_factor,
+        SUM(IFNULL(citation_count, 0)) as total_citations
+      FROM products
+      WHERE project_id IN (${scopedIds})
+      GROUP BY project_id
+    ) prod ON prod.project_id = p.id
+    LEFT JOIN (
+      SELECT pr.project_id,
+        COUNT(DISTINCT pc.category_group) as category_group_count,
+        MAX(pc.category_group IN (${INNOVATIVE_CATEGORY_GROUPS.map(() => '?').join(', ')})) as has_innovative_category
+      FROM products pr
+      JOIN product_categories pc ON pr.product_type = pc.code
+      WHERE pr.project_id IN (${scopedIds})
+      GROUP BY pr.project_id
+    ) cat ON cat.project_id = p.id
+    WHERE p.id IN (${scopedIds})
+  `).bind(
+    ...scopeParams,
+    ...scopeParams,
+    ...INNOVATIVE_CATEGORY_GROUPS,
+    ...scopeParams,
+    ...scopeParams
+  ).all<ProjectScoringFeatures>();
+
+  return result.results;
+}
+
+// Completitud (0-100): proporción de campos clave diligenciados
+export function calculateCompletenessScore(features: ProjectScoringFeatures): number {
+  return Math.round((features.completed_fields / COMPLETENESS_FIELDS.length) * 100);
+}
+
+// Colaboración (0-100): 10 colaboradores = 100 puntos, bonus por colaboradores externos
+export function calculateCollaborationScore(features: ProjectScoringFeatures): number {
+  let score = Math.min((features.collaborator_count / 10) * 100, 100);
+  if (features.external_collaborator_count > 0) {
+    score += Math.min(features.external_collaborator_count * 10, 20); // Bonus hasta 20 puntos
+  }
+  return Math.min(Math.round(score), 100);
+}
+
+// Productividad (0-100): 5 productos = 100 puntos
+export function calculateProductivityScore(features: ProjectScoringFeatures): number {
+  return Math.round(Math.min((features.product_count / 5) * 100, 100));
+}
+
+// Impacto (0-100): DOI (30%), factor de impacto promedio (40%) y citaciones (30%)
+export function calculateImpactScore(features: ProjectScoringFeatures): number {
+  if (features.product_count === 0) {
+    return 0;
+  }
+
+  let score = (features.products_with_doi / features.product_count) * 30;
+  score += Math.min((features.avg_impact_factor / 5) * 40, 40); // Factor de impacto 5 = máximo
+  score += Math.min((features.total_citations / 50) * 30, 30); // 50 citaciones = máximo
+
+  return Math.min(Math.round(score), 100);
+}
+
+// Innovación (0-100): diversidad de grupos de categorías y bonus por categorías innovadoras
+export function calculateInnovationScore(features: ProjectScoringFeatures): number {
+  if (features.category_group_count === 0) {
+    return 0;
+  }
+
+  let score = Math.min(features.category_group_count * 15, 60); // Máximo 4 categorías
+  if (features.has_innovative_category) {
+    score += 20;
+  }
+
+  return Math.min(Math.round(score), 100);
+}
+
+// Cronograma (0-100): progreso reportado frente al esperado según las fechas
+export function calculateTimelineScore(features: ProjectScoringFeatures, now: Date = new Date()): number {
+  if (!features.start_date || !features.end_date) {
+    return 50; // Score neutral si no hay fechas definidas
+  }
+
+  const startDate = new Date(features.start_date);
+  const endDate = new Date(features.end_date);
+
+  // Si el proyecto no ha comenzado
+  if (now < startDate) {
+    return 100;
+  }
+
+  // Si el proyecto ya terminó
+  if (now > endDate) {
+    const daysOverdue = Math.floor((now.getTime() - endDate.getTime()) / (1000 * 60 * 60 * 24));
+    if (daysOverdue <= 30) return 80; // Ligeramente atrasado
+    if (daysOverdue <= 90) return 60; // Moderadamente atrasado
+    return 30; // Muy atrasado
+  }
+
+  // Proyecto en progreso: calcular progreso esperado vs real
+  const expectedProgress = ((now.getTime() - startDate.getTime()) / (endDate.getTime() - startDate.getTime())) * 100;
+  const progressDifference = (features.progress_percentage || 0) - expectedProgress;
+
+  if (progressDifference >= 0) return 100; // Adelantado o en tiempo
+  if (progressDifference >= -10) return 90; // Ligeramente atrasado
+  if (progressDifference >= -20) return 70; // Moderadamente atrasado
+  return 50; // Significativamente atrasado
+}
+
+export function getEvaluationCategory(totalScore: number): string {
+  if (totalScore >= 85) return 'EXCELENTE';
+  if (totalScore >= 70) return 'BUENO';
+  if (totalScore >= 50) return 'REGULAR';
+  return 'NECESITA_MEJORA';
+}
+
+// Generar recomendaciones basadas en los scores
+export function generateRecommendations(scores: ProjectCriterionScores): string[] {
+  const recommendations: string[] = [];
+
+  if (scores.completenessScore < 70) {
+    recommendations.push('Completar información del proyecto (metodología, fechas, presupuesto)');
+  }
+
+  if (scores.collaborationScore < 60) {
+    recommendations.push('Ampliar el equipo de colaboradores y buscar alianzas institucionales');
+  }
+
+  if (scores.productivityScore < 50) {
+    recommendations.push('Incrementar la generación de productos científicos y resultados');
+  }
+
+  if (scores.impactScore < 40) {
+    recommendations.push('Publicar en revistas indexadas y obtener DOI para los productos');
+  }
+
+  if (scores.innovationScore < 60) {
+    recommendations.push('Explorar categorías de productos más innovadoras (software, patentes)');
+  }
+
+  if (scores.timelineScore < 70) {
+    recommendations.push('Revisar cronograma y actualizar progreso del proyecto');
+  }
+
+  if (scores.totalScore >= 85) {
+    recommendations.push('¡Excelente desempeño! Considerar compartir mejores prácticas');
+  }
+
+  return recommendations;
+}
+
+// Calcula todos los criterios para un lote de proyectos (función pura, sin acceso a la base de datos)
+export function scoreProjects(
+  featureRows: ProjectScoringFeatures[],
+  weights: ScoringWeights = DEFAULT_SCORING_WEIGHTS,
+  now: Date = new Date()
+): ProjectScoreResult[] {
+  return featureRows.map(features => {
+    const completenessScore = calculateCompletenessScore(features);
+    const collaborationScore = calculateCollaborationScore(features);
+    const productivityScore = calculateProductivityScore(features);
+    const impactScore = calculateImpactScore(features);
+    const innovationScore = calculateInnovationScore(features);
+    const timelineScore = calculateTimelineScore(features, now);
+
+    // Calcular score total ponderado
+    const totalScore = Math.min(Math.round(
+      (completenessScore * weights.completeness) +
+      (collaborationScore * weights.collaboration) +
+      (productivityScore * weights.productivity) +
+      (impactScore * weights.impact) +
+      (innovationScore * weights.innovation) +
+      (timelineScore * weights.timeline)
+    ), 100);
+
+    return {
+      project_id: features.id,
+      project_title: features.title,
+      scores: {
+        completeness: completenessScore,
+        collaboration: collaborationScore,
+        productivity: productivityScore,
+        impact: impactScore,
+        innovation: innovationScore,
+        timeline: timelineScore,
+        total: totalScore
+      },
+      evaluation_category: getEvaluationCategory(totalScore),
+      recommendations: generateRecommendations({
+        completenessScore,
+        collaborationScore,
+        productivityScore,
+        impactScore,
+        innovationScore,
+        timelineScore,
+        totalScore
+      })
+    };
+  });
+}
+
+// Toma hasta `limit` proyectos marcados para recálculo (los más antiguos primero)
+export async function claimDirtyProjects(db: D1Database, limit: number): Promise<DirtyProjectClaim[]> {
+  const result = await db.prepare(`
+    SELECT project_id, version FROM project_score_dirty
+    ORDER BY marked_at
+    LIMIT ?
+  `).bind(limit).all<DirtyProjectClaim>();
+  return result.results;
+}
+
+// Marcas que cubre un recálculo completo (todas) o de un solo proyecto. Se leen antes de cargar
+// los insumos para que una marca posterior (versión nueva) sobreviva al guardado.
+export async function claimDirtyProjectsForRecompute(db: D1Database, projectId?: number): Promise<DirtyProjectClaim[]> {
+  const result = projectId === undefined
+    ? await db.prepare(`SELECT project_id, version FROM project_score_dirty`).all<DirtyProjectClaim>()
+    : await db.prepare(`
+        SELECT project_id, version FROM project_score_dirty WHERE project_id = ?
+      `).bind(projectId).all<DirtyProjectClaim>();
+  return result.results;
+}
+
+// Guarda los scores como nuevos registros vigentes y devuelve el id asignado a cada proyecto.
+// Cada bloque de proyectos viaja como un único parámetro JSON (json_each), de modo que miles
+// de proyectos se escriben con unas pocas sentencias dentro de una sola transacción.
+// Las marcas de recálculo recibidas se eliminan en la misma transacción, salvo las que
+// volvieron a marcarse mientras se calculaba.
+export async function saveProjectScores(
+  db: D1Database,
+  results: ProjectScoreResult[],
+  calculatedAt: string,
+  dirtyClaims: DirtyProjectClaim[] = []
+): Promise<Map<number, number>> {
+  if (results.length === 0 && dirtyClaims.length === 0) {
+    return new Map();
+  }
+
+  const statements: D1PreparedStatement[] = [];
+
+  for (let i = 0; i < results.length; i += WRITE_CHUNK_SIZE) {
+    const chunk = results.slice(i, i + WRITE_CHUNK_SIZE);
+
+    statements.push(db.prepare(`
+      UPDATE project_scores SET is_current = 0
+      WHERE is_current = 1 AND project_id IN (SELECT value FROM json_each(?))
+    `).bind(JSON.stringify(chunk.map(result => result.project_id))));
+
+    statements.push(db.prepare(`
+      INSERT INTO project_scores (
+        project_id, completeness_score, collaboration_score, productivity_score,
+        impact_score, innovation_score, timeline_score, total_score,
+        evaluation_category, recommendations, last_calculated_at, is_current
+      )
+      SELECT
+        json_extract(value, '$.project_id'),
+        json_extract(value, '$.scores.completeness'),
+        json_extract(value, '$.scores.collaboration'),
+        json_extract(value, '$.scores.productivity'),
+        json_extract(value, '$.scores.impact'),
+        json_extract(value, '$.scores.innovation'),
+        json_extract(value, '$.scores.timeline'),
+        json_extract(value, '$.scores.total'),
+        json_extract(value, '$.evaluation_category'),
+        json_extract(value, '$.recommendations'),
+        ?, 1
+      FROM json_each(?)
+    `).bind(calculatedAt, JSON.stringify(chunk.map(result => ({
+      project_id: result.project_id,
+      scores: result.scores,
+      evaluation_category: result.evaluation_category,
+      recommendations: result.recommendations
+    })))));
+  }
+
+  for (let i = 0; i < dirtyClaims.length; i += WRITE_CHUNK_SIZE) {
+    const chunk = dirtyClaims.slice(i, i + WRITE_CHUNK_SIZE);
+    statements.push(db.prepare(`
+      DELETE FROM project_score_dirty
+      WHERE (project_id, version) IN (
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+      )
+    `).bind(JSON.stringify(chunk.map(claim => [claim.project_id, claim.version]))));
+  }
+
+  statements.push(db.prepare(`
+    SELECT id, project_id FROM project_scores
+    WHERE last_calculated_at = ? AND is_current = 1
+  `).bind(calculatedAt));
+
+  const batchResults = await db.batch<{ id: number; project_id: number }>(statements);
+  const inserted = batchResults[batchResults.length - 1].results;
+
+  return new Map(inserted.map(row => [row.project_id, row.id]));
+}
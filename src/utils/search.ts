@@ -0,0 +1,22 @@
+// Utilidades para búsqueda de texto completo (FTS5)
+
+// Convierte el texto ingresado por el usuario en una expresión MATCH segura para FTS5.
+// Cada término se escapa entre comillas y se busca por prefijo ("invest" → investigación),
+// todos los términos deben aparecer (AND implícito). Devuelve null si no hay términos útiles.
+export function buildFtsQuery(search: string): string | null {
+  const terms = search
+    .normalize('NFC')
+    .split(/[^\p{L}\p{N}_]+/u)
+    .filter(term => term.length > 0)
+    .slice(0, 8);
+
+  if (terms.length === 0) {
+    return null;
+  }
+
+  return terms.map(term => `"${term}"*`).join(' ');
+}
+
+// Pesos bm25 por columna: el título pesa más que el resumen y las palabras clave
+export const PROJECTS_FTS_RANK = 'bm25(projects_fts, 10.0, 2.0, 5.0)';
+export const PRODUCTS_FTS_RANK = 'bm25(products_fts, 8.0, 2.0)';
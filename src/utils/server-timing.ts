@@ -0,0 +1,106 @@
+// Cabecera Server-Timing de las respuestas de la API
+// Desglosa el tiempo de cada petición en autenticación (verifyJWT), consultas a D1 agrupadas
+// por huella de la sentencia (ver queryFingerprint en metrics.ts), llamadas a R2 y KV y
+// serialización de la respuesta, de modo que las herramientas de desarrollo del navegador
+// muestren dónde se va el tiempo sin acceder a los logs.
+// Siempre activa en desarrollo local; en producción solo en una muestra de las peticiones
+// (SERVER_TIMING_SAMPLE_RATE, por defecto 5%).
+// Nota: en Workers el reloj solo avanza con la E/S, así que las fases que solo usan CPU
+// (auth, serialización) pueden marcar ~0 ms en producción; D1, R2 y KV sí son precisos.
+import { Context } from 'hono';
+import { setMetric } from 'hono/timing';
+import { Bindings } from '../types/index';
+
+type TimingContext = Context<{ Bindings: Bindings }>;
+
+const DEFAULT_SAMPLE_RATE = 0.05;
+const DEV_HOSTNAMES = new Set(['localhost', '127.0.0.1', '[::1]']);
+// Limita el tamaño de la cabecera en peticiones con muchas sentencias distintas
+const MAX_TIMING_ENTRIES = 20;
+
+export const R2_TIMED_METHODS = ['head', 'get', 'put', 'delete', 'list', 'createMultipartUpload'];
+export const KV_TIMED_METHODS = ['get', 'getWithMetadata', 'put', 'delete', 'list'];
+
+interface TimingEntry {
+  count: number;
+  durationMs: number;
+}
+
+export type TimingCollector = Map<string, TimingEntry>;
+
+// La decisión de muestreo se toma una vez por petición
+const sampledRequests = new WeakMap<Request, boolean>();
+
+export function isServerTimingEnabled(c: TimingContext): boolean {
+  let enabled = sampledRequests.get(c.req.raw);
+  if (enabled === undefined) {
+    if (DEV_HOSTNAMES.has(new URL(c.req.url).hostname)) {
+      enabled = true;
+    } else {
+      const rate = Number(c.env?.SERVER_TIMING_SAMPLE_RATE ?? DEFAULT_SAMPLE_RATE);
+      enabled = Math.random() < (Number.isFinite(rate) ? rate : DEFAULT_SAMPLE_RATE);
+    }
+    sampledRequests.set(c.req.raw, enabled);
+  }
+  return enabled;
+}
+
+export function addTiming(timings: TimingCollector, name: string, durationMs: number): void {
+  const entry = timings.get(name);
+  if (entry) {
+    entry.count++;
+    entry.durationMs += durationMs;
+  } else {
+    timings.set(name, { count: 1, durationMs });
+  }
+}
+
+// Devuelve una versión del binding (R2 o KV) que mide cada llamada a los métodos indicados
+// como '<prefix>-<método>'. En R2 get() se mide hasta recibir el objeto, no el cuerpo completo.
+export function instrumentBinding<T extends object>(
+  binding: T,
+  prefix: string,
+  methods: string[],
+  timings: TimingCollector
+): T {
+  const timed = new Set(methods);
+  return new Proxy(binding, {
+    get(target, property) {
+      const value = Reflect.get(target, property, target);
+      if (typeof value !== 'function') return value;
+      if (typeof property !== 'string' || !timed.has(property)) return value.bind(target);
+
+      return async (...args: unknown[]) => {
+        const startedAt = performance.now();
+        try {
+          return await value.apply(target, args);
+        } finally {
+          addTiming(timings, `${prefix}-${property}`, performance.now() - startedAt);
+        }
+      };
+    }
+  });
+}
+
+// Mide el tiempo de c.json (JSON.stringify de la respuesta)
+export function timeSerialization(c: TimingContext, timings: TimingCollector): void {
+  const json = c.json;
+  c.json = ((...args: Parameters<typeof json>) => {
+    const startedAt = performance.now();
+    try {
+      return json(...args);
+    } finally {
+      addTiming(timings, 'serialize', performance.now() - startedAt);
+    }
+  }) as typeof c.json;
+}
+
+// Añade lo acumulado a las métricas del middleware timing(), de mayor a menor duración
+export function reportTimings(c: TimingContext, timings: TimingCollector): void {
+  [...timings]
+    .sort(([, a], [, b]) => b.durationMs - a.durationMs)
+    .slice(0, MAX_TIMING_ENTRIES)
+    .forEach(([name, entry]) => {
+      setMetric(c, name, entry.durationMs, `${entry.count}x`);
+    });
+}
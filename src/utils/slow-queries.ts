@@ -0,0 +1,108 @@
+// Registro de consultas lentas a D1
+// Las sentencias que superan el umbral en una petición se acumulan por huella en la tabla
+// slow_queries (migración 0027). De cada parámetro solo se guarda su tipo, nunca el valor.
+// El plan (EXPLAIN QUERY PLAN) se captura una vez por huella con los parámetros de la
+// ejecución que la registró.
+import { Bindings } from '../types/index';
+import { queryFingerprint } from './metrics';
+
+export const DEFAULT_SLOW_QUERY_THRESHOLD_MS = 100;
+// Evita que una petición con D1 degradado genere cientos de escrituras de registro
+export const MAX_SLOW_QUERIES_PER_REQUEST = 10;
+
+export interface SlowQuery {
+  sql: string;
+  durationMs: number;
+  params: unknown[];
+}
+
+// Huellas cuyo plan ya consta en este isolate: evita volver a comprobarlo en D1
+const plannedFingerprints = new Set<string>();
+
+export function slowQueryThreshold(env: Partial<Bindings> | undefined): number {
+  const threshold = Number(env?.SLOW_QUERY_THRESHOLD_MS ?? DEFAULT_SLOW_QUERY_THRESHOLD_MS);
+  return Number.isFinite(threshold) && threshold >= 0 ? threshold : DEFAULT_SLOW_QUERY_THRESHOLD_MS;
+}
+
+// Tipo de cada parámetro, con la longitud en textos y binarios (ej. ['integer', 'text(24)', 'null'])
+export function parameterShapes(params: unknown[]): string[] {
+  return params.map(value => {
+    if (value === null || value === undefined) return 'null';
+    if (typeof value === 'number') return Number.isInteger(value) ? 'integer' : 'real';
+    if (typeof value === 'bigint') return 'integer';
+    if (typeof value === 'boolean') return 'boolean';
+    if (typeof value === 'string') return `text(${value.length})`;
+    if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) return `blob(${value.byteLength})`;
+    return typeof value;
+  });
+}
+
+async function fingerprintHash(normalized: string): Promise<string> {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(normalized));
+  return Array.from(new Uint8Array(digest).slice(0, 8), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// Salida de EXPLAIN QUERY PLAN como texto indentado según la jerarquía de pasos
+function formatQueryPlan(rows: { id: number; parent: number; detail: string }[]): string {
+  const depth = new Map<number, number>([[0, -1]]);
+  return rows.map(row => {
+    const level = (depth.get(row.parent) ?? -1) + 1;
+    depth.set(row.id, level);
+    return `${'  '.repeat(level)}${row.detail}`;
+  }).join('\n');
+}
+
+async function captureQueryPlan(db: D1Database, query: SlowQuery): Promise<string> {
+  try {
+    const plan = await db.prepare(`EXPLAIN QUERY PLAN ${query.sql}`)
+      .bind(...query.params)
+      .all<{ id: number; parent: number; detail: string }>();
+    return formatQueryPlan(plan.results);
+  } catch (error) {
+    // Se guarda el motivo para no reintentarlo en cada ejecución lenta
+    return `(plan no disponible: ${error instanceof Error ? error.message : String(error)})`;
+  }
+}
+
+// db debe ser la base sin instrumentar: estas escrituras no cuentan como consultas de la ruta
+export async function writeSlowQueries(db: D1Database, route: string, queries: SlowQuery[]): Promise<void> {
+  const now = Date.now();
+  const entries = await Promise.all(queries.map(async query => {
+    const { name, normalized } = queryFingerprint(query.sql);
+    return { query, name, normalized, fingerprint: await fingerprintHash(normalized) };
+  }));
+
+  const results = await db.batch(entries.map(entry => db.prepare(`
+    INSERT INTO slow_queries (
+      fingerprint, name, normalized_sql, last_route, occurrences, total_ms, max_ms, last_ms,
+      param_shapes, first_seen_at, last_seen_at
+    ) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(fingerprint) DO UPDATE SET
+      last_route = excluded.last_route,
+      occurrences = occurrences + 1,
+      total_ms = total_ms + excluded.total_ms,
+      max_ms = MAX(max_ms, excluded.max_ms),
+      last_ms = excluded.last_ms,
+      param_shapes = excluded.param_shapes,
+      last_seen_at = excluded.last_seen_at
+    RETURNING fingerprint, query_plan IS NULL AS needs_plan
+  `).bind(
+    entry.fingerprint, entry.name, entry.normalized, route, entry.query.durationMs,
+    entry.query.durationMs, entry.query.durationMs, JSON.stringify(parameterShapes(entry.query.params)), now, now
+  )));
+
+  for (const [index, result] of results.entries()) {
+    const entry = entries[index];
+    const row = result.results[0] as { needs_plan: number } | undefined;
+    if (!row?.needs_plan || plannedFingerprints.has(entry.fingerprint)) {
+      plannedFingerprints.add(entry.fingerprint);
+      continue;
+    }
+
+    plannedFingerprints.add(entry.fingerprint);
+    const plan = await captureQueryPlan(db, entry.query);
+    await db.prepare(`
+      UPDATE slow_queries SET query_plan = ? WHERE fingerprint = ? AND query_plan IS NULL
+    `).bind(plan, entry.fingerprint).run();
+  }
+}
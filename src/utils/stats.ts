@@ -0,0 +1,35 @@
+// Estadísticas públicas materializadas (tabla public_stats, ver migración 0017)
+
+// Recalcula todos los contadores desde las tablas base; los triggers los mantienen
+// al día en operación normal, esto es solo para reparaciones
+export async function rebuildPublicStats(db: D1Database): Promise<void> {
+  await db.batch([
+    db.prepare(`DELETE FROM public_stats`),
+    db.prepare(`
+      INSERT INTO public_stats (dimension, key, count)
+      SELECT 'projects', 'total', COUNT(*) FROM projects WHERE is_public = 1
+    `),
+    db.prepare(`
+      INSERT INTO public_stats (dimension, key, count)
+      SELECT 'products', 'total', COUNT(*) FROM products WHERE is_public = 1
+    `),
+    db.prepare(`
+      INSERT INTO public_stats (dimension, key, count)
+      SELECT 'products_by_type', product_type, COUNT(*)
+      FROM products WHERE is_public = 1
+      GROUP BY product_type
+    `),
+    db.prepare(`
+      INSERT INTO public_stats (dimension, key, count)
+      SELECT 'projects_by_status', IFNULL(status, ''), COUNT(*)
+      FROM projects WHERE is_public = 1
+      GROUP BY IFNULL(status, '')
+    `),
+    db.prepare(`
+      INSERT INTO public_stats (dimension, key, count)
+      SELECT 'owners', CAST(owner_id AS TEXT), COUNT(*)
+      FROM projects WHERE is_public = 1
+      GROUP BY owner_id
+    `)
+  ]);
+}
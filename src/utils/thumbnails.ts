@@ -0,0 +1,86 @@
+// Miniaturas de imágenes almacenadas en R2
+// La miniatura se genera con el binding de Cloudflare Images en la primera petición, se guarda
+// bajo el prefijo derived/ y se sirve con caché inmutable: el contenido de un objeto de R2 no
+// cambia (las claves son únicas), de modo que su miniatura tampoco.
+// Sin el binding IMAGES, o para tipos sin miniatura (p. ej. PDF), no se genera nada y el
+// cliente muestra el icono del tipo de archivo.
+import { Context } from 'hono';
+import { Bindings } from '../types/index';
+
+export const THUMBNAIL_SIZES = {
+  sm: 160,
+  md: 480
+} as const;
+
+export type ThumbnailSize = keyof typeof THUMBNAIL_SIZES;
+
+const THUMBNAIL_CACHE_CONTROL = 'private, max-age=31536000, immutable';
+
+// Formatos que Cloudflare Images puede transformar
+const THUMBNAIL_SOURCE_TYPES = ['image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'image/gif'];
+
+export function parseThumbnailSize(size: string | undefined): ThumbnailSize {
+  return size === 'md' ? 'md' : 'sm';
+}
+
+export function supportsThumbnail(mimeType: string | null | undefined): boolean {
+  return !!mimeType && THUMBNAIL_SOURCE_TYPES.includes(mimeType);
+}
+
+export function thumbnailKey(objectKey: string, size: ThumbnailSize): string {
+  return `derived/thumbnails/${size}/${objectKey}.webp`;
+}
+
+// Claves de todas las miniaturas de un objeto (para borrarlas junto con él)
+export function thumbnailKeys(objectKey: string): string[] {
+  return (Object.keys(THUMBNAIL_SIZES) as ThumbnailSize[]).map(size => thumbnailKey(objectKey, size));
+}
+
+// Devuelve la miniatura del objeto, generándola si aún no existe. Responde null si no se
+// puede generar (tipo no soportado, binding no configurado u original inexistente).
+export async function serveThumbnail(
+  c: Context,
+  objectKey: string,
+  mimeType: string | null | undefined,
+  size: ThumbnailSize
+): Promise<Response | null> {
+  const env = c.env as Bindings;
+  const bucket = env.R2;
+  if (!bucket || !supportsThumbnail(mimeType)) return null;
+
+  const key = thumbnailKey(objectKey, size);
+  const headers = new Headers({
+    'Content-Type': 'image/webp',
+    'Cache-Control': THUMBNAIL_CACHE_CONTROL,
+  });
+
+  const cached = await bucket.get(key, { onlyIf: c.req.raw.headers });
+  if (cached) {
+    headers.set('ETag', cached.httpEtag);
+    if (!('body' in cached)) {
+      return new Response(null, { status: 304, headers });
+    }
+    return new Response(cached.body, { headers });
+  }
+
+  if (!env.IMAGES) return null;
+
+  const original = await bucket.get(objectKey);
+  if (!original) return null;
+
+  const dimension = THUMBNAIL_SIZES[size];
+  const transformed = await env.IMAGES
+    .input(original.body)
+    .transform({ width: dimension, height: dimension, fit: 'scale-down' })
+    .output({ format: 'image/webp', quality: 80 });
+
+  // Las miniaturas pesan pocos KB: se materializan para conocer su tamaño al guardarlas
+  const thumbnail = await transformed.response().arrayBuffer();
+  const stored = await bucket.put(key, thumbnail, {
+    httpMetadata: { contentType: 'image/webp' },
+    customMetadata: { source: objectKey },
+  });
+
+  headers.set('ETag', stored.httpEtag);
+  return new Response(thumbnail, { headers });
+}
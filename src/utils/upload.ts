@@ -0,0 +1,154 @@
+// Utilidades de subida de archivos a R2
+// El contenido se transmite desde el archivo recibido directamente a R2 sin copiarlo a un
+// ArrayBuffer, y las validaciones usan solo los metadatos (tamaño y tipo MIME declarados).
+import { Context } from 'hono';
+
+// Margen para los encabezados y separadores del cuerpo multipart/form-data
+const MULTIPART_OVERHEAD_BYTES = 64 * 1024;
+
+// Rechaza de antemano cuerpos cuyo Content-Length ya supera el máximo permitido, antes de
+// que c.req.formData() tenga que leerlos
+export function exceedsUploadLimit(c: Context, maxSize: number): boolean {
+  const contentLength = Number(c.req.header('Content-Length'));
+  return Number.isFinite(contentLength) && contentLength > maxSize + MULTIPART_OVERHEAD_BYTES;
+}
+
+// Sube el archivo a R2 como stream de longitud conocida (R2 exige conocer el tamaño)
+export async function putFileStream(
+  bucket: R2Bucket,
+  key: string,
+  file: File,
+  options?: R2PutOptions
+): Promise<R2Object> {
+  const { readable, writable } = new FixedLengthStream(file.size);
+  const [object] = await Promise.all([
+    bucket.put(key, readable, options),
+    file.stream().pipeTo(writable)
+  ]);
+  return object;
+}
+
+// Igual que putFileStream, pero calcula el SHA-256 del contenido mientras se transmite
+export async function putFileStreamHashed(
+  bucket: R2Bucket,
+  key: string,
+  file: File,
+  options?: R2PutOptions
+): Promise<{ object: R2Object; sha256: string }> {
+  const { readable, writable } = new FixedLengthStream(file.size);
+  const digestStream = new crypto.DigestStream('SHA-256');
+  const [toBucket, toDigest] = file.stream().tee();
+  const [object] = await Promise.all([
+    bucket.put(key, readable, options),
+    toBucket.pipeTo(writable),
+    toDigest.pipeTo(digestStream)
+  ]);
+  const digest = new Uint8Array(await digestStream.digest);
+  const sha256 = Array.from(digest, byte => byte.toString(16).padStart(2, '0')).join('');
+  return { object, sha256 };
+}
+
+// ===== SUBIDAS MASIVAS =====
+// Cada petición de subida masiva lleva un lote de archivos pequeños; el cliente reparte el
+// paquete completo en lotes y envía varios en paralelo.
+export const BULK_UPLOAD_MAX_FILES = 25;
+export const BULK_UPLOAD_MAX_BYTES = 60 * 1024 * 1024; // Suma de los archivos de un lote
+export const BULK_UPLOAD_CONCURRENCY = 6; // Archivos transmitiéndose a R2 a la vez por lote
+
+// ===== SUBIDAS MULTIPARTE REANUDABLES =====
+
+// Tamaño de parte fijo (R2 exige al menos 5 MiB en todas las partes salvo la última)
+export const MULTIPART_PART_SIZE = 10 * 1024 * 1024;
+export const MULTIPART_MAX_FILE_SIZE = 500 * 1024 * 1024;
+
+// Además de los tipos de las subidas simples se aceptan conjuntos de datos (CSV, Excel, ZIP)
+const DATASET_MIME_TYPES = [
+  'text/csv',
+  'application/vnd.ms-excel',
+  'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+  'application/zip',
+  'application/x-zip-compressed'
+];
+
+export const MULTIPART_ALLOWED_TYPES: Record<'project' | 'product', string[]> = {
+  project: ['application/pdf', 'image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'text/plain', ...DATASET_MIME_TYPES],
+  product: [
+    'application/pdf',
+    'image/jpeg', 'image/jpg', 'image/png',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    ...DATASET_MIME_TYPES
+  ]
+};
+
+// Mapea el tipo MIME a los valores de file_type permitidos en la tabla files
+export function getFileTypeFromMime(mimeType: string): string {
+  if (mimeType.startsWith('image/')) {
+    return 'image';
+  } else if (mimeType.includes('pdf') || mimeType.includes('document') ||
+             mimeType.includes('text') || mimeType.includes('word') ||
+             mimeType.includes('excel') || mimeType.includes('powerpoint') ||
+             mimeType.includes('spreadsheet')) {
+    return 'document';
+  }
+  return 'general';
+}
+
+// Tamaño exacto que debe tener la parte indicada (la última lleva el resto)
+export function getExpectedPartSize(fileSize: number, partSize: number, partNumber: number): number {
+  const totalParts = Math.ceil(fileSize / partSize);
+  return partNumber === totalParts ? fileSize - partSize * (totalParts - 1) : partSize;
+}
+
+// R2 aborta las subidas multiparte incompletas a los 7 días; las sesiones más antiguas ya no
+// se pueden completar
+export const UPLOAD_SESSION_MAX_AGE_DAYS = 7;
+// Sesiones caducadas que se limpian en cada pasada
+export const UPLOAD_SESSION_CLEANUP_LIMIT = 50;
+
+// Aborta en R2 las subidas de las sesiones caducadas y elimina sus filas. Devuelve cuántas se limpiaron.
+export async function expireUploadSessions(
+  db: D1Database,
+  bucket: R2Bucket,
+  limit: number = UPLOAD_SESSION_CLEANUP_LIMIT
+): Promise<number> {
+  const stale = await db.prepare(`
+    SELECT upload_id, object_key FROM upload_sessions
+    WHERE created_at < datetime('now', ?)
+    ORDER BY created_at
+    LIMIT ?
+  `).bind(`-${UPLOAD_SESSION_MAX_AGE_DAYS} days`, limit).all<{ upload_id: string; object_key: string }>();
+
+  if (stale.results.length === 0) return 0;
+
+  await Promise.all(stale.results.map(async session => {
+    try {
+      await bucket.resumeMultipartUpload(session.object_key, session.upload_id).abort();
+    } catch {
+      // R2 ya la abortó por antigüedad: solo quedan las filas
+    }
+  }));
+
+  const uploadIds = JSON.stringify(stale.results.map(session => session.upload_id));
+  await db.batch([
+    db.prepare('DELETE FROM upload_session_parts WHERE upload_id IN (SELECT value FROM json_each(?))').bind(uploadIds),
+    db.prepare('DELETE FROM upload_sessions WHERE upload_id IN (SELECT value FROM json_each(?))').bind(uploadIds)
+  ]);
+
+  return stale.results.length;
+}
+
+// Sube una parte transmitiendo el cuerpo de la petición con longitud conocida
+export async function uploadPartStream(
+  upload: R2MultipartUpload,
+  partNumber: number,
+  body: ReadableStream,
+  length: number
+): Promise<R2UploadedPart> {
+  const { readable, writable } = new FixedLengthStream(length);
+  const [part] = await Promise.all([
+    upload.uploadPart(partNumber, readable),
+    body.pipeTo(writable)
+  ]);
+  return part;
+}
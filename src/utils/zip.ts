@@ -0,0 +1,170 @@
+// Generación de archivos ZIP en streaming
+// Las entradas se guardan sin compresión (método STORE): los anexos suelen ser PDF e imágenes
+// ya comprimidos y así el tamaño final se conoce de antemano (Content-Length). El CRC-32 de
+// cada entrada se calcula mientras se transmite y se escribe en un descriptor de datos
+// posterior, de modo que ningún archivo se carga completo en memoria.
+
+export interface ZipEntry {
+  name: string;
+  size: number;
+  modified: Date;
+  // Contenido de la entrada; se abre solo cuando le toca transmitirse
+  open: () => Promise<ReadableStream<Uint8Array> | null>;
+}
+
+// Sin ZIP64: cada entrada y el archivo completo deben quedar por debajo de 4 GiB
+export const ZIP_MAX_SIZE = 0xffffffff;
+
+const LOCAL_HEADER_SIZE = 30;
+const DATA_DESCRIPTOR_SIZE = 16;
+const CENTRAL_HEADER_SIZE = 46;
+const END_RECORD_SIZE = 22;
+// Bit 3: CRC y tamaños en el descriptor de datos; bit 11: nombres en UTF-8
+const GENERAL_PURPOSE_FLAGS = 0x0808;
+
+const CRC_TABLE = (() => {
+  const table = new Uint32Array(256);
+  for (let n = 0; n < 256; n++) {
+    let c = n;
+    for (let k = 0; k < 8; k++) {
+      c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+    }
+    table[n] = c >>> 0;
+  }
+  return table;
+})();
+
+function updateCrc32(crc: number, chunk: Uint8Array): number {
+  let value = crc;
+  for (let i = 0; i < chunk.length; i++) {
+    value = CRC_TABLE[(value ^ chunk[i]) & 0xff] ^ (value >>> 8);
+  }
+  return value;
+}
+
+function toDosDateTime(date: Date): { time: number; date: number } {
+  const year = Math.max(date.getUTCFullYear(), 1980);
+  return {
+    time: (date.getUTCHours() << 11) | (date.getUTCMinutes() << 5) | Math.floor(date.getUTCSeconds() / 2),
+    date: ((year - 1980) << 9) | ((date.getUTCMonth() + 1) << 5) | date.getUTCDate()
+  };
+}
+
+// Tamaño total del ZIP para las entradas dadas (permite enviar Content-Length)
+export function zipArchiveSize(entries: ZipEntry[]): number {
+  const encoder = new TextEncoder();
+  let size = END_RECORD_SIZE;
+  for (const entry of entries) {
+    const nameLength = encoder.encode(entry.name).length;
+    size += LOCAL_HEADER_SIZE + nameLength + entry.size + DATA_DESCRIPTOR_SIZE;
+    size += CENTRAL_HEADER_SIZE + nameLength;
+  }
+  return size;
+}
+
+export function createZipStream(entries: ZipEntry[]): ReadableStream<Uint8Array> {
+  const encoder = new TextEncoder();
+
+  async function* generate(): AsyncGenerator<Uint8Array> {
+    const centralRecords: Uint8Array[] = [];
+    let offset = 0;
+
+    for (const entry of entries) {
+      const name = encoder.encode(entry.name);
+      const { time, date } = toDosDateTime(entry.modified);
+
+      const local = new DataView(new ArrayBuffer(LOCAL_HEADER_SIZE));
+      local.setUint32(0, 0x04034b50, true);
+      local.setUint16(4, 20, true); // versión necesaria para extraer
+      local.setUint16(6, GENERAL_PURPOSE_FLAGS, true);
+      local.setUint16(8, 0, true); // STORE
+      local.setUint16(10, time, true);
+      local.setUint16(12, date, true);
+      // CRC y tamaños van en el descriptor de datos (quedan en 0 aquí)
+      local.setUint16(26, name.length, true);
+      yield new Uint8Array(local.buffer);
+      yield name;
+
+      const body = await entry.open();
+      if (!body) {
+        throw new Error(`Contenido no disponible para ${entry.name}`);
+      }
+
+      let crc = 0xffffffff;
+      let written = 0;
+      const reader = body.getReader();
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        crc = updateCrc32(crc, value);
+        written += value.length;
+        yield value;
+      }
+      crc = (crc ^ 0xffffffff) >>> 0;
+
+      if (written !== entry.size) {
+        throw new Error(`Tamaño inesperado en ${entry.name}: ${written} de ${entry.size} bytes`);
+      }
+
+      const descriptor = new DataView(new ArrayBuffer(DATA_DESCRIPTOR_SIZE));
+      descriptor.setUint32(0, 0x08074b50, true);
+      descriptor.setUint32(4, crc, true);
+      descriptor.setUint32(8, entry.size, true);
+      descriptor.setUint32(12, entry.size, true);
+      yield new Uint8Array(descriptor.buffer);
+
+      const central = new Uint8Array(CENTRAL_HEADER_SIZE + name.length);
+      const view = new DataView(central.buffer);
+      view.setUint32(0, 0x02014b50, true);
+      view.setUint16(4, 20, true); // versión que lo creó
+      view.setUint16(6, 20, true); // versión necesaria para extraer
+      view.setUint16(8, GENERAL_PURPOSE_FLAGS, true);
+      view.setUint16(10, 0, true);
+      view.setUint16(12, time, true);
+      view.setUint16(14, date, true);
+      view.setUint32(16, crc, true);
+      view.setUint32(20, entry.size, true);
+      view.setUint32(24, entry.size, true);
+      view.setUint16(28, name.length, true);
+      view.setUint32(42, offset, true);
+      central.set(name, CENTRAL_HEADER_SIZE);
+      centralRecords.push(central);
+
+      offset += LOCAL_HEADER_SIZE + name.length + entry.size + DATA_DESCRIPTOR_SIZE;
+    }
+
+    let centralSize = 0;
+    for (const record of centralRecords) {
+      centralSize += record.length;
+      yield record;
+    }
+
+    const end = new DataView(new ArrayBuffer(END_RECORD_SIZE));
+    end.setUint32(0, 0x06054b50, true);
+    end.setUint16(8, centralRecords.length, true);
+    end.setUint16(10, centralRecords.length, true);
+    end.setUint32(12, centralSize, true);
+    end.setUint32(16, offset, true);
+    yield new Uint8Array(end.buffer);
+  }
+
+  const iterator = generate();
+  // pull solo se invoca cuando el cliente consume: la lectura de R2 sigue su ritmo
+  return new ReadableStream<Uint8Array>({
+    async pull(controller) {
+      try {
+        const { done, value } = await iterator.next();
+        if (done) {
+          controller.close();
+        } else {
+          controller.enqueue(value);
+        }
+      } catch (error) {
+        controller.error(error);
+      }
+    },
+    async cancel() {
+      await iterator.return(undefined);
+    }
+  });
+}
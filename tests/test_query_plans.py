@@ -0,0 +1,539 @@
+"""Regresión de planes de consulta de D1 (EXPLAIN QUERY PLAN).
+
+Aplica las migraciones de migrations/ sobre un SQLite local, lo puebla con datos a escala
+(miles de proyectos, productos y archivos) y ejecuta ANALYZE para que el planificador decida
+con estadísticas, como hace D1 tras PRAGMA optimize. Después extrae el SQL de cada llamada a
+.prepare() de src/ y comprueba que ninguna consulta recorre completas las tablas principales
+(KEY_TABLES) salvo las que constan en EXPECTED_SCANS con su motivo.
+
+Extracción:
+  - prepare(`...`) o prepare('...'): el literal, resolviendo las interpolaciones ${nombre} con
+    sus asignaciones en el mismo manejador (una variante por rama) o con la constante del
+    módulo, ${lista.join(sep)} con los valores añadidos con lista.push('...') y
+    ${c ? 'a' : 'b'} con cada rama.
+  - prepare(variable): cada asignación de la variable en el manejador más, en orden, los
+    `variable += ...` posteriores que mantienen el SQL válido (es decir, con todos los filtros
+    opcionales aplicados; los añadidos de otra rama se descartan al invalidar el SQL).
+  - Lo que no se puede resolver se sustituye por '' o por '?'. Si aun así el SQL no es
+    válido, la consulta debe registrarse en DYNAMIC_QUERIES con una expansión representativa.
+
+Un recorrido completo es una línea 'SCAN <tabla>' del plan sin USING INDEX; los recorridos
+de un índice (p. ej. ORDER BY ... LIMIT sobre un índice ordenado) no se consideran.
+
+Cada llamada se identifica por la huella de su plantilla (site key): los primeros 16
+caracteres hex del SHA-256 del texto con espacios normalizados y las interpolaciones tal
+cual. Un fallo muestra la huella, el archivo y línea, el SQL y el plan.
+
+Ejecutar: python3 -m pytest -q tests/test_query_plans.py
+"""
+import hashlib
+import itertools
+import re
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+MIGRATIONS_DIR = ROOT / 'migrations'
+SOURCE_DIR = ROOT / 'src'
+
+# Tablas que nunca deben recorrerse completas donde se espera un índice
+KEY_TABLES = {'projects', 'products', 'files', 'project_collaborators', 'project_scores'}
+
+# Volumen de datos de prueba
+SEED_USERS = 2000
+SEED_PROJECTS = 6000
+SEED_PRODUCTS_PER_PROJECT = 4
+SEED_FILES_PER_PROJECT = 4
+SEED_COLLABORATORS_PER_PROJECT = 3
+SEED_SCORE_VERSIONS = 4
+
+MAX_VARIANTS = 16
+
+# Recorridos completos aceptados: agregados sobre toda la tabla que no dependen de un filtro
+EXPECTED_SCANS = {
+    '2d6a9ee4af580c0b': 'utils/monitoring.ts buildMonitoringOverview: totales de proyectos (instantánea de 30 s)',
+    '7dd0a8da0ca8122f': 'utils/monitoring.ts buildMonitoringOverview: totales de productos (instantánea de 30 s)',
+    '4b2d259989429fb1': 'routes/private.ts GET /dashboard/stats: totales globales para ADMIN',
+}
+
+# Consultas que hacen referencia a tablas o columnas que no crea ninguna migración (errores
+# previos de esas rutas, no de plan): se marcan como xfail. Una consulta nueva con este
+# problema hace fallar la suite.
+KNOWN_INVALID = {
+    'c3ee7bb1fb6bee11': 'routes/admin.ts GET /action-lines: tabla calculated_metrics inexistente',
+    '5157c7b6c94cff7e': 'routes/admin.ts POST /action-lines: columna action_lines.priority inexistente',
+    '229ef0b00898563e': 'routes/admin.ts PUT /action-lines/:id: columna action_lines.priority inexistente',
+    '370ab81cda1b70c2': 'routes/admin.ts PUT /alerts/:id/resolve: columnas system_alerts.is_resolved/is_read inexistentes',
+    '29b9c8257d46f8f3': 'routes/private.ts GET /dashboard/stats: columna system_alerts.is_resolved inexistente',
+    '295303a8c2c4b629': 'routes/private.ts GET /timeline: columna action_lines.color_code inexistente (es color)',
+    '7d0956480b5f171e': 'routes/private.ts POST /projects/:projectId/milestones: columna project_milestones.milestone_title inexistente',
+    '34cc9f360a288c0f': 'routes/private.ts GET /alerts: columnas system_alerts.alert_type/is_resolved inexistentes',
+    '3313f68c865a0ebb': 'routes/private.ts POST /products/:productId/calculate-score: tabla product_scores inexistente',
+    'e6d771ec457d5f9b': 'routes/private.ts POST /products/:productId/calculate-score: tabla product_scores inexistente',
+    '80c65b7de21ca78a': 'routes/private.ts: tabla product_scores inexistente',
+}
+
+# Consultas con SQL dinámico que la extracción no reconstruye: expansiones representativas.
+# Una lista vacía indica que el SQL llega de otro punto y no se analiza aquí.
+DYNAMIC_QUERIES = {
+    # utils/metrics.ts instrumentD1 y utils/slow-queries.ts captureQueryPlan: SQL de cualquier ruta
+    '070114cc932083cb': [],
+    'cc67657eb84dd11e': [],
+    # utils/reconcile.ts: filas colgantes en el rango (lowerKey, upperKey] de la página de R2
+    'dbde35d98edd1f41': [
+        'SELECT id, file_path, original_name, blob_hash FROM files '
+        'WHERE file_path > ?1 AND file_path <= ?2 '
+        'AND file_path NOT IN (SELECT value FROM json_each(?3)) ORDER BY file_path',
+        'SELECT id, file_path, original_name, blob_hash FROM files '
+        'WHERE file_path > ?1 AND file_path NOT IN (SELECT value FROM json_each(?2)) ORDER BY file_path',
+    ],
+    '7948e8c1c18b2fb9': [
+        'SELECT hash, object_key, ref_count FROM file_blobs '
+        'WHERE object_key > ?1 AND object_key <= ?2 '
+        'AND object_key NOT IN (SELECT value FROM json_each(?3)) ORDER BY object_key',
+        'SELECT hash, object_key, ref_count FROM file_blobs '
+        'WHERE object_key > ?1 AND object_key NOT IN (SELECT value FROM json_each(?2)) ORDER BY object_key',
+    ],
+}
+
+
+# ===== EXTRACCIÓN =====
+
+def _read_quoted(src, i):
+    """Lee un literal '...' o "..." que empieza en src[i]; devuelve (texto, fin)."""
+    quote = src[i]
+    j = i + 1
+    while src[j] != quote:
+        j += 2 if src[j] == '\\' else 1
+    return src[i + 1:j], j + 1
+
+
+def _read_template(src, i):
+    """Lee un template literal que empieza en src[i] == '`'.
+
+    Devuelve (partes, fin): las partes son texto o ('expr', expresión) por cada ${...}.
+    """
+    parts = []
+    text = ''
+    i += 1
+    while True:
+        ch = src[i]
+        if ch == '\\':
+            text += src[i + 1]
+            i += 2
+        elif ch == '`':
+            parts.append(text)
+            return parts, i + 1
+        elif src.startswith('${', i):
+            parts.append(text)
+            text = ''
+            depth = 1
+            j = i + 2
+            while depth:
+                c = src[j]
+                if c == '`':
+                    _, j = _read_template(src, j)
+                    continue
+                if c in '\'"':
+                    _, j = _read_quoted(src, j)
+                    continue
+                if c == '{':
+                    depth += 1
+                elif c == '}':
+                    depth -= 1
+                j += 1
+            parts.append(('expr', src[i + 2:j - 1].strip()))
+            i = j
+        else:
+            text += ch
+            i += 1
+
+
+def _read_expression(src, i):
+    """Lee una concatenación de literales e identificadores hasta ';', ')' o ',' de nivel 0."""
+    parts = []
+    while True:
+        while src[i] in ' \t\r\n':
+            i += 1
+        ch = src[i]
+        if ch == '`':
+            template, i = _read_template(src, i)
+            parts.extend(template)
+        elif ch in '\'"':
+            text, i = _read_quoted(src, i)
+            parts.append(text)
+        else:
+            match = re.compile(r'[\w.$]+(?:\([^()]*\))?').match(src, i)
+            if not match:
+                return parts, i
+            parts.append(('expr', match.group(0)))
+            i = match.end()
+        while src[i] in ' \t\r\n':
+            i += 1
+        if src[i] != '+' or src.startswith('+=', i):
+            return parts, i
+        i += 1
+
+
+def _template_text(parts):
+    return ''.join(p if isinstance(p, str) else '${%s}' % p[1] for p in parts)
+
+
+# Inicio de un manejador de ruta o función de nivel superior: delimita la búsqueda de
+# asignaciones de una variable de consulta
+SCOPE_START = re.compile(r'^(?:\w+Routes\.\w+\(|(?:export )?(?:async )?function )', re.M)
+
+
+class SourceFile:
+    def __init__(self, path):
+        self.path = path
+        self.src = path.read_text(encoding='utf-8')
+
+    def line_of(self, index):
+        return self.src.count('\n', 0, index) + 1
+
+    def module_constant(self, name):
+        """Valor de una constante declarada a nivel de módulo (`const NAME = ...` en la columna 0)."""
+        pattern = re.compile(r'^(?:export )?const\s+%s\s*(?::[^=;\n]+)?=\s*' % re.escape(name), re.M)
+        return [(m.end(), _read_expression(self.src, m.end())[0]) for m in pattern.finditer(self.src)]
+
+    def scope_start(self, position):
+        starts = [m.start() for m in SCOPE_START.finditer(self.src, 0, position)]
+        return starts[-1] if starts else 0
+
+    def assignments(self, name, start, end):
+        """Valores asignados a `name` (declaración o asignación) entre start y end."""
+        pattern = re.compile(r'(?<![\w.$])%s\s*(?::[^=;\n]+)?=(?![=>])\s*' % re.escape(name))
+        return [(m.end(), _read_expression(self.src, m.end())[0]) for m in pattern.finditer(self.src, start, end)]
+
+    def appends(self, name, start, end):
+        """Partes añadidas con `name += ...` entre start y end."""
+        pattern = re.compile(r'(?<![\w.$])%s\s*\+=\s*' % re.escape(name))
+        return [(m.end(), [' '] + _read_expression(self.src, m.end())[0]) for m in pattern.finditer(self.src, start, end)]
+
+    def pushed(self, name, before):
+        """Literales añadidos con name.push('...') desde su declaración hasta `before`."""
+        declared = self.assignments(name, self.scope_start(before), before)
+        start = declared[-1][0] if declared else self.scope_start(before)
+        values = []
+        for match in re.compile(r'(?<![\w.$])%s\.push\(\s*' % re.escape(name)).finditer(self.src, start, before):
+            if self.src[match.end()] in '\'"`':
+                values.append(_read_expression(self.src, match.end())[0])
+        return values
+
+    def sites(self):
+        for match in re.finditer(r'\.prepare\(\s*', self.src):
+            start = match.end()
+            if self.src[start] in '`\'"':
+                yield QuerySite(self, start, [(start, _read_expression(self.src, start)[0], [])])
+                continue
+
+            name = re.compile(r'[\w$]+').match(self.src, start)
+            scope = self.scope_start(start)
+            assigned = self.assignments(name.group(0), scope, start) if name else []
+            if not assigned:
+                expression = self.src[start:self.src.index(')', start)].strip()
+                yield QuerySite(self, start, [(start, [('expr', expression)], [])])
+                continue
+
+            appended = self.appends(name.group(0), scope, start)
+            yield QuerySite(self, start, [
+                (position, parts, [extra for at, extra in appended if at > position])
+                for position, parts in assigned
+            ])
+
+
+class QuerySite:
+    """Una llamada a .prepare(): cada asignación posible del SQL con los añadidos posteriores."""
+
+    def __init__(self, source, position, assignments):
+        self.source = source
+        self.position = position
+        self.assignments = assignments
+        self.template = ' | '.join(
+            ' '.join((_template_text(parts) + ''.join(_template_text(extra) for extra in appended)).split())
+            for _, parts, appended in assignments
+        )
+        self.key = hashlib.sha256(self.template.encode()).hexdigest()[:16]
+        self.location = f'{source.path.relative_to(ROOT)}:{source.line_of(position)}'
+
+
+def _resolve(parts, source, position, depth=0):
+    """Expande las partes en variantes de SQL; None marca lo que no se pudo resolver."""
+    options = [[part] if isinstance(part, str) else _resolve_expression(part[1], source, position, depth)
+               for part in parts]
+    return [
+        None if None in combination else ''.join(combination)
+        for combination in itertools.islice(itertools.product(*options), MAX_VARIANTS)
+    ]
+
+
+def _resolve_expression(expr, source, position, depth):
+    if depth > 6:
+        return [None]
+
+    ternary = re.fullmatch(r'[^?]+\?\s*([\'"`])(.*?)\1\s*:\s*([\'"`])(.*?)\3', expr, re.S)
+    if ternary and '${' not in ternary.group(2) + ternary.group(4):
+        return [ternary.group(2), ternary.group(4)]
+
+    joined = re.fullmatch(r'([\w$]+)\.join\(\s*([\'"])(.*?)\2\s*\)', expr)
+    if joined:
+        values = [_resolve(parts, source, position, depth + 1)[0] for parts in source.pushed(joined.group(1), position)]
+        return [joined.group(3).join(values)] if values and None not in values else [None]
+
+    if re.fullmatch(r'[\w$]+', expr):
+        # Valores asignados en el manejador (una variante por rama) o constante del módulo
+        scope = source.scope_start(position)
+        assigned = source.assignments(expr, scope, position) or source.module_constant(expr)
+        values = [
+            sql
+            for declared_at, parts in assigned
+            for sql in _resolve(parts, source, declared_at, depth + 1)
+            if sql is not None
+        ]
+        return values[:MAX_VARIANTS] or [None]
+
+    return [None]
+
+
+def _candidate_sql(site, db):
+    """SQL a analizar para una llamada.
+
+    Por cada asignación: sus variantes resueltas más, en orden, cada añadido que mantiene el
+    SQL válido (los añadidos de otras ramas del mismo manejador se descartan así).
+    """
+    if site.key in DYNAMIC_QUERIES:
+        return list(DYNAMIC_QUERIES[site.key])
+
+    candidates = []
+    for position, parts, appended in site.assignments:
+        for sql in _resolve(parts, site.source, position):
+            if sql is None:
+                continue
+            for extra in appended:
+                extended = _resolve(extra, site.source, position)[0]
+                if extended is not None and _is_valid(db, sql + extended):
+                    sql += extended
+            candidates.append(sql)
+    if candidates:
+        return candidates
+
+    # Interpolaciones no resueltas: se prueba sin ellas y como parámetro
+    return [
+        ''.join(part if isinstance(part, str) else filler for part in parts)
+        for _, parts, _ in site.assignments
+        for filler in ('', '?')
+    ]
+
+
+QUERY_SITES = [site for path in sorted(SOURCE_DIR.rglob('*.ts')) for site in SourceFile(path).sites()]
+
+
+# ===== BASE DE DATOS =====
+
+def _apply_migrations(db):
+    # Mismo orden que wrangler d1 migrations apply (los .sql.skip no se aplican)
+    for migration in sorted(MIGRATIONS_DIR.glob('*.sql')):
+        try:
+            db.executescript(migration.read_text(encoding='utf-8'))
+        except sqlite3.Error as error:
+            pytest.fail(f'La migración {migration.name} no se aplica: {error}')
+
+
+def _seed(db):
+    # Las tablas seed_* numeran usuarios, líneas de acción y categorías desde 0 para repartir
+    # las filas generadas entre ellos (LIMIT/OFFSET no admiten columnas de la consulta externa)
+    db.executescript(f"""
+        CREATE TEMP TABLE seed_n (n INTEGER PRIMARY KEY);
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < {max(SEED_USERS, SEED_PROJECTS)})
+        INSERT INTO seed_n SELECT i FROM n;
+
+        INSERT OR IGNORE INTO users (email, password_hash, full_name, role, created_at)
+        SELECT 'seed' || n || '@example.org', 'x', 'Usuario ' || n,
+               CASE WHEN n % 50 = 0 THEN 'ADMIN' WHEN n % 3 = 0 THEN 'COMMUNITY' ELSE 'INVESTIGATOR' END,
+               datetime('2024-01-01', '+' || (n % 700) || ' days')
+        FROM seed_n WHERE n < {SEED_USERS};
+
+        CREATE TEMP TABLE seed_users AS
+        SELECT ROW_NUMBER() OVER (ORDER BY id) - 1 AS n, id FROM users;
+        CREATE TEMP TABLE seed_action_lines AS
+        SELECT ROW_NUMBER() OVER (ORDER BY id) - 1 AS n, id FROM action_lines;
+        CREATE TEMP TABLE seed_categories AS
+        SELECT ROW_NUMBER() OVER (ORDER BY code) - 1 AS n, code FROM product_categories;
+
+        INSERT INTO projects (
+            title, abstract, keywords, owner_id, is_public, status, action_line_id,
+            progress_percentage, risk_level, created_at, updated_at
+        )
+        SELECT 'Proyecto ' || s.n, 'Resumen del proyecto ' || s.n, 'ciencia,tecnología,' || (s.n % 40),
+               u.id, s.n % 3 = 0,
+               CASE s.n % 5 WHEN 0 THEN 'DRAFT' WHEN 1 THEN 'ACTIVE' WHEN 2 THEN 'ACTIVE' WHEN 3 THEN 'REVIEW' ELSE 'COMPLETED' END,
+               al.id, s.n % 100,
+               CASE s.n % 7 WHEN 0 THEN 'HIGH' WHEN 1 THEN 'MEDIUM' ELSE 'LOW' END,
+               datetime('2024-01-01', '+' || (s.n % 700) || ' days'),
+               datetime('2024-01-01', '+' || (s.n % 700) || ' days')
+        FROM seed_n s
+        JOIN seed_users u ON u.n = s.n % (SELECT COUNT(*) FROM seed_users)
+        LEFT JOIN seed_action_lines al ON al.n = s.n % MAX((SELECT COUNT(*) FROM seed_action_lines), 1)
+        WHERE s.n < {SEED_PROJECTS};
+
+        INSERT INTO products (project_id, product_code, product_type, description, is_public, creator_id, created_at)
+        SELECT p.id, c.code,
+               CASE k.n % 3 WHEN 0 THEN 'TOP' WHEN 1 THEN 'A' ELSE 'B' END,
+               'Producto ' || k.n || ' del proyecto ' || p.id,
+               (p.id + k.n) % 2 = 0, p.owner_id, p.created_at
+        FROM projects p
+        JOIN seed_n k ON k.n < {SEED_PRODUCTS_PER_PROJECT}
+        JOIN seed_categories c ON c.n = (p.id + k.n) % (SELECT COUNT(*) FROM seed_categories);
+
+        INSERT OR IGNORE INTO project_collaborators (project_id, user_id, collaboration_role)
+        SELECT p.id, u.id,
+               CASE k.n WHEN 0 THEN 'CO_INVESTIGATOR' WHEN 1 THEN 'RESEARCH_ASSISTANT' ELSE 'EXTERNAL_COLLABORATOR' END
+        FROM projects p
+        JOIN seed_n k ON k.n < {SEED_COLLABORATORS_PER_PROJECT}
+        JOIN seed_users u ON u.n = (p.id * 7 + k.n + 1) % (SELECT COUNT(*) FROM seed_users);
+
+        -- Historial: SEED_SCORE_VERSIONS cálculos por proyecto, solo el último vigente
+        INSERT INTO project_scores (project_id, total_score, evaluation_category, is_current, last_calculated_at)
+        SELECT p.id, (p.id + v.n) % 100,
+               CASE WHEN (p.id + v.n) % 100 >= 80 THEN 'EXCELENTE' WHEN (p.id + v.n) % 100 >= 60 THEN 'BUENO'
+                    WHEN (p.id + v.n) % 100 >= 40 THEN 'REGULAR' ELSE 'NECESITA_MEJORA' END,
+               v.n = {SEED_SCORE_VERSIONS} - 1,
+               datetime('2025-01-01', '+' || v.n || ' days')
+        FROM projects p
+        JOIN seed_n v ON v.n < {SEED_SCORE_VERSIONS};
+
+        INSERT INTO files (
+            filename, original_name, file_path, file_url, file_type, file_size, mime_type,
+            entity_type, entity_id, uploaded_by
+        )
+        SELECT 'f' || p.id || '_' || k.n || '.pdf', 'archivo ' || k.n || '.pdf',
+               'projects/' || p.id || '/f' || p.id || '_' || k.n || '.pdf',
+               '/api/files/projects/' || p.id || '/f' || p.id || '_' || k.n || '.pdf',
+               CASE k.n % 2 WHEN 0 THEN 'document' ELSE 'image' END, 1000 * (k.n + 1), 'application/pdf',
+               CASE k.n % 2 WHEN 0 THEN 'project' ELSE 'product' END,
+               CASE k.n % 2 WHEN 0 THEN CAST(p.id AS TEXT)
+                    ELSE CAST((SELECT MIN(id) FROM products WHERE project_id = p.id) AS TEXT) END,
+               p.owner_id
+        FROM projects p
+        JOIN seed_n k ON k.n < {SEED_FILES_PER_PROJECT};
+
+        ANALYZE;
+    """)
+
+
+@pytest.fixture(scope='module')
+def db():
+    connection = sqlite3.connect(':memory:')
+    _apply_migrations(connection)
+    _seed(connection)
+    yield connection
+    connection.close()
+
+
+def _explain(db, sql):
+    """Filas de EXPLAIN QUERY PLAN; los parámetros se enlazan como NULL."""
+    statement = 'EXPLAIN QUERY PLAN ' + sql
+    try:
+        return db.execute(statement).fetchall()
+    except sqlite3.ProgrammingError as error:
+        count = re.search(r'uses (\d+)', str(error))
+        if not count:
+            raise
+        return db.execute(statement, [None] * int(count.group(1))).fetchall()
+
+
+def _is_valid(db, sql):
+    try:
+        _explain(db, sql)
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def _table_aliases(sql):
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.I):
+        aliases[table] = table
+        if alias and alias.upper() not in {
+            'WHERE', 'ON', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'JOIN', 'GROUP', 'ORDER',
+            'LIMIT', 'USING', 'SET', 'AS', 'UNION', 'HAVING', 'WINDOW', 'NATURAL'
+        }:
+            aliases[alias] = table
+    return aliases
+
+
+def full_scans(plan, sql):
+    """Tablas de KEY_TABLES recorridas sin índice según el plan."""
+    aliases = _table_aliases(sql)
+    scanned = []
+    for _, _, _, detail in plan:
+        match = re.match(r'SCAN (\w+)(?: AS (\w+))?(?: LEFT-JOIN)?$', detail.strip())
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in KEY_TABLES:
+                scanned.append(table)
+    return scanned
+
+
+def _format_plan(plan):
+    return '\n'.join(f'    {detail}' for _, _, _, detail in plan)
+
+
+# ===== PRUEBAS =====
+
+@pytest.mark.parametrize('site', QUERY_SITES, ids=lambda site: site.location)
+def test_query_uses_indexes(db, site):
+    candidates = _candidate_sql(site, db)
+    if site.key in DYNAMIC_QUERIES and not candidates:
+        pytest.skip('SQL arbitrario (registrado sin expansión)')
+
+    errors = []
+    analyzed = 0
+    for sql in candidates:
+        try:
+            plan = _explain(db, sql)
+        except sqlite3.Error as error:
+            errors.append(f'{error}')
+            continue
+        analyzed += 1
+
+        scans = full_scans(plan, sql)
+        if scans and site.key not in EXPECTED_SCANS:
+            pytest.fail(
+                f'{site.location} [{site.key}] recorre completa(s) {", ".join(sorted(set(scans)))}:\n'
+                f'  SQL: {" ".join(sql.split())}\n  Plan:\n{_format_plan(plan)}\n'
+                'Añadir un índice o, si el recorrido es intencionado, registrar la huella en EXPECTED_SCANS.'
+            )
+
+    if analyzed == 0:
+        if site.key in KNOWN_INVALID:
+            pytest.xfail(KNOWN_INVALID[site.key])
+        pytest.fail(
+            f'{site.location} [{site.key}] no se puede analizar ({"; ".join(sorted(set(errors)))}):\n'
+            f'  Plantilla: {site.template}\n'
+            'Registrar una expansión representativa en DYNAMIC_QUERIES o corregir la consulta.'
+        )
+
+
+def test_registered_keys_exist():
+    """Las entradas de las listas deben corresponder a consultas que siguen existiendo."""
+    keys = {site.key for site in QUERY_SITES}
+    stale = [
+        f'{name}: {key}'
+        for name, registry in (('EXPECTED_SCANS', EXPECTED_SCANS), ('KNOWN_INVALID', KNOWN_INVALID),
+                               ('DYNAMIC_QUERIES', DYNAMIC_QUERIES))
+        for key in registry
+        if key not in keys
+    ]
+    assert not stale, 'Entradas sin consulta correspondiente (eliminarlas):\n' + '\n'.join(stale)
+
+
+def test_seed_is_at_scale(db):
+    for table, minimum in (('projects', SEED_PROJECTS), ('products', SEED_PROJECTS * 2),
+                           ('files', SEED_PROJECTS * 2), ('project_collaborators', SEED_PROJECTS),
+                           ('project_scores', SEED_PROJECTS)):
+        count = db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        assert count >= minimum, f'{table}: {count} filas'